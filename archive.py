@@ -0,0 +1,206 @@
+import os
+import io
+import re
+import json
+import tarfile
+from fileio import write_text
+from instrument import count, timer
+from parallel import iter_tasks
+from transform import encode_image
+from voc_writer import render_voc_xml
+from writers import coco_annotations, count_written, render_yolo_label, voc_objects, yolo_labels
+
+# 归档格式 (WebDataset 风格): 每个划分按顺序写入若干个 tar 分片, 同一样本的文件共用一个键
+#   {root}/{split}-{k:06d}.tar: 依次为 {键}.{图片扩展名} 和 {键}.txt|xml|json (YOLO/VOC/COCO 标注)
+#     VOC 中没有标注文件的图片只有图片成员, 不带 .xml
+#   {root}/shards.json: 索引, 记录类别表和每个分片的文件名、样本数、字节数和首尾样本的键
+# 分片的划分在写出前按文件大小确定, 各分片在不同进程中并行写出, 结果与进程数无关
+ARCHIVE_VERSION = 1
+ARCHIVE_INDEX = "shards.json"
+DEFAULT_SHARD_BYTES = 1 << 30
+LABEL_EXTENSIONS = {"yolo": "txt", "voc": "xml", "coco": "json"}
+
+_TAR_BLOCK = 512
+
+
+def shard_name(split, shard):
+    return f"{split}-{shard:06d}.tar"
+
+
+def _member_bytes(size):
+    """tar 中一个成员占用的字节数 (512字节的头 + 按512字节对齐的内容)"""
+    return _TAR_BLOCK + -(-size // _TAR_BLOCK) * _TAR_BLOCK
+
+
+def _tar_info(name, size):
+    """固定元数据的成员头, 相同内容的归档逐字节一致"""
+    info = tarfile.TarInfo(name)
+    info.size = size
+    info.mode = 0o644
+    info.mtime = 0
+    return info
+
+
+def _sample_key(file_name, used):
+    """
+    样本的键: 去掉扩展名的文件名, 其中的 "." 换成 "_" (WebDataset 以第一个 "." 分隔键和扩展名);
+    与已有的键相同时依次加上 _1, _2, ... 直到不重复
+    """
+    base = key = os.path.splitext(file_name)[0].replace(".", "_")
+    suffix = 1
+    while key in used:
+        key = f"{base}_{suffix}"
+        suffix += 1
+    used.add(key)
+    return key
+
+
+def write_shard(task):
+    """
+    写出一个分片 (在子进程中执行): 图片直接从源文件流式写入, 需要缩放/重新编码的图片在内存中编码
+
+    任务为 (分片路径, [(键, 源图片路径, 图片扩展名, plan, PIL格式名, quality, 标注扩展名, 标注内容), ...]);
+    源图片路径为 None 时不写入图片, 标注内容为 None 时不写入标注
+
+    返回:
+        (写入的字节数, [(源图片路径, 实际尺寸), ...] 重新编码的图片)
+    """
+    path, samples = task
+    encoded = []
+    tmp_file = f"{path}.tmp"
+    with tarfile.open(tmp_file, "w", format=tarfile.PAX_FORMAT) as tar:
+        for key, src, image_ext, plan, fmt, quality, label_ext, label in samples:
+            if src is not None and plan is not None:
+                data, size = encode_image(src, plan, fmt, quality)
+                tar.addfile(_tar_info(f"{key}.{image_ext}", len(data)), io.BytesIO(data))
+                encoded.append((src, size))
+            elif src is not None:
+                with open(src, "rb") as f:
+                    tar.addfile(_tar_info(f"{key}.{image_ext}", os.fstat(f.fileno()).st_size), f)
+            if label is None:
+                continue
+            data = label.encode("utf-8")
+            tar.addfile(_tar_info(f"{key}.{label_ext}", len(data)), io.BytesIO(data))
+    os.replace(tmp_file, path)
+    return os.path.getsize(path), encoded
+
+
+def _render_labels(dataset, label_format, folder_name, indent, with_source, round_bbox, first_ann_id):
+    """每张图片的标注文本 (VOC 中无标注文件的图片为 None, 不写入标注); COCO 标注id按图片顺序从 first_ann_id 开始"""
+    if label_format == "yolo":
+        class_ids, boxes = yolo_labels(dataset)
+        return [render_yolo_label(class_ids[i], boxes[i]) for i in range(dataset.num_images)]
+    if label_format == "voc":
+        objects = voc_objects(dataset)
+        return [render_voc_xml(folder_name, dataset.file_name[i], int(dataset.width[i]), int(dataset.height[i]),
+                               objects[i], indent=indent, with_source=with_source) if dataset.labeled[i] else None
+                for i in range(dataset.num_images)]
+    anns = coco_annotations(dataset, round_bbox)
+    labels = []
+    ann_id = first_ann_id
+    for i in range(dataset.num_images):
+        image_id = int(dataset.image_id[i])
+        record = {
+            "image": {"id": image_id, "file_name": dataset.file_name[i],
+                      "width": int(dataset.width[i]), "height": int(dataset.height[i])},
+            "annotations": [{"id": ann_id + j, "image_id": image_id, "category_id": category_id, "bbox": bbox,
+                             "area": area, "iscrowd": 0} for j, (category_id, bbox, area) in enumerate(anns[i])],
+        }
+        ann_id += len(anns[i])
+        labels.append(json.dumps(record, ensure_ascii=False))
+    return labels
+
+
+def write_archive(dataset, archive_root, label_format, workers=1, shard_bytes=DEFAULT_SHARD_BYTES,
+                  shard_samples=None, image_mode="copy", transform=None, indent="  ", with_source=False,
+                  round_bbox=True, first_ann_id=1, incremental=False, deduplicator=None):
+    """
+    把数据集写为 tar 分片 (格式见模块开头), 不写出任何单独的图片或标注文件
+
+    参数:
+        label_format: 样本中标注的格式 yolo | voc | coco
+        workers: 并行写出分片的进程数, 分片内容和顺序与进程数无关
+        shard_bytes: 每个分片的大小上限 (按源图片大小估算, 缩放后的分片会更小); 单个样本超过上限时独占一个分片
+        shard_samples: 每个分片的样本数上限, None 为不限制
+        image_mode: 为 none 时只写入标注, 否则写入图片内容
+        transform: transform.ImageTransform, 给出时图片在写入前缩放/重新编码 (数据集须已经过 transform.apply)
+        indent, with_source: VOC XML 的缩进和 source 信息 (见 write_voc)
+        round_bbox, first_ann_id: COCO bbox 四舍五入为整数, 第一条标注的id (整个归档中连续编号)
+
+    返回:
+        统计信息 {"images", "images_skipped", "bytes_written", "shards"}
+    """
+    if label_format not in LABEL_EXTENSIONS:
+        raise ValueError(f"未知的标注格式: {label_format}, 可选: {', '.join(LABEL_EXTENSIONS)}")
+    if incremental or deduplicator is not None:
+        raise ValueError("归档输出不支持 incremental 和 dedup")
+    os.makedirs(archive_root, exist_ok=True)
+    stats = {"images": 0, "images_skipped": 0, "bytes_written": 0, "shards": 0}
+
+    with timer("coordinates"):
+        labels = _render_labels(dataset, label_format, os.path.basename(os.path.normpath(archive_root)),
+                                indent, with_source, round_bbox, first_ann_id)
+    label_ext = LABEL_EXTENSIONS[label_format]
+
+    # 按样本顺序装入分片: 大小由源文件的 stat 得到, 不读取图片内容
+    tasks = []
+    index_splits = {}
+    for split in dataset.split_names:
+        rows = [i for i in dataset.split_rows(split) if label_format != "coco" or dataset.width[i] > 0]
+        used_keys = set()
+        shards = []
+        size = 0
+        for i in rows:
+            key = _sample_key(dataset.file_name[i], used_keys)
+            src = dataset.path[i] if image_mode != "none" else None
+            plan, fmt = None, None
+            if transform is not None:
+                plan, fmt, _ = transform.plans.get(dataset.path[i], (None, None, None))
+            image_ext = os.path.splitext(dataset.file_name[i])[1].lstrip(".").lower()
+            sample = (key, src, image_ext, plan, fmt, transform.quality if transform else None,
+                      label_ext, labels[i])
+            sample_bytes = _member_bytes(len(labels[i].encode("utf-8"))) if labels[i] is not None else 0
+            if src is not None:
+                sample_bytes += _member_bytes(os.path.getsize(src))
+            if not shards or (size + sample_bytes > shard_bytes and shards[-1]) or \
+                    (shard_samples and len(shards[-1]) >= shard_samples):
+                shards.append([])
+                size = 0
+            shards[-1].append(sample)
+            size += sample_bytes
+        for k, samples in enumerate(shards):
+            tasks.append((os.path.join(archive_root, shard_name(split, k)), samples))
+        index_splits[split] = {"samples": len(rows), "shards": [
+            {"file": shard_name(split, k), "samples": len(samples),
+             "first_key": samples[0][0], "last_key": samples[-1][0]} for k, samples in enumerate(shards)]}
+
+        # 删除上次写出的多余分片
+        pattern = re.compile(rf"{re.escape(split)}-(\d{{6}})\.tar$")
+        for name in os.listdir(archive_root):
+            match = pattern.match(name)
+            if match and int(match.group(1)) >= len(shards):
+                os.remove(os.path.join(archive_root, name))
+
+    entries = [entry for split in index_splits.values() for entry in split["shards"]]
+    with timer("write"):
+        results = iter_tasks(write_shard, tasks, workers, desc="Writing shards", chunksize=1)
+        for entry, (nbytes, encoded) in zip(entries, results):
+            entry["bytes"] = nbytes
+            stats["bytes_written"] += nbytes
+            stats["images"] += entry["samples"]
+            for src, size in encoded:
+                transform.check_size(src, size)
+
+        index = {
+            "version": ARCHIVE_VERSION,
+            "label_format": label_format,
+            "classes": dataset.class_names,
+            "categories": dataset.categories,
+            "splits": index_splits,
+        }
+        stats["bytes_written"] += write_text(os.path.join(archive_root, ARCHIVE_INDEX),
+                                             json.dumps(index, ensure_ascii=False, indent=2))
+    stats["shards"] = len(tasks)
+    count("shards_written", len(tasks))
+    count_written(stats)
+    return stats
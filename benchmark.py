@@ -0,0 +1,541 @@
+import os
+import sys
+import io
+import json
+import time
+import random
+import struct
+import shutil
+import argparse
+import tempfile
+import importlib
+import multiprocessing
+import xml.etree.ElementTree as ET
+from xml.dom import minidom
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image
+
+
+def make_placeholder_jpeg(width=64, height=48):
+    """生成一张很小的JPEG图片, 返回其字节内容"""
+    buf = io.BytesIO()
+    Image.new("RGB", (width, height), (127, 127, 127)).save(buf, "JPEG")
+    return buf.getvalue()
+
+
+def make_synthetic_coco(coco_root, num_images=1000, boxes_per_image=8, num_classes=80,
+                        split="train", width=640, height=480, polygon_points=0, seed=0):
+    """
+    生成合成COCO数据集 (annotations/instances_<split>2014.json + images/<split>2014)
+
+    参数:
+        coco_root: 输出目录
+        num_images: 图片数量
+        boxes_per_image: 每张图片的标注框数量
+        num_classes: 类别数量
+        split: 数据集划分名称
+        width, height: 标注中记录的图片尺寸 (占位图片本身很小)
+        polygon_points: 每个标注的segmentation多边形顶点数, 0 为不生成
+        seed: 随机种子
+    """
+    rng = random.Random(seed)
+    img_dir = os.path.join(coco_root, "images", f"{split}2014")
+    os.makedirs(img_dir, exist_ok=True)
+    os.makedirs(os.path.join(coco_root, "annotations"), exist_ok=True)
+
+    jpeg_bytes = make_placeholder_jpeg()
+    images = []
+    annotations = []
+    ann_id = 1
+    for img_id in range(1, num_images + 1):
+        file_name = f"{img_id:012d}.jpg"
+        with open(os.path.join(img_dir, file_name), "wb") as f:
+            f.write(jpeg_bytes)
+        images.append({"id": img_id, "file_name": file_name, "width": width, "height": height})
+        for _ in range(boxes_per_image):
+            w = rng.uniform(1, width / 2)
+            h = rng.uniform(1, height / 2)
+            x = rng.uniform(0, width - w)
+            y = rng.uniform(0, height - h)
+            ann = {
+                "id": ann_id,
+                "image_id": img_id,
+                "category_id": rng.randint(1, num_classes),
+                "bbox": [x, y, w, h],
+                "area": w * h,
+                "iscrowd": 0
+            }
+            if polygon_points:
+                ann["segmentation"] = [[round(rng.uniform(0, width), 2) if i % 2 == 0
+                                        else round(rng.uniform(0, height), 2)
+                                        for i in range(polygon_points * 2)]]
+            annotations.append(ann)
+            ann_id += 1
+
+    # COCO中标注的顺序与图片无关
+    rng.shuffle(annotations)
+    categories = [{"id": i, "name": f"class_{i}"} for i in range(1, num_classes + 1)]
+    with open(os.path.join(coco_root, "annotations", f"instances_{split}2014.json"), "w") as f:
+        json.dump({"images": images, "annotations": annotations, "categories": categories}, f)
+
+
+# 合成数据集中图片的几种尺寸 (宽, 高)
+SYNTHETIC_SIZES = [(640, 480), (1280, 720), (800, 600), (512, 512)]
+
+# placeholder: 与标注尺寸一致的纯色JPEG (每张几KB); stub: 只有文件头的JPEG (约20字节, 不能解码)
+IMAGE_KINDS = ("placeholder", "stub")
+
+
+def make_stub_jpeg(width, height):
+    """只有 SOI + SOF0 + EOI 的JPEG, 从文件头读取的尺寸与真实图片相同"""
+    sof = struct.pack(">BHHB", 8, height, width, 3) + bytes([1, 0x22, 0, 2, 0x11, 1, 3, 0x11, 1])
+    return b"\xff\xd8\xff\xc0" + struct.pack(">H", len(sof) + 2) + sof + b"\xff\xd9"
+
+
+def synthetic_samples(num_images, boxes_per_image, num_classes, seed=0):
+    """
+    生成三种格式共用的合成标注, 框的像素坐标都是整数, 作为往返转换检查的基准
+
+    返回:
+        [(文件名, 宽, 高, [(类别下标, x1, y1, x2, y2), ...]), ...]
+    """
+    rng = random.Random(seed)
+    samples = []
+    for i in range(num_images):
+        width, height = rng.choice(SYNTHETIC_SIZES)
+        objects = []
+        for _ in range(boxes_per_image):
+            w, h = rng.randint(1, width // 2), rng.randint(1, height // 2)
+            x, y = rng.randint(0, width - w), rng.randint(0, height - h)
+            objects.append((rng.randrange(num_classes), x, y, x + w, y + h))
+        samples.append((f"{i + 1:012d}.jpg", width, height, objects))
+    return samples
+
+
+def _write_images(img_dir, samples, image_kind):
+    os.makedirs(img_dir, exist_ok=True)
+    make = make_stub_jpeg if image_kind == "stub" else make_placeholder_jpeg
+    contents = {}
+    for file_name, width, height, _ in samples:
+        if (width, height) not in contents:
+            contents[(width, height)] = make(width, height)
+        with open(os.path.join(img_dir, file_name), "wb") as f:
+            f.write(contents[(width, height)])
+
+
+def make_synthetic(fmt, root, samples, class_names, image_kind="placeholder", split="train"):
+    """
+    把合成标注写为 COCO/VOC/YOLO 数据集 (不经过本项目的写出代码, 用作独立的转换输入)
+
+    参数:
+        fmt: coco | voc | yolo
+        root: 输出目录
+        samples: synthetic_samples 的返回值
+        class_names: 类别名称, 按类别下标排列
+        image_kind: placeholder | stub (见 IMAGE_KINDS)
+        split: 数据集划分名称
+    """
+    if fmt == "coco":
+        _write_images(os.path.join(root, "images", f"{split}2014"), samples, image_kind)
+        images, annotations = [], []
+        for img_id, (file_name, width, height, objects) in enumerate(samples, 1):
+            images.append({"id": img_id, "file_name": file_name, "width": width, "height": height})
+            for k, x1, y1, x2, y2 in objects:
+                annotations.append({"id": len(annotations) + 1, "image_id": img_id, "category_id": k + 1,
+                                    "bbox": [x1, y1, x2 - x1, y2 - y1], "area": (x2 - x1) * (y2 - y1),
+                                    "iscrowd": 0})
+        # COCO中标注的顺序与图片无关
+        random.Random(0).shuffle(annotations)
+        categories = [{"id": k + 1, "name": name} for k, name in enumerate(class_names)]
+        os.makedirs(os.path.join(root, "annotations"), exist_ok=True)
+        with open(os.path.join(root, "annotations", f"instances_{split}2014.json"), "w") as f:
+            json.dump({"images": images, "annotations": annotations, "categories": categories}, f)
+    elif fmt == "voc":
+        _write_images(os.path.join(root, "JPEGImages"), samples, image_kind)
+        os.makedirs(os.path.join(root, "Annotations"), exist_ok=True)
+        os.makedirs(os.path.join(root, "ImageSets", "Main"), exist_ok=True)
+        for file_name, width, height, objects in samples:
+            parts = [f"<annotation><folder>VOC</folder><filename>{file_name}</filename>"
+                     f"<size><width>{width}</width><height>{height}</height><depth>3</depth></size>"]
+            for k, x1, y1, x2, y2 in objects:
+                parts.append(f"<object><name>{class_names[k]}</name><difficult>0</difficult><bndbox>"
+                             f"<xmin>{x1}</xmin><ymin>{y1}</ymin><xmax>{x2}</xmax><ymax>{y2}</ymax>"
+                             f"</bndbox></object>")
+            parts.append("</annotation>\n")
+            with open(os.path.join(root, "Annotations", f"{os.path.splitext(file_name)[0]}.xml"), "w") as f:
+                f.write("".join(parts))
+        with open(os.path.join(root, "ImageSets", "Main", f"{split}.txt"), "w") as f:
+            f.write("".join(f"{os.path.splitext(sample[0])[0]}\n" for sample in samples))
+    elif fmt == "yolo":
+        _write_images(os.path.join(root, split, "images"), samples, image_kind)
+        os.makedirs(os.path.join(root, split, "labels"), exist_ok=True)
+        for file_name, width, height, objects in samples:
+            lines = [f"{k} {(x1 + x2) / 2 / width:.6f} {(y1 + y2) / 2 / height:.6f} "
+                     f"{(x2 - x1) / width:.6f} {(y2 - y1) / height:.6f}\n" for k, x1, y1, x2, y2 in objects]
+            with open(os.path.join(root, split, "labels", f"{os.path.splitext(file_name)[0]}.txt"), "w") as f:
+                f.write("".join(lines))
+        with open(os.path.join(root, "classes.txt"), "w") as f:
+            f.write("\n".join(class_names))
+    else:
+        raise ValueError(f"未知的数据集格式: {fmt}, 可选: coco/voc/yolo")
+
+
+def peak_rss_mb():
+    """当前进程的峰值RSS (MB)"""
+    # ru_maxrss 在Linux上会从父进程继承, 优先使用按地址空间统计的 VmHWM
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux上单位为KB, macOS上为字节
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+def _measured_call(module_name, func_name, args, kwargs):
+    func = getattr(importlib.import_module(module_name), func_name)
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+    return elapsed, peak_rss_mb(), result
+
+
+def run_measured(module_name, func_name, *args, **kwargs):
+    """在新的子进程中运行函数, 返回 (耗时秒数, 峰值RSS(MB), 返回值)"""
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as executor:
+        return executor.submit(_measured_call, module_name, func_name, args, kwargs).result()
+
+
+def _json_load(path):
+    with open(path) as f:
+        json.load(f)
+
+
+def _stream_load(path):
+    from coco_stream import load_coco_index
+    load_coco_index(path)
+
+
+def bench_coco_to_voc(num_images, boxes_per_image, num_classes, workers=1, image_mode="copy", **kwargs):
+    work_dir = tempfile.mkdtemp(prefix="bench_coco2voc_")
+    try:
+        coco_root = os.path.join(work_dir, "coco")
+        make_synthetic_coco(coco_root, num_images, boxes_per_image, num_classes)
+
+        elapsed, peak_mb, stats = run_measured("coco2voc", "coco_to_voc", coco_root,
+                                               os.path.join(work_dir, "voc"),
+                                               workers=workers, image_mode=image_mode, **kwargs)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    options = ", ".join([f"workers={workers}"] + [f"{key}={value}" for key, value in kwargs.items()])
+    print(f"coco_to_voc ({options}): {num_images} images, {num_images * boxes_per_image} boxes, "
+          f"{elapsed:.2f}s, {num_images / elapsed:.1f} images/s, {stats['bytes_written']} bytes written, "
+          f"peak RSS {peak_mb:.0f} MB")
+    for name, stage in (stats.get("stages") or {}).items():
+        print(f"    {name}: {stage['threads']} threads, {stage['items']} items, "
+              f"{stage['items_per_s']} items/s, utilization {stage['utilization']}")
+    return num_images / elapsed
+
+
+def bench_pipeline(num_images, boxes_per_image, num_classes, image_mode="copy", queue_depth=64):
+    """比较不同I/O线程数下 coco_to_voc 的吞吐量和各阶段利用率 (io_threads=0 为逐张串行)"""
+    rates = {}
+    for io_threads in (0, 1, 2, 4, 8, 16):
+        rates[io_threads] = bench_coco_to_voc(num_images, boxes_per_image, num_classes, 1, image_mode,
+                                              io_threads=io_threads, queue_depth=queue_depth)
+    best = max(rates, key=rates.get)
+    print(f"best io_threads={best}: {rates[best] / rates[0]:.2f}x of serial")
+    return rates
+
+
+def bench_coco_memory(num_images, boxes_per_image, num_classes, polygon_points=32):
+    """比较整体 json.load 与流式读取/转换的峰值内存"""
+    work_dir = tempfile.mkdtemp(prefix="bench_coco_memory_")
+    try:
+        coco_root = os.path.join(work_dir, "coco")
+        make_synthetic_coco(coco_root, num_images, boxes_per_image, num_classes,
+                            polygon_points=polygon_points)
+        make_synthetic_coco(coco_root, max(1, num_images // 10), boxes_per_image, num_classes,
+                            split="val", polygon_points=polygon_points)
+        ann_file = os.path.join(coco_root, "annotations", "instances_train2014.json")
+        print(f"{ann_file}: {os.path.getsize(ann_file) / 1024 / 1024:.1f} MB")
+
+        runs = [
+            ("json.load", "benchmark", "_json_load", (ann_file,), {}),
+            ("load_coco_index", "benchmark", "_stream_load", (ann_file,), {}),
+            ("coco_to_voc", "coco2voc", "coco_to_voc",
+             (coco_root, os.path.join(work_dir, "voc")), {"image_mode": "none"}),
+            ("coco_to_yolo", "coco2yolo", "coco_to_yolo",
+             (coco_root, os.path.join(work_dir, "yolo")), {}),
+        ]
+        for name, module_name, func_name, args, kwargs in runs:
+            elapsed, peak_mb, _ = run_measured(module_name, func_name, *args, **kwargs)
+            print(f"{name}: {elapsed:.2f}s, peak RSS {peak_mb:.0f} MB")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def _minidom_voc_xml(folder, filename, width, height, objects, indent="  "):
+    """原来的 ElementTree -> minidom 写法, 作为对照"""
+    annotation = ET.Element("annotation")
+    ET.SubElement(annotation, "folder").text = folder
+    ET.SubElement(annotation, "filename").text = filename
+    size = ET.SubElement(annotation, "size")
+    ET.SubElement(size, "width").text = str(width)
+    ET.SubElement(size, "height").text = str(height)
+    ET.SubElement(size, "depth").text = "3"
+    for name, xmin, ymin, xmax, ymax in objects:
+        obj = ET.SubElement(annotation, "object")
+        ET.SubElement(obj, "name").text = name
+        ET.SubElement(obj, "pose").text = "Unspecified"
+        ET.SubElement(obj, "truncated").text = "0"
+        ET.SubElement(obj, "difficult").text = "0"
+        bndbox = ET.SubElement(obj, "bndbox")
+        ET.SubElement(bndbox, "xmin").text = str(xmin)
+        ET.SubElement(bndbox, "ymin").text = str(ymin)
+        ET.SubElement(bndbox, "xmax").text = str(xmax)
+        ET.SubElement(bndbox, "ymax").text = str(ymax)
+    return minidom.parseString(ET.tostring(annotation, "utf-8")).toprettyxml(indent=indent)
+
+
+def bench_voc_xml(num_files, boxes_per_image, num_classes, seed=0):
+    """比较 minidom 与 voc_writer 生成VOC标注XML的速度 (只计生成文本, 不含写盘)"""
+    from voc_writer import render_voc_xml
+
+    rng = random.Random(seed)
+    samples = []
+    for i in range(num_files):
+        objects = []
+        for _ in range(boxes_per_image):
+            xmin, ymin = rng.randint(0, 600), rng.randint(0, 440)
+            objects.append((f"class_{rng.randrange(num_classes)}", xmin, ymin,
+                            xmin + rng.randint(1, 40), ymin + rng.randint(1, 40)))
+        samples.append(("voc", f"{i:012d}.jpg", 640, 480, objects))
+
+    rates = {}
+    for name, render in [("minidom", _minidom_voc_xml), ("voc_writer", render_voc_xml)]:
+        start = time.perf_counter()
+        outputs = [render(*sample, indent="  ") for sample in samples]
+        elapsed = time.perf_counter() - start
+        rates[name] = num_files / elapsed
+        print(f"{name}: {num_files} files, {elapsed:.2f}s, {rates[name]:.0f} files/s")
+        if name == "minidom":
+            expected = outputs
+        elif outputs != expected:
+            raise AssertionError("voc_writer 输出与 minidom 不一致")
+    print(f"speedup: {rates['voc_writer'] / rates['minidom']:.1f}x")
+    return rates
+
+
+def bench_split(num_images, boxes_per_image, num_classes, seed=0):
+    """比较随机划分与分层划分的耗时和各划分的类别偏差 (只在内存中构造数据集, 不读写文件)"""
+    import numpy as np
+    from split import random_split, stratified_split, DEFAULT_RATIOS
+
+    rng = np.random.default_rng(seed)
+    # 每张图片 0~2*boxes_per_image 个框, 类别服从长尾分布
+    counts = rng.integers(0, 2 * boxes_per_image + 1, num_images)
+    image_idx = np.repeat(np.arange(num_images), counts)
+    class_idx = np.minimum(rng.zipf(1.5, len(image_idx)) - 1, num_classes - 1)
+    print(f"{num_images} images, {len(image_idx)} boxes, {num_classes} classes")
+
+    weights = np.asarray(list(DEFAULT_RATIOS.values()))
+    present = np.unique(image_idx * num_classes + class_idx)
+    for name, func, args in [
+        ("random", random_split, (num_images, DEFAULT_RATIOS, seed)),
+        ("stratified", stratified_split, (num_images, image_idx, class_idx, num_classes, DEFAULT_RATIOS, seed)),
+    ]:
+        start = time.perf_counter()
+        assign = func(*args)
+        elapsed = time.perf_counter() - start
+
+        # 每个类别出现的图片在各划分中的比例与目标比例的偏差 (只统计至少出现10次的类别)
+        hist = np.bincount(assign[present // num_classes] * num_classes + present % num_classes,
+                           minlength=len(weights) * num_classes).reshape(len(weights), num_classes)
+        total = hist.sum(axis=0)
+        frequent = total >= 10
+        deviation = np.abs(hist[:, frequent] / total[frequent] - weights[:, None])
+        print(f"{name}: {elapsed:.2f}s, images per split {np.bincount(assign).tolist()}, "
+              f"class ratio deviation mean {deviation.mean():.4f} max {deviation.max():.4f}")
+
+
+# 六个转换函数: (函数名, 模块名, 输入格式, 输出格式)
+CONVERSIONS = [
+    ("coco_to_voc", "coco2voc", "coco", "voc"),
+    ("coco_to_yolo", "coco2yolo", "coco", "yolo"),
+    ("voc_to_coco", "voc2coco", "voc", "coco"),
+    ("voc_to_yolo", "voc2yolo", "voc", "yolo"),
+    ("yolo_to_coco", "yolo2coco", "yolo", "coco"),
+    ("yolo_to_voc", "yolo2voc", "yolo", "voc"),
+]
+
+
+def read_output(fmt, root):
+    """用 readers 读回转换结果; YOLO 的类别名称取自 classes.txt"""
+    from readers import read_coco, read_voc, read_yolo
+
+    if fmt == "coco":
+        return read_coco(root)
+    if fmt == "voc":
+        return read_voc(root, splits=None)
+    classes_file = os.path.join(root, "classes.txt")
+    class_names = None
+    if os.path.exists(classes_file):
+        with open(classes_file) as f:
+            class_names = f.read().splitlines()
+    return read_yolo(root, class_names=class_names)
+
+
+def check_round_trip(dataset, samples, class_names, tolerance=1.0):
+    """
+    比较转换结果与合成标注: 按文件名匹配图片, 同一图片内的框按坐标排序后逐个比较
+
+    参数:
+        dataset: 读回的转换结果 (Dataset)
+        samples: synthetic_samples 的返回值
+        class_names: 合成标注的类别名称; 结果中的类别名称全为数字时视为YOLO类别编号
+        tolerance: 允许的坐标偏差 (像素)
+
+    返回:
+        {"images", "missing", "count_mismatch", "class_mismatch", "boxes_over_tolerance", "max_drift", "ok"}
+    """
+    import numpy as np
+
+    truth = {os.path.splitext(file_name)[0]: objects for file_name, _, _, objects in samples}
+    names = dataset.class_names
+    if names and all(name.isdigit() for name in names):
+        names = [class_names[int(name)] for name in names]
+    names = np.asarray(names + [""])
+    offsets = dataset.box_offsets()
+
+    result = {"images": 0, "missing": 0, "count_mismatch": 0, "class_mismatch": 0,
+              "boxes_over_tolerance": 0, "max_drift": 0.0}
+    seen = set()
+    for i, file_name in enumerate(dataset.file_name):
+        stem = os.path.splitext(file_name)[0]
+        objects = truth.get(stem)
+        if objects is None or stem in seen:
+            continue
+        seen.add(stem)
+        result["images"] += 1
+        start, end = offsets[i], offsets[i + 1]
+        if end - start != len(objects):
+            result["count_mismatch"] += 1
+            continue
+        if not objects:
+            continue
+        expected = np.asarray([obj[1:] for obj in objects], dtype=np.float64)
+        expected_names = np.asarray([class_names[obj[0]] for obj in objects])
+        actual = dataset.boxes[start:end]
+        actual_names = names[dataset.class_idx[start:end]]
+        # 各格式中同一图片内框的顺序可能不同
+        expected_order = np.lexsort((expected_names,) + tuple(np.round(expected, 1).T[::-1]))
+        actual_order = np.lexsort((actual_names,) + tuple(np.round(actual, 1).T[::-1]))
+        drift = np.abs(actual[actual_order] - expected[expected_order]).max(axis=1)
+        result["boxes_over_tolerance"] += int((drift > tolerance).sum())
+        result["max_drift"] = max(result["max_drift"], float(drift.max()))
+        result["class_mismatch"] += int((actual_names[actual_order] != expected_names[expected_order]).sum())
+    result["missing"] = len(truth) - len(seen)
+    result["max_drift"] = round(result["max_drift"], 6)
+    result["ok"] = not (result["missing"] or result["count_mismatch"] or result["class_mismatch"]
+                        or result["boxes_over_tolerance"])
+    return result
+
+
+def bench_conversions(num_images, boxes_per_image, num_classes, workers=1, image_mode="copy",
+                      image_kind="placeholder", tolerance=1.0, report=None, **kwargs):
+    """
+    依次运行六个转换函数 (各在新的子进程中), 记录吞吐量、峰值RSS和写入字节数, 并检查往返转换的坐标偏差
+
+    参数:
+        image_mode: 图片落盘方式; 为 none 时输出中没有图片, 无法读回, 不做往返检查
+        image_kind: 合成图片的类型 (见 IMAGE_KINDS)
+        tolerance: 往返检查允许的坐标偏差 (像素)
+        report: 结果JSON的输出路径, 为 None 时不写文件
+        kwargs: 传给每个转换函数的其他参数 (如 io_threads)
+
+    返回:
+        {函数名: {"seconds", "images_per_s", "peak_rss_mb", "bytes_written", "round_trip"}}
+    """
+    samples = synthetic_samples(num_images, boxes_per_image, num_classes)
+    class_names = [f"class_{k}" for k in range(num_classes)]
+    results = {}
+    work_dir = tempfile.mkdtemp(prefix="bench_conversions_")
+    try:
+        for fmt in ("coco", "voc", "yolo"):
+            make_synthetic(fmt, os.path.join(work_dir, fmt), samples, class_names, image_kind)
+
+        for func_name, module_name, src_fmt, dst_fmt in CONVERSIONS:
+            output_dir = os.path.join(work_dir, func_name)
+            options = dict(kwargs, workers=workers, image_mode=image_mode)
+            if src_fmt == "yolo" and dst_fmt == "coco":
+                options.update(splits=["train"], class_names=class_names)
+            elapsed, peak_mb, stats = run_measured(module_name, func_name, os.path.join(work_dir, src_fmt),
+                                                   output_dir, **options)
+            row = {"seconds": round(elapsed, 3), "images_per_s": round(num_images / elapsed, 1),
+                   "peak_rss_mb": round(peak_mb, 1), "bytes_written": stats["bytes_written"],
+                   "round_trip": None}
+            line = (f"{func_name}: {elapsed:.2f}s, {row['images_per_s']} images/s, "
+                    f"peak RSS {peak_mb:.0f} MB, {stats['bytes_written']} bytes written")
+            if image_mode != "none":
+                check = row["round_trip"] = check_round_trip(read_output(dst_fmt, output_dir), samples,
+                                                             class_names, tolerance)
+                line += f", max drift {check['max_drift']}px"
+                if not check["ok"]:
+                    line += (f", FAILED (missing {check['missing']}, count mismatch {check['count_mismatch']}, "
+                             f"class mismatch {check['class_mismatch']}, "
+                             f"{check['boxes_over_tolerance']} boxes over {tolerance}px)")
+            print(line)
+            results[func_name] = row
+            shutil.rmtree(output_dir, ignore_errors=True)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if report is not None:
+        with open(report, "w", encoding="utf-8") as f:
+            json.dump({"images": num_images, "boxes_per_image": boxes_per_image, "classes": num_classes,
+                       "workers": workers, "image_mode": image_mode, "image_kind": image_kind,
+                       "tolerance": tolerance, "results": results}, f, ensure_ascii=False, indent=2)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="转换器吞吐量与内存测试")
+    parser.add_argument("--images", type=int, default=2000, help="合成图片数量")
+    parser.add_argument("--boxes", type=int, default=8, help="每张图片的标注框数量")
+    parser.add_argument("--classes", type=int, default=80, help="类别数量")
+    parser.add_argument("--workers", type=int, default=1, help="并行进程数, <=0 为全部CPU核心")
+    parser.add_argument("--image-mode", default="copy", help="图片落盘方式: copy/hardlink/symlink/reflink/none")
+    parser.add_argument("--memory", action="store_true", help="测试COCO标注读取/转换的峰值RSS")
+    parser.add_argument("--voc-xml", action="store_true", help="比较VOC标注XML的生成速度")
+    parser.add_argument("--split", action="store_true", help="测试随机/分层划分的速度和类别偏差")
+    parser.add_argument("--pipeline", action="store_true", help="比较不同I/O线程数下流水线的吞吐量")
+    parser.add_argument("--queue-depth", type=int, default=64, help="流水线中同时在途的图片数上限")
+    parser.add_argument("--all", action="store_true", help="测试全部六个转换函数并检查往返转换的坐标偏差")
+    parser.add_argument("--image-kind", default="placeholder", choices=IMAGE_KINDS,
+                        help="合成图片: placeholder 为纯色小图, stub 为只有文件头的JPEG")
+    parser.add_argument("--tolerance", type=float, default=1.0, help="往返检查允许的坐标偏差 (像素)")
+    parser.add_argument("--report", help="--all 的结果JSON输出路径")
+    args = parser.parse_args()
+
+    if args.memory:
+        bench_coco_memory(args.images, args.boxes, args.classes)
+    elif args.voc_xml:
+        bench_voc_xml(args.images, args.boxes, args.classes)
+    elif args.split:
+        bench_split(args.images, args.boxes, args.classes)
+    elif args.all:
+        results = bench_conversions(args.images, args.boxes, args.classes, args.workers, args.image_mode,
+                                    args.image_kind, args.tolerance, args.report)
+        if any(row["round_trip"] is not None and not row["round_trip"]["ok"] for row in results.values()):
+            sys.exit(1)
+    elif args.pipeline:
+        bench_pipeline(args.images, args.boxes, args.classes, args.image_mode, args.queue_depth)
+    else:
+        bench_coco_to_voc(args.images, args.boxes, args.classes, args.workers, args.image_mode)
@@ -1,105 +1,50 @@
-import os
-import json
-import shutil
-from PIL import Image
-import xml.etree.ElementTree as ET
-from xml.dom import minidom
-from tqdm import tqdm
-
-def coco_to_voc(coco_root, output_dir="VOCDataset"):
-    # 创建VOC目录结构
-    os.makedirs(f"{output_dir}/JPEGImages", exist_ok=True)
-    os.makedirs(f"{output_dir}/Annotations", exist_ok=True)
-    os.makedirs(f"{output_dir}/ImageSets/Main", exist_ok=True)
-
-    # 获取父文件夹名称
-    folder_name = os.path.basename(os.path.normpath(output_dir))
-    
-    # 加载COCO标注
-    categories = {}
-    for split in ["train", "val"]:
-        ann_file = f"{coco_root}/annotations/instances_{split}2014.json"
-        if not os.path.exists(ann_file):
-            continue
-
-        with open(ann_file) as f:
-            data = json.load(f)
-        
-        # 建立类别映射
-        categories.update({cat["id"]: cat["name"] for cat in data["categories"]})
-
-        # 处理图片和标注
-        image_sets = []
-        for img in tqdm(data["images"], desc=f"Processing {split} set"):
-            # 复制图片
-            src_img = f"{coco_root}/images/{split}2014/{img['file_name']}"
-            dst_img = f"{output_dir}/JPEGImages/{img['file_name']}"
-            shutil.copy(src_img, dst_img)
-            image_sets.append(os.path.splitext(img['file_name'])[0])
-
-            # 创建XML标注
-            annotation = ET.Element("annotation")
-            ET.SubElement(annotation, "folder").text = folder_name  # 修改点1：使用父文件夹名称
-            ET.SubElement(annotation, "filename").text = img['file_name']
-            size = ET.SubElement(annotation, "size")
-            ET.SubElement(size, "width").text = str(img['width'])
-            ET.SubElement(size, "height").text = str(img['height'])
-            ET.SubElement(size, "depth").text = "3"
-
-            # 添加标注信息
-            for ann in data["annotations"]:
-                if ann["image_id"] == img["id"]:
-                    # 转换坐标并四舍五入为整数
-                    bbox = ann["bbox"]
-                    x = bbox[0]
-                    y = bbox[1]
-                    w = bbox[2]
-                    h = bbox[3]
-                    
-                    # 计算边界坐标
-                    xmin = max(0, round(x))
-                    ymin = max(0, round(y))
-                    xmax = min(img['width'], round(x + w))
-                    ymax = min(img['height'], round(y + h))
-
-                    # 跳过无效标注
-                    if xmin >= xmax or ymin >= ymax:
-                        continue
-
-                    obj = ET.SubElement(annotation, "object")
-                    ET.SubElement(obj, "name").text = categories[ann["category_id"]]
-                    ET.SubElement(obj, "pose").text = "Unspecified"
-                    ET.SubElement(obj, "truncated").text = "0"
-                    ET.SubElement(obj, "difficult").text = "0"
-                    
-                    bndbox = ET.SubElement(obj, "bndbox")
-                    # 修改点2：使用整数坐标
-                    ET.SubElement(bndbox, "xmin").text = str(xmin)
-                    ET.SubElement(bndbox, "ymin").text = str(ymin)
-                    ET.SubElement(bndbox, "xmax").text = str(xmax)
-                    ET.SubElement(bndbox, "ymax").text = str(ymax)
-
-            # 保存XML文件
-            xml_str = ET.tostring(annotation, 'utf-8')
-            pretty_xml = minidom.parseString(xml_str).toprettyxml(indent="  ")
-            xml_path = f"{output_dir}/Annotations/{os.path.splitext(img['file_name'])[0]}.xml"
-            with open(xml_path, "w") as f:
-                f.write(pretty_xml)
-
-        # 保存图像集文件
-        with open(f"{output_dir}/ImageSets/Main/{split}.txt", "w") as f:
-            f.write("\n".join(image_sets))
-
-    # 生成classes.txt
-    with open(f"{output_dir}/classes.txt", "w") as f:
-        unique_categories = sorted(set(categories.values()), 
-                                key=lambda x: list(categories.values()).index(x))
-        f.write("\n".join(unique_categories))
-
-    print(f"VOC数据集已生成到 {output_dir}")
+from archive import DEFAULT_SHARD_BYTES
+from fileio import write_text
+from instrument import log, measure_run
+from readers import read_coco
+from parallel import DEFAULT_IO_THREADS, DEFAULT_QUEUE_DEPTH
+from subset import select_subset
+from writers import write_converted, write_voc
+
+
+def coco_to_voc(coco_root, output_dir="VOCDataset", workers=1, image_mode="copy", incremental=False,
+                io_threads=DEFAULT_IO_THREADS, queue_depth=DEFAULT_QUEUE_DEPTH, packed=False,
+                dedup=None, hash_index=None, resize=None, letterbox=False,
+                image_format=None, quality=None, archive=False, shard_bytes=DEFAULT_SHARD_BYTES,
+                keep_classes=None, exclude_classes=None, class_map=None, min_area=None, drop_empty=False,
+                verbose=False, report=None, profile=None):
+    # verbose 显示进度条和信息输出; report 为JSON统计报告路径; profile 为 .prof/.html 性能剖析输出路径
+    # dedup 为 link/merge 时按内容去重图片 (见 dedup.py), hash_index 为多次转换共用的哈希索引
+    # resize/letterbox/image_format/quality 为转换时缩放和重新编码图片 (见 transform.py), 标注框随之换算
+    # archive 为样本直接写入 tar 分片 (见 archive.py), shard_bytes 为每个分片的大小上限
+    with measure_run("coco_to_voc", report, profile, verbose) as metrics:
+        # 流式读取COCO标注, 分片格式时用 workers 个进程并行读取各分片
+        dataset = read_coco(coco_root, splits=("train", "val"), workers=workers)
+
+        # 只保留选中的类别/标注框/图片 (见 subset.py), 之后的去重、缩放和写出只处理选中的图片
+        dataset = select_subset(dataset, keep_classes, exclude_classes, class_map, min_area, drop_empty)
+
+        # 去重、缩放后写出 (见 writers.write_converted); 写出前坐标四舍五入为整数,
+        # 裁剪到图片范围内并跳过无效标注; 打包时 VOC 样式保存在索引中, 需要时用 packed.py 展开为每张图片一个XML
+        stats = write_converted(
+            dataset, output_dir, write_voc, "voc",
+            prepare=lambda dataset: dataset.round_boxes().clip_boxes().drop_invalid(),
+            workers=workers, image_mode=image_mode, incremental=incremental, io_threads=io_threads,
+            queue_depth=queue_depth, dedup=dedup, hash_index=hash_index, resize=resize, letterbox=letterbox,
+            image_format=image_format, quality=quality, packed=packed,
+            voc_style={"indent": "  ", "with_source": False, "image_set_eol": False, "classes_eol": False},
+            archive=archive, shard_bytes=shard_bytes, indent="  ")
+        if not (archive or packed):
+            # 生成classes.txt
+            unique_categories = list(dict.fromkeys(dataset.class_names))
+            stats["bytes_written"] += write_text(f"{output_dir}/classes.txt", "\n".join(unique_categories))
+
+        log(f"VOC数据集已生成到 {output_dir}，写入 {stats['bytes_written']} 字节")
+    stats["report"] = metrics.report()
+    return stats
 
 
 # 使用示例
 if __name__ == "__main__":
     # COCO转VOC
-    coco_to_voc("./yolo2coco","./coco2voc")
\ No newline at end of file
+    coco_to_voc("./yolo2coco","./coco2voc", verbose=True)
@@ -1,47 +1,38 @@
-import os
-import json
-from pycocotools.coco import COCO
-from tqdm import tqdm
-
-
-def coco_to_yolo(coco_root, yolo_output):
-    # 创建YOLO目录结构
-    splits = {"train2014": "train", "val2014": "val"}
-    for s in splits.values():
-        os.makedirs(os.path.join(yolo_output, s, "images"), exist_ok=True)
-        os.makedirs(os.path.join(yolo_output, s, "labels"), exist_ok=True)
-
-    # 保存类别文件
-    coco = COCO(os.path.join(coco_root, "annotations/instances_train2014.json"))
-    class_list = [coco.cats[cat_id]['name'] for cat_id in sorted(coco.cats.keys())]
-    with open(os.path.join(yolo_output, "classes.txt"), 'w') as f:
-        f.write("\n".join(class_list))
-
-    # 处理每个split
-    for coco_split, yolo_split in splits.items():
-        coco = COCO(os.path.join(coco_root, f"annotations/instances_{coco_split}.json"))
-
-        for img_id in tqdm(coco.imgs, desc=f"Processing {coco_split}"):
-            img_info = coco.loadImgs(img_id)[0]
-            ann_ids = coco.getAnnIds(imgIds=img_id)
-            anns = coco.loadAnns(ann_ids)
-
-            # 生成YOLO标签文件
-            txt_path = os.path.join(yolo_output, yolo_split, "labels",
-                                    f"{os.path.splitext(img_info['file_name'])[0]}.txt")
-            with open(txt_path, 'w') as f:
-                for ann in anns:
-                    class_id = sorted(coco.cats.keys()).index(ann['category_id'])
-                    x, y, w, h = ann['bbox']
-                    x_center = (x + w / 2) / img_info['width']
-                    y_center = (y + h / 2) / img_info['height']
-                    bw = w / img_info['width']
-                    bh = h / img_info['height']
-                    f.write(f"{class_id} {x_center:.6f} {y_center:.6f} {bw:.6f} {bh:.6f}\n")
+from archive import DEFAULT_SHARD_BYTES
+from instrument import measure_run
+from readers import read_coco
+from parallel import DEFAULT_IO_THREADS, DEFAULT_QUEUE_DEPTH
+from subset import select_subset
+from writers import write_converted, write_yolo
+
+
+def coco_to_yolo(coco_root, yolo_output, workers=1, image_mode="none", incremental=False,
+                 io_threads=DEFAULT_IO_THREADS, queue_depth=DEFAULT_QUEUE_DEPTH, packed=False,
+                 dedup=None, hash_index=None, resize=None, letterbox=False,
+                 image_format=None, quality=None, archive=False, shard_bytes=DEFAULT_SHARD_BYTES,
+                 keep_classes=None, exclude_classes=None, class_map=None, min_area=None, drop_empty=False,
+                 verbose=False, report=None, profile=None):
+    # 默认只生成标签 (image_mode="none"), 需要图片时可指定 copy/hardlink/symlink/reflink
+    # 类别编号为category_id排序后的下标, 归一化对全部标注框一次性完成; 分片格式的标注并行读取
+    with measure_run("coco_to_yolo", report, profile, verbose) as metrics:
+        dataset = read_coco(coco_root, splits=("train", "val"), workers=workers).sort_categories()
+
+        # 只保留选中的类别/标注框/图片 (见 subset.py), 之后的去重、缩放和写出只处理选中的图片
+        dataset = select_subset(dataset, keep_classes, exclude_classes, class_map, min_area, drop_empty)
+
+        # 去重、缩放后写出 (见 writers.write_converted), 也可写为打包格式或 tar 分片
+        stats = write_converted(
+            dataset, yolo_output, write_yolo, "yolo", workers=workers, image_mode=image_mode,
+            incremental=incremental, io_threads=io_threads, queue_depth=queue_depth, dedup=dedup,
+            hash_index=hash_index, resize=resize, letterbox=letterbox, image_format=image_format,
+            quality=quality, packed=packed, archive=archive, shard_bytes=shard_bytes)
+    stats["report"] = metrics.report()
+    return stats
 
 
 if __name__ == "__main__":
     coco_to_yolo(
         coco_root="./datasets/coco2014",
-        yolo_output="./coco2yolo"
+        yolo_output="./coco2yolo",
+        verbose=True
     )
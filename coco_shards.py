@@ -0,0 +1,208 @@
+import os
+import re
+import json
+import argparse
+from coco_stream import CocoWriter, iter_coco
+from fileio import write_text
+from instrument import log, measure_run, timer
+
+# 分片格式: 一个划分的标注拆为多个标准COCO文件, 另有一个很小的索引
+#   annotations/instances_{dir}-{k:05d}-of-{n:05d}.json: 第 k 个分片, 可单独读取;
+#       图片id为全局id, 标注id在分片内从 first_ann_id 开始
+#   annotations/instances_{dir}.shards.json: 索引, 记录各分片的图片数、标注数和标注id偏移量
+#       (全局标注id = 分片内id + ann_id_offset)、顶层字段和类别表
+#   多台机器各写一个分片时, 每个分片旁边另写 .meta.json, 全部完成后由 build_shard_index 合成索引
+SHARD_INDEX_VERSION = 1
+
+_SHARD_PATTERN = re.compile(r"instances_(.+)-(\d{5})-of-(\d{5})\.json$")
+
+
+def shard_file_name(dir_name, shard, num_shards):
+    return f"instances_{dir_name}-{shard:05d}-of-{num_shards:05d}.json"
+
+
+def shard_index_path(ann_dir, dir_name):
+    return os.path.join(ann_dir, f"instances_{dir_name}.shards.json")
+
+
+def _meta_path(shard_path):
+    return f"{shard_path[:-len('.json')]}.meta.json"
+
+
+def list_shards(ann_dir, dir_name):
+    """目录中某个划分的分片文件 [(序号, 分片总数, 路径), ...], 按序号排列"""
+    if not os.path.isdir(ann_dir):
+        return []
+    shards = []
+    for name in os.listdir(ann_dir):
+        match = _SHARD_PATTERN.match(name)
+        if match and match.group(1) == dir_name:
+            shards.append((int(match.group(2)), int(match.group(3)), os.path.join(ann_dir, name)))
+    return sorted(shards)
+
+
+def find_shards(ann_dir, dir_name):
+    """某个划分的分片文件路径, 有索引时以索引为准; 不是分片格式时返回空列表"""
+    index_file = shard_index_path(ann_dir, dir_name)
+    if os.path.exists(index_file):
+        with open(index_file, encoding="utf-8") as f:
+            index = json.load(f)
+        return [os.path.join(ann_dir, shard["file"]) for shard in index["shards"]]
+    return [path for _, _, path in list_shards(ann_dir, dir_name)]
+
+
+def remove_shards(ann_dir, dir_name, keep_total=None):
+    """删除某个划分的分片文件、meta 和索引; keep_total 不为 None 时保留分片总数相同的分片"""
+    for _, total, path in list_shards(ann_dir, dir_name):
+        if total != keep_total:
+            for stale in (path, _meta_path(path)):
+                if os.path.exists(stale):
+                    os.remove(stale)
+    index_file = shard_index_path(ann_dir, dir_name)
+    if keep_total is None and os.path.exists(index_file):
+        os.remove(index_file)
+
+
+def _split_header(coco_data):
+    """COCO顶层字段的顺序和除 images/annotations/categories 以外的字段值"""
+    keys = list(coco_data)
+    header = {key: value for key, value in coco_data.items() if key not in ("images", "annotations", "categories")}
+    return keys, header
+
+
+def write_shard_meta(shard_path, coco_data, images, annotations):
+    """只写出单个分片时记录其统计信息, 返回写入的字节数"""
+    keys, header = _split_header(coco_data)
+    meta = {"keys": keys, "header": header, "categories": coco_data["categories"],
+            "images": images, "annotations": annotations}
+    return write_text(_meta_path(shard_path), json.dumps(meta, ensure_ascii=False))
+
+
+def write_shard_index(ann_dir, dir_name, coco_data, shards):
+    """
+    写出分片索引
+
+    参数:
+        coco_data: 写出分片时的顶层字段 (决定合并后的字段顺序和 info/licenses 等)
+        shards: [{"file", "images", "annotations"}, ...], 按分片序号排列
+
+    返回:
+        写入的字节数
+    """
+    keys, header = _split_header(coco_data)
+    entries = []
+    offset = 0
+    for shard in shards:
+        entries.append(dict(shard, ann_id_offset=offset))
+        offset += shard["annotations"]
+    index = {
+        "version": SHARD_INDEX_VERSION,
+        "num_shards": len(entries),
+        "images": sum(shard["images"] for shard in entries),
+        "annotations": offset,
+        "keys": keys,
+        "header": header,
+        "categories": coco_data["categories"],
+        "shards": entries,
+    }
+    return write_text(shard_index_path(ann_dir, dir_name), json.dumps(index, ensure_ascii=False, indent=2))
+
+
+def build_shard_index(coco_root, dir_name):
+    """
+    多台机器分别写出各分片 (write_coco 的 shard_index 参数) 后, 由各分片的 .meta.json 生成索引
+
+    返回:
+        分片数量; 缺少分片或 meta 时抛出 ValueError
+    """
+    ann_dir = os.path.join(coco_root, "annotations")
+    shards = list_shards(ann_dir, dir_name)
+    totals = {total for _, total, _ in shards}
+    if len(totals) != 1:
+        raise ValueError(f"{ann_dir}: {dir_name} 的分片总数不一致或没有分片: {sorted(totals)}")
+    total = totals.pop()
+    missing = sorted(set(range(total)) - {shard for shard, _, _ in shards})
+    if missing:
+        raise ValueError(f"{ann_dir}: {dir_name} 缺少分片 {missing}")
+
+    entries = []
+    coco_data = None
+    for _, _, path in shards:
+        meta_file = _meta_path(path)
+        if not os.path.exists(meta_file):
+            raise ValueError(f"缺少分片统计信息 {meta_file}")
+        with open(meta_file, encoding="utf-8") as f:
+            meta = json.load(f)
+        if coco_data is None:
+            coco_data = {key: meta["header"].get(key, []) for key in meta["keys"]}
+            coco_data["categories"] = meta["categories"]
+        elif meta["categories"] != coco_data["categories"]:
+            raise ValueError(f"{path} 的类别表与第一个分片不同")
+        entries.append({"file": os.path.basename(path), "images": meta["images"],
+                        "annotations": meta["annotations"]})
+    write_shard_index(ann_dir, dir_name, coco_data, entries)
+    for _, _, path in shards:
+        os.remove(_meta_path(path))
+    return total
+
+
+def merge_shards(coco_root, dir_name, output=None, compact=False):
+    """
+    把一个划分的分片按顺序拼接为单个COCO文件: 图片记录原样写出, 标注id加上分片的偏移量;
+    逐条流式处理, 内存中只有一条记录
+
+    参数:
+        dir_name: 划分目录名 (如 train2014)
+        output: 输出路径, 默认为 annotations/instances_{dir_name}.json
+        compact: 输出不带缩进的紧凑JSON
+
+    返回:
+        {"images", "annotations", "bytes_written"}
+    """
+    ann_dir = os.path.join(coco_root, "annotations")
+    index_file = shard_index_path(ann_dir, dir_name)
+    if not os.path.exists(index_file):
+        build_shard_index(coco_root, dir_name)
+    with open(index_file, encoding="utf-8") as f:
+        index = json.load(f)
+
+    coco_data = {key: index["header"].get(key, []) for key in index["keys"]}
+    coco_data["categories"] = index["categories"]
+    output = output or os.path.join(ann_dir, f"instances_{dir_name}.json")
+    with timer("merge"), CocoWriter(output, coco_data, indent=None if compact else 2) as writer:
+        for shard in index["shards"]:
+            offset = shard["ann_id_offset"]
+            for section, item in iter_coco(os.path.join(ann_dir, shard["file"]), ("images", "annotations")):
+                if section == "annotations":
+                    item["id"] += offset
+                writer.add(section, item)
+    return {"images": writer.counts["images"], "annotations": writer.counts["annotations"],
+            "bytes_written": writer.bytes_written}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="COCO分片: 生成索引 / 合并为单个标注文件")
+    parser.add_argument("command", choices=["index", "merge"],
+                        help="index: 由各分片的统计信息生成索引; merge: 合并为 instances_{dir}.json")
+    parser.add_argument("coco_root", help="COCO数据集根目录")
+    parser.add_argument("--dirs", nargs="*", default=["train2014", "val2014"], help="要处理的划分目录名")
+    parser.add_argument("--compact", action="store_true", help="合并输出不带缩进的紧凑JSON")
+    parser.add_argument("--remove-shards", action="store_true", help="合并后删除分片和索引")
+    parser.add_argument("--verbose", action="store_true", help="显示信息输出")
+    parser.add_argument("--report", help="写出JSON统计报告的路径")
+    args = parser.parse_args()
+
+    with measure_run(f"coco_shards_{args.command}", args.report, verbose=args.verbose):
+        ann_dir = os.path.join(args.coco_root, "annotations")
+        for dir_name in args.dirs:
+            if not list_shards(ann_dir, dir_name):
+                log(f"{dir_name}: 没有分片, 跳过")
+                continue
+            if args.command == "index":
+                print(f"{dir_name}: 已生成 {build_shard_index(args.coco_root, dir_name)} 个分片的索引")
+                continue
+            stats = merge_shards(args.coco_root, dir_name, compact=args.compact)
+            if args.remove_shards:
+                remove_shards(ann_dir, dir_name)
+            print(f"{dir_name}: 已合并 {stats['images']} 张图片, {stats['annotations']} 个标注, "
+                  f"写入 {stats['bytes_written']} 字节")
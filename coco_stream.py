@@ -0,0 +1,253 @@
+import os
+import json
+import shutil
+
+_CHUNK_SIZE = 1 << 20
+_WHITESPACE = " \t\n\r"
+
+
+class _StreamParser:
+    """在分块读取的文本上逐个解析JSON值, 只保留尚未消费的部分"""
+
+    def __init__(self, f):
+        self.f = f
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self):
+        chunk = self.f.read(_CHUNK_SIZE)
+        if not chunk:
+            self.eof = True
+            return False
+        # 丢弃已消费的内容, 使缓冲区大小与单条记录相当
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """跳过空白并返回下一个字符, 文件结束时返回空串"""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"COCO JSON格式错误: 期望 {char!r}, 位置 {self.pos}")
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                obj, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self.eof or not self._fill():
+                    raise
+                continue
+            # 数字等值可能被分块截断, 恰好到达缓冲区末尾时需要再读一块确认
+            if end == len(self.buf) and not self.eof and self._fill():
+                continue
+            self.pos = end
+            return obj
+
+
+def iter_coco(path, sections=("images", "annotations", "categories")):
+    """
+    增量读取COCO标注文件, 按文件中的顺序逐条产出 (section, item)
+
+    参数:
+        path: instances_*.json 路径
+        sections: 需要产出的顶层字段; 数组字段逐个元素产出,
+                  其它字段 (如 info) 作为一个整体产出, 未列出的字段会被跳过
+    """
+    with open(path, encoding="utf-8") as f:
+        parser = _StreamParser(f)
+        parser.expect("{")
+        if parser.peek() == "}":
+            return
+        while True:
+            key = parser.value()
+            parser.expect(":")
+            if parser.peek() == "[":
+                # 数组逐个元素解析, 任意时刻只有一条记录在内存中
+                parser.expect("[")
+                if parser.peek() == "]":
+                    parser.pos += 1
+                else:
+                    while True:
+                        item = parser.value()
+                        if key in sections:
+                            yield key, item
+                        if parser.peek() == ",":
+                            parser.pos += 1
+                            continue
+                        parser.expect("]")
+                        break
+            else:
+                item = parser.value()
+                if key in sections:
+                    yield key, item
+            if parser.peek() == ",":
+                parser.pos += 1
+                continue
+            parser.expect("}")
+            return
+
+
+def load_coco_index(path):
+    """
+    流式读取COCO标注, 只保留转换所需的字段
+
+    返回:
+        categories: [{"id", "name"}, ...] (文件中的顺序)
+        images: [{"id", "file_name", "width", "height"}, ...] (文件中的顺序)
+        anns_by_image: {image_id: [(ann_id, category_id, bbox), ...]}
+    """
+    categories = []
+    images = []
+    anns_by_image = {}
+    for section, item in iter_coco(path):
+        if section == "annotations":
+            anns_by_image.setdefault(item["image_id"], []).append(
+                (item.get("id"), item["category_id"], item["bbox"]))
+        elif section == "images":
+            images.append({k: item[k] for k in ("id", "file_name", "width", "height")})
+        else:
+            categories.append({"id": item["id"], "name": item["name"]})
+    return categories, images, anns_by_image
+
+
+def _nest(text, prefix):
+    return text.replace("\n", "\n" + prefix)
+
+
+class CocoWriter:
+    """
+    流式写出COCO标注文件, 图片和标注记录产生后立即写盘
+
+    indent=2 时输出与 json.dump(coco_data, f, indent=2) 逐字节一致;
+    indent=None 时输出紧凑格式 (无缩进和多余空格)
+
+    参数:
+        path: 输出文件路径 (写完后原子替换)
+        coco_data: 顶层字段及其顺序, 流式字段应为空列表占位
+        indent: 缩进空格数, None 为紧凑格式
+        streamed: 通过 add() 逐条写入的字段
+
+    用法:
+        with CocoWriter(path, coco_data) as writer:
+            writer.add("images", image)
+            writer.add("annotations", ann)
+    """
+
+    def __init__(self, path, coco_data, indent=2, streamed=("images", "annotations")):
+        self.path = path
+        self.indent = indent
+        self.keys = list(coco_data)
+        self.static = {k: v for k, v in coco_data.items() if k not in streamed}
+        self.streamed = [k for k in self.keys if k in streamed]
+        self.counts = {k: 0 for k in self.streamed}
+        self.bytes_written = 0
+        if indent is None:
+            self._dump_kwargs = {"separators": (",", ":")}
+        else:
+            self._dump_kwargs = {"indent": indent}
+
+        self._tmp_path = f"{path}.part"
+        self._out = open(self._tmp_path, "w", encoding="utf-8")
+        # 第一个流式字段直接写入输出文件, 其余字段先写入临时文件, 结束时按顺序拼接
+        self._spools = {}
+        for key in self.streamed[1:]:
+            self._spools[key] = open(f"{path}.{key}.part", "w+", encoding="utf-8")
+
+        self._write(self._out, "{")
+        self._next_key = 0
+        self._write_static_until(self.streamed[0] if self.streamed else None)
+        if self.streamed:
+            self._open_key(self.streamed[0])
+
+    def _write(self, f, text):
+        f.write(text)
+        self.bytes_written += len(text.encode("utf-8"))
+
+    def _key_prefix(self, key):
+        sep = "," if self._next_key > 0 else ""
+        self._next_key += 1
+        if self.indent is None:
+            return f"{sep}{json.dumps(key)}:"
+        return f"{sep}\n{' ' * self.indent}{json.dumps(key)}: "
+
+    def _write_static_until(self, stop_key):
+        while self._next_key < len(self.keys) and self.keys[self._next_key] != stop_key:
+            key = self.keys[self._next_key]
+            prefix = self._key_prefix(key)
+            text = json.dumps(self.static[key], **self._dump_kwargs)
+            if self.indent is not None:
+                text = _nest(text, " " * self.indent)
+            self._write(self._out, prefix + text)
+
+    def _open_key(self, key):
+        self._write(self._out, self._key_prefix(key) + "[")
+
+    def _close_array(self, count):
+        if count == 0 or self.indent is None:
+            return "]"
+        return f"\n{' ' * self.indent}]"
+
+    def add(self, key, record):
+        """追加一条记录到流式字段 key"""
+        f = self._spools.get(key, self._out)
+        text = json.dumps(record, **self._dump_kwargs)
+        if self.indent is not None:
+            item_prefix = " " * (self.indent * 2)
+            text = "\n" + item_prefix + _nest(text, item_prefix)
+        if self.counts[key]:
+            text = "," + text
+        self.counts[key] += 1
+        self._write(f, text)
+
+    def close(self):
+        if self._out is None:
+            return
+        if self.streamed:
+            self._write(self._out, self._close_array(self.counts[self.streamed[0]]))
+            for key in self.streamed[1:]:
+                self._write_static_until(key)
+                self._open_key(key)
+                spool = self._spools.pop(key)
+                spool.seek(0)
+                shutil.copyfileobj(spool, self._out)
+                spool.close()
+                os.remove(spool.name)
+                self._write(self._out, self._close_array(self.counts[key]))
+        self._write_static_until(None)
+        self._write(self._out, "}" if self.indent is None or not self.keys else "\n}")
+        self._out.close()
+        self._out = None
+        os.replace(self._tmp_path, self.path)
+
+    def abort(self):
+        """放弃写入, 删除所有临时文件"""
+        for spool in self._spools.values():
+            spool.close()
+            os.remove(spool.name)
+        self._spools = {}
+        if self._out is not None:
+            self._out.close()
+            self._out = None
+            os.remove(self._tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
@@ -0,0 +1,289 @@
+import os
+import sys
+import json
+import time
+import shutil
+import inspect
+import argparse
+import importlib
+from dedup import DEDUP_MODES
+from fileio import IMAGE_MODES
+from parallel import run_tasks
+from subset import SUBSET_OPTIONS, make_subset, parse_class_map, select_subset
+from transform import IMAGE_FORMATS
+
+FORMATS = ("coco", "voc", "yolo")
+
+# 每对格式直接转换的函数 (模块名, 函数名), 不经过中间格式落盘
+CONVERTERS = {
+    ("coco", "voc"): ("coco2voc", "coco_to_voc"),
+    ("coco", "yolo"): ("coco2yolo", "coco_to_yolo"),
+    ("voc", "coco"): ("voc2coco", "voc_to_coco"),
+    ("voc", "yolo"): ("voc2yolo", "voc_to_yolo"),
+    ("yolo", "coco"): ("yolo2coco", "yolo_to_coco"),
+    ("yolo", "voc"): ("yolo2voc", "yolo_to_voc"),
+}
+
+# 干跑估算用的标注输出大小: (每张图片字节数, 每个框字节数), 按 benchmark.py 合成数据集的实测值
+_LABEL_BYTES = {"coco": (125, 195), "voc": (400, 280), "yolo": (0, 38), "packed": (60, 60)}
+
+# 任务中不传给转换函数的字段
+_JOB_KEYS = ("name", "from", "to", "input", "output")
+
+
+def get_converter(src_fmt, dst_fmt):
+    """src_fmt -> dst_fmt 的转换函数"""
+    if (src_fmt, dst_fmt) not in CONVERTERS:
+        pairs = ", ".join(f"{src}->{dst}" for src, dst in CONVERTERS)
+        raise ValueError(f"不支持的转换: {src_fmt}->{dst_fmt}, 可选: {pairs}")
+    module_name, func_name = CONVERTERS[(src_fmt, dst_fmt)]
+    return getattr(importlib.import_module(module_name), func_name)
+
+
+def _converter_options(func, src_fmt, input_dir, options):
+    """补全YOLO输入的划分和类别名称, 并检查转换函数是否支持这些参数"""
+    from readers import read_class_names
+
+    options = dict(options)
+    if isinstance(options.get("class_names"), str):
+        options["class_names"] = read_class_names(options["class_names"])
+    if isinstance(options.get("class_map"), str):
+        options["class_map"] = parse_class_map(options["class_map"])
+    params = inspect.signature(func).parameters
+    if src_fmt == "yolo" and "class_names" in params:
+        options.setdefault("splits", ["train", "val", "test"])
+        if options.get("class_names") is None:
+            classes_file = os.path.join(input_dir, "classes.txt")
+            if os.path.exists(classes_file):
+                options["class_names"] = read_class_names(classes_file)
+            elif params["class_names"].default is inspect.Parameter.empty:
+                raise ValueError(f"{func.__name__} 需要类别名称: 请指定 class_names 或提供 {classes_file}")
+    unknown = sorted(set(options) - set(params))
+    if unknown:
+        raise ValueError(f"{func.__name__} 不支持的参数: {', '.join(unknown)}")
+    return options
+
+
+def convert(src_fmt, dst_fmt, input_dir, output_dir, **options):
+    """
+    把 src_fmt 格式的数据集直接转换为 dst_fmt 格式 (读入内存后直接写出, 没有中间格式)
+
+    参数:
+        src_fmt, dst_fmt: coco | voc | yolo; 输入目录为打包格式时自动识别
+        options: 传给对应转换函数的参数 (workers, image_mode, io_threads, packed, report 等);
+                 YOLO输入的 splits 默认为 train/val/test, class_names 可以是类别文件路径,
+                 默认读取输入目录下的 classes.txt (转换为VOC时可以没有, 类别名称为标签中的编号); class_map 可以是 "旧=新,..." 形式的字符串
+
+    返回:
+        转换函数的统计信息
+    """
+    func = get_converter(src_fmt, dst_fmt)
+    return func(input_dir, output_dir, **_converter_options(func, src_fmt, input_dir, options))
+
+
+def _free_bytes(path):
+    """path 所在文件系统的可用空间 (path 可以尚不存在)"""
+    path = os.path.abspath(path)
+    while not os.path.exists(path):
+        path = os.path.dirname(path)
+    return shutil.disk_usage(path).free
+
+
+def estimate(src_fmt, dst_fmt, input_dir, output_dir, **options):
+    """
+    干跑: 只读取标注 (和图片文件头), 估算转换的工作量和磁盘占用, 不写任何文件
+
+    返回:
+        {"images", "boxes", "image_bytes": 需要写入的图片字节数, "label_bytes": 估算的标注字节数,
+         "bytes_to_write", "free_bytes": 输出位置的可用空间, "fits": 空间是否足够}
+    """
+    from readers import read_coco, read_voc, read_yolo
+
+    func = get_converter(src_fmt, dst_fmt)
+    options = _converter_options(func, src_fmt, input_dir, options)
+    workers = options.get("workers", 1)
+    # 筛选子集后只估算选中的图片和标注框 (VOC/YOLO 输入只读取选中的图片的尺寸)
+    subset = make_subset(**{key: options[key] for key in SUBSET_OPTIONS if key in options})
+    if src_fmt == "coco":
+        dataset = select_subset(read_coco(input_dir), **(subset or {}))
+    elif src_fmt == "voc":
+        dataset = read_voc(input_dir, workers=workers, subset=subset)
+    else:
+        dataset = read_yolo(input_dir, options.get("splits", ("train", "val", "test")), options.get("class_names"),
+                            workers=workers, subset=subset)
+
+    # 链接和 reflink 不占用新的数据块 (reflink 不支持时会回退到复制, 此时为低估); 归档输出时图片内容写入分片
+    image_mode = options.get("image_mode", inspect.signature(func).parameters["image_mode"].default)
+    image_bytes = 0
+    if image_mode == "copy" or (options.get("archive") and image_mode != "none"):
+        image_bytes = sum(os.path.getsize(path) for path in dataset.path if os.path.exists(path))
+    per_image, per_box = _LABEL_BYTES["packed" if options.get("packed") else dst_fmt]
+    label_bytes = per_image * dataset.num_images + per_box * dataset.num_boxes
+    free_bytes = _free_bytes(output_dir)
+    return {"images": dataset.num_images, "boxes": dataset.num_boxes, "image_mode": image_mode,
+            "image_bytes": image_bytes, "label_bytes": label_bytes,
+            "bytes_to_write": image_bytes + label_bytes, "free_bytes": free_bytes,
+            "fits": image_bytes + label_bytes <= free_bytes}
+
+
+def load_jobs(path, overrides=None):
+    """
+    读取批量任务文件 (.json, 或 .yaml/.yml, 需安装PyYAML)
+
+    格式:
+        defaults: {workers: 4, image_mode: hardlink}    # 可选, 各任务共用的参数
+        jobs:
+          - {from: yolo, to: voc, input: data/a, output: out/a, class_names: data/a/classes.txt}
+          - {from: coco, to: yolo, input: data/b, output: out/b, image_mode: none}
+    也可以直接是任务列表; 除 name/from/to/input/output 外的字段都传给转换函数
+
+    参数:
+        overrides: 命令行上显式指定的参数, 优先于任务文件中的 defaults 和各任务的字段
+
+    返回:
+        合并默认参数后的任务列表
+    """
+    with open(path, encoding="utf-8") as f:
+        if path.endswith((".yaml", ".yml")):
+            import yaml
+            config = yaml.safe_load(f)
+        else:
+            config = json.load(f)
+    if isinstance(config, list):
+        config = {"jobs": config}
+    defaults = config.get("defaults") or {}
+    jobs = [{**defaults, **job, **(overrides or {})} for job in config.get("jobs") or []]
+
+    outputs = set()
+    for i, job in enumerate(jobs):
+        missing = [key for key in ("from", "to", "input", "output") if not job.get(key)]
+        if missing:
+            raise ValueError(f"{path}: 第 {i + 1} 个任务缺少 {', '.join(missing)}")
+        get_converter(job["from"], job["to"])
+        output = os.path.abspath(job["output"])
+        if output in outputs:
+            raise ValueError(f"{path}: 多个任务输出到同一目录 {job['output']}")
+        outputs.add(output)
+        job.setdefault("name", job["output"])
+    return jobs
+
+
+def run_job(task):
+    """
+    执行一个任务 (可在子进程中运行), 出错时不抛出异常, 记录在结果中
+
+    参数:
+        task: (任务, 是否干跑)
+
+    返回:
+        {"name", "ok", "seconds", "stats" 或 "error"}
+    """
+    job, dry_run = task
+    options = {key: value for key, value in job.items() if key not in _JOB_KEYS}
+    start = time.perf_counter()
+    try:
+        func = estimate if dry_run else convert
+        stats = func(job["from"], job["to"], job["input"], job["output"], **options)
+    except Exception as exc:
+        return {"name": job.get("name", job["output"]), "ok": False,
+                "seconds": round(time.perf_counter() - start, 3), "error": f"{type(exc).__name__}: {exc}"}
+    stats.pop("report", None)
+    return {"name": job.get("name", job["output"]), "ok": True,
+            "seconds": round(time.perf_counter() - start, 3), "stats": stats}
+
+
+def run_jobs(jobs, parallel=1, dry_run=False):
+    """
+    执行多个转换任务, parallel 个任务同时在不同进程中运行 (各任务内部的 workers 另计)
+
+    返回:
+        各任务的 run_job 结果, 与 jobs 顺序相同
+    """
+    return run_tasks(run_job, [(job, dry_run) for job in jobs], parallel, chunksize=1)
+
+
+def _print_result(result, dry_run):
+    if not result["ok"]:
+        print(f"{result['name']}: 失败, {result['error']}", file=sys.stderr)
+        return
+    stats = result["stats"]
+    if dry_run:
+        print(f"{result['name']}: {stats['images']} 张图片, {stats['boxes']} 个标注框, "
+              f"预计写入 {stats['bytes_to_write'] / 2**20:.1f} MB (图片 {stats['image_bytes'] / 2**20:.1f} MB, "
+              f"{stats['image_mode']}; 标注约 {stats['label_bytes'] / 2**20:.1f} MB), "
+              f"可用空间 {stats['free_bytes'] / 2**20:.0f} MB{'' if stats['fits'] else ', 空间不足'}")
+    else:
+        print(f"{result['name']}: {stats['images']} 张图片, 写入 {stats['bytes_written']} 字节, "
+              f"{result['seconds']:.1f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="数据集格式转换 (COCO/VOC/YOLO 任意两种之间直接转换, 或批量执行任务文件)")
+    parser.add_argument("input", nargs="?", help="输入数据集根目录")
+    parser.add_argument("output", nargs="?", help="输出目录")
+    parser.add_argument("--from", dest="src_fmt", choices=FORMATS, help="输入格式")
+    parser.add_argument("--to", dest="dst_fmt", choices=FORMATS, help="输出格式")
+    parser.add_argument("--jobs", help="批量任务文件 (.json/.yaml); 命令行上显式指定的其他参数覆盖任务文件中的值")
+    parser.add_argument("--parallel", type=int, default=1, help="同时执行的任务数 (每个任务一个进程)")
+    parser.add_argument("--dry-run", action="store_true", help="只估算图片数、标注数和磁盘占用, 不写文件")
+    parser.add_argument("--classes", help="YOLO输入的类别文件, 默认为输入目录下的 classes.txt")
+    parser.add_argument("--splits", nargs="*", help="YOLO输入要转换的划分, 默认 train/val/test")
+    parser.add_argument("--image-mode", choices=IMAGE_MODES, help="图片落盘方式, 默认为各转换函数的默认值")
+    parser.add_argument("--workers", type=int, help="并行进程数, <=0 为全部CPU核心")
+    parser.add_argument("--io-threads", type=int, help="I/O线程数, 0 为逐张串行处理")
+    parser.add_argument("--queue-depth", type=int, help="流水线中同时在途的图片数上限")
+    parser.add_argument("--long-rows", choices=["skip", "bbox", "polygon"], help="YOLO多于5列的标签行的处理方式")
+    parser.add_argument("--packed", action="store_true", help="输出为打包格式 (部分转换支持)")
+    parser.add_argument("--shards", type=int, help="COCO输出时每个划分拆为多少个分片")
+    parser.add_argument("--shard-index", type=int, help="只写出这一个COCO分片 (多台机器分别转换)")
+    parser.add_argument("--archive", action="store_true", help="图片和标注作为样本写入 tar 分片 (WebDataset 格式)")
+    parser.add_argument("--shard-mb", type=int, help="--archive 时每个 tar 分片的大小上限 (MB), 默认 1024")
+    parser.add_argument("--incremental", action="store_true", help="只处理新增或变化的图片")
+    parser.add_argument("--dedup", choices=DEDUP_MODES,
+                        help="按内容去重图片: link 为重复图片只存一份, merge 还合并重复图片的标注")
+    parser.add_argument("--hash-index", help="去重的持久化哈希索引文件, 多次转换共用")
+    parser.add_argument("--resize", type=int, help="图片长边缩放到不超过这个像素数, 标注框随之换算")
+    parser.add_argument("--letterbox", action="store_true", help="缩放后填充为 resize x resize 的正方形")
+    parser.add_argument("--image-format", choices=list(IMAGE_FORMATS), help="图片重新编码的格式")
+    parser.add_argument("--quality", type=int, help="JPEG/WebP 编码质量 (默认 90)")
+    parser.add_argument("--keep-classes", nargs="+", help="只保留这些类别 (名称或类别编号)")
+    parser.add_argument("--exclude-classes", nargs="+", help="去掉这些类别")
+    parser.add_argument("--class-map", help="类别重映射, 如 cat=animal,dog=animal 或 3=0,5=1 (改为新的类别编号)")
+    parser.add_argument("--min-area", type=float, help="去掉像素面积小于这个值的框")
+    parser.add_argument("--drop-empty", action="store_true", help="去掉筛选后没有框的图片")
+    parser.add_argument("--verbose", action="store_true", help="显示进度条和信息输出")
+    parser.add_argument("--report", help="单个转换时写出JSON统计报告的路径; 批量时为全部任务结果的JSON路径")
+    parser.add_argument("--profile", help="性能剖析结果的输出路径 (.prof 为 cProfile, .html 为 pyinstrument)")
+    args = parser.parse_args()
+
+    options = {"class_names": args.classes, "splits": args.splits, "image_mode": args.image_mode,
+               "workers": args.workers, "io_threads": args.io_threads, "queue_depth": args.queue_depth,
+               "long_rows": args.long_rows, "packed": args.packed or None,
+               "shards": args.shards, "shard_index": args.shard_index, "incremental": args.incremental or None,
+               "archive": args.archive or None, "shard_bytes": args.shard_mb and args.shard_mb << 20,
+               "dedup": args.dedup, "hash_index": args.hash_index, "resize": args.resize,
+               "letterbox": args.letterbox or None, "image_format": args.image_format, "quality": args.quality,
+               "keep_classes": args.keep_classes, "exclude_classes": args.exclude_classes,
+               "class_map": args.class_map, "min_area": args.min_area, "drop_empty": args.drop_empty or None,
+               "verbose": args.verbose or None, "profile": args.profile}
+    options = {key: value for key, value in options.items() if value is not None}
+    if args.jobs:
+        jobs = load_jobs(args.jobs, options)
+    else:
+        if not (args.input and args.output and args.src_fmt and args.dst_fmt):
+            parser.error("需要 input output --from --to, 或 --jobs")
+        if args.report and not args.dry_run:
+            options["report"] = args.report
+        jobs = [dict(options, name=args.output, input=args.input, output=args.output,
+                     **{"from": args.src_fmt, "to": args.dst_fmt})]
+
+    results = run_jobs(jobs, args.parallel, args.dry_run)
+    for result in results:
+        _print_result(result, args.dry_run)
+    if args.dry_run and len(results) > 1:
+        total = sum(result["stats"]["bytes_to_write"] for result in results if result["ok"])
+        print(f"合计预计写入 {total / 2**20:.1f} MB")
+    if args.jobs and args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    sys.exit(0 if all(result["ok"] for result in results) else 1)
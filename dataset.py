@@ -0,0 +1,257 @@
+import numpy as np
+from instrument import count, timer
+
+# DatasetBuilder 每收集这么多个框就转换一次数组
+_CHUNK_BOXES = 1 << 16
+
+
+class Dataset:
+    """
+    三种格式共用的列式数据集
+
+    图片表 (每行一张图片, 同一图片出现在多个划分中时各占一行):
+        split, file_name, path: 划分名、文件名、源图片路径 (list)
+        width, height, image_id: 图片宽高与编号 (int64数组), 无法读取的图片宽高为 0
+        labeled: 是否有标注文件 (bool数组)
+    标注框 (按 image_idx 排序, 同一图片的框连续存放):
+        image_idx, class_idx: 所属图片行号、类别下标 (int64数组)
+        boxes: 像素坐标 x1, y1, x2, y2 (float64, N x 4)
+        area: 源格式给出的面积 (float64), 未给出时为 NaN
+        wh: 源格式直接给出的宽高 (COCO的bbox、YOLO换算后的宽高, N x 2), 没有时为 None;
+            避免由 x2-x1 反算带来的舍入差异, 坐标被修改后失效
+    类别表:
+        categories: [{"id", "name", ...}, ...], class_idx 为其下标
+    """
+
+    def __init__(self, categories, split_names, images, image_idx, class_idx, boxes, area, wh=None):
+        self.categories = categories
+        self.split_names = split_names
+        self.split = images["split"]
+        self.file_name = images["file_name"]
+        self.path = images["path"]
+        self.width = images["width"]
+        self.height = images["height"]
+        self.image_id = images["image_id"]
+        self.labeled = images["labeled"]
+        self.image_idx = image_idx
+        self.class_idx = class_idx
+        self.boxes = boxes
+        self.area = area
+        self.wh = wh
+
+    @property
+    def num_images(self):
+        return len(self.file_name)
+
+    @property
+    def num_boxes(self):
+        return len(self.image_idx)
+
+    @property
+    def class_names(self):
+        return [cat["name"] for cat in self.categories]
+
+    def _images(self):
+        return {"split": self.split, "file_name": self.file_name, "path": self.path,
+                "width": self.width, "height": self.height,
+                "image_id": self.image_id, "labeled": self.labeled}
+
+    def box_offsets(self):
+        """第 i 张图片的框为 [offsets[i], offsets[i+1])"""
+        return np.searchsorted(self.image_idx, np.arange(self.num_images + 1))
+
+    def split_rows(self, split):
+        """某个划分的图片行号 (保持原顺序)"""
+        return [i for i, name in enumerate(self.split) if name == split]
+
+    def image_sizes(self):
+        """每个框所在图片的宽高 (广播用)"""
+        return self.width[self.image_idx], self.height[self.image_idx]
+
+    def with_boxes(self, boxes=None, keep=None):
+        """返回替换或筛选标注框后的新数据集, 图片表和类别表共用"""
+        wh = self.wh if boxes is None else None
+        boxes = self.boxes if boxes is None else boxes
+        image_idx, class_idx, area = self.image_idx, self.class_idx, self.area
+        if keep is not None:
+            image_idx, class_idx, boxes, area = image_idx[keep], class_idx[keep], boxes[keep], area[keep]
+            wh = None if wh is None else wh[keep]
+        return Dataset(self.categories, self.split_names, self._images(),
+                       image_idx, class_idx, boxes, area, wh)
+
+    def with_images(self, split_names=None, **columns):
+        """返回替换图片表中若干列 (如 split、image_id) 后的新数据集, 行数不变"""
+        images = self._images()
+        images.update(columns)
+        return Dataset(self.categories, self.split_names if split_names is None else split_names, images,
+                       self.image_idx, self.class_idx, self.boxes, self.area, self.wh)
+
+    def select_images(self, rows):
+        """只保留给定的图片行 (升序行号或bool掩码) 及其标注框"""
+        rows = np.asarray(rows)
+        if rows.dtype == bool:
+            rows = np.flatnonzero(rows)
+        new_index = np.full(self.num_images, -1, dtype=np.int64)
+        new_index[rows] = np.arange(len(rows), dtype=np.int64)
+        keep = new_index[self.image_idx] >= 0
+
+        images = {}
+        for key, column in self._images().items():
+            if isinstance(column, list):
+                images[key] = [column[i] for i in rows.tolist()]
+            else:
+                images[key] = column[rows]
+        present = set(images["split"])
+        split_names = [name for name in self.split_names if name in present]
+        return Dataset(self.categories, split_names, images, new_index[self.image_idx[keep]],
+                       self.class_idx[keep], self.boxes[keep], self.area[keep],
+                       None if self.wh is None else self.wh[keep])
+
+    def remap_categories(self, categories, mapping):
+        """
+        换成新的类别表
+
+        参数:
+            categories: 新的类别表
+            mapping: 旧类别下标到新类别下标的数组, -1 表示删除该类别的框
+        """
+        mapping = np.asarray(mapping, dtype=np.int64)
+        class_idx = mapping[self.class_idx] if len(mapping) else self.class_idx
+        keep = class_idx >= 0
+        dataset = self.with_boxes(keep=None if keep.all() else keep)
+        dataset.categories = list(categories)
+        dataset.class_idx = class_idx[keep]
+        return dataset
+
+    def sort_categories(self, key=lambda cat: cat["id"]):
+        """按 key 重新排列类别表 (默认按 id), class_idx 随之重映射"""
+        order = sorted(range(len(self.categories)), key=lambda i: key(self.categories[i]))
+        mapping = np.empty(len(order), dtype=np.int64)
+        mapping[order] = np.arange(len(order), dtype=np.int64)
+        return self.remap_categories([self.categories[i] for i in order], mapping)
+
+    # ---- 向量化的框变换 ----
+
+    def round_boxes(self):
+        """坐标四舍五入为整数 (与Python的round一致, 四舍六入五成双)"""
+        with timer("coordinates"):
+            boxes = np.rint(self.boxes)
+        return self.with_boxes(boxes)
+
+    def clip_boxes(self, inclusive=False):
+        """
+        把框裁剪到图片范围内: x1, y1 >= 0, x2 <= 宽, y2 <= 高
+
+        inclusive=True 时还要求左上角不超过 宽-1/高-1, 右下角不小于 0
+        """
+        with timer("coordinates"):
+            width, height = self.image_sizes()
+            boxes = self.boxes.copy()
+            boxes[:, 0] = np.maximum(boxes[:, 0], 0)
+            boxes[:, 1] = np.maximum(boxes[:, 1], 0)
+            boxes[:, 2] = np.minimum(boxes[:, 2], width)
+            boxes[:, 3] = np.minimum(boxes[:, 3], height)
+            if inclusive:
+                boxes[:, 0] = np.minimum(boxes[:, 0], width - 1)
+                boxes[:, 1] = np.minimum(boxes[:, 1], height - 1)
+                boxes[:, 2] = np.maximum(boxes[:, 2], 0)
+                boxes[:, 3] = np.maximum(boxes[:, 3], 0)
+            count("boxes_clipped", int((boxes != self.boxes).any(axis=1).sum()))
+        return self.with_boxes(boxes)
+
+    def drop_invalid(self):
+        """去掉宽或高不为正的框"""
+        keep = (self.boxes[:, 2] > self.boxes[:, 0]) & (self.boxes[:, 3] > self.boxes[:, 1])
+        if keep.all():
+            return self
+        count("boxes_dropped", int((~keep).sum()))
+        return self.with_boxes(keep=keep)
+
+    def box_wh(self):
+        """每个框的宽高, N x 2"""
+        if self.wh is not None:
+            return self.wh
+        return self.boxes[:, 2:] - self.boxes[:, :2]
+
+    def xywh(self):
+        """COCO格式的 (x, y, 宽, 高), N x 4"""
+        return np.concatenate([self.boxes[:, :2], self.box_wh()], axis=1)
+
+    def normalized_cxcywh(self):
+        """YOLO格式的归一化 (中心x, 中心y, 宽, 高), N x 4"""
+        width, height = self.image_sizes()
+        x1, y1, x2, y2 = self.boxes.T
+        if self.wh is not None:
+            w, h = self.wh.T
+            return np.stack([(x1 + w / 2) / width, (y1 + h / 2) / height,
+                             w / width, h / height], axis=1)
+        return np.stack([(x1 + x2) / 2 / width, (y1 + y2) / 2 / height,
+                         (x2 - x1) / width, (y2 - y1) / height], axis=1)
+
+
+class DatasetBuilder:
+    """逐张图片收集数据, build() 时一次性拼接为数组"""
+
+    def __init__(self, categories=None):
+        self.categories = list(categories or [])
+        self.split_names = []
+        self.images = {"split": [], "file_name": [], "path": [], "width": [], "height": [],
+                       "image_id": [], "labeled": []}
+        self._class_idx = []
+        self._boxes = []
+        self._area = []
+        self._counts = []
+        self._chunks = []
+
+    def add_split(self, split):
+        if split not in self.split_names:
+            self.split_names.append(split)
+
+    def add_image(self, split, file_name, path, width, height, image_id, labeled=True,
+                  class_idx=(), boxes=(), area=None):
+        """
+        添加一张图片及其标注框
+
+        参数:
+            class_idx: 每个框的类别下标
+            boxes: 每个框的 (x1, y1, x2, y2) 像素坐标
+            area: 每个框的面积, 为 None 时记为 NaN
+        """
+        self.add_split(split)
+        self.images["split"].append(split)
+        self.images["file_name"].append(file_name)
+        self.images["path"].append(path)
+        self.images["width"].append(width)
+        self.images["height"].append(height)
+        self.images["image_id"].append(image_id)
+        self.images["labeled"].append(labeled)
+
+        # 按框追加到扁平列表 (只保存引用), build() 时一次性转为数组
+        count = len(class_idx)
+        self._counts.append(count)
+        if count:
+            self._class_idx.extend(class_idx)
+            self._boxes.extend(boxes)
+            self._area.extend([np.nan] * count if area is None else area)
+            if len(self._class_idx) >= _CHUNK_BOXES:
+                self._flush()
+
+    def _flush(self):
+        """把已收集的框转为数组, 释放对原始数据的引用"""
+        self._chunks.append((np.asarray(self._class_idx, dtype=np.int64),
+                             np.asarray(self._boxes, dtype=np.float64).reshape(-1, 4),
+                             np.asarray(self._area, dtype=np.float64)))
+        self._class_idx, self._boxes, self._area = [], [], []
+
+    def build(self):
+        images = dict(self.images)
+        for key in ("width", "height", "image_id"):
+            images[key] = np.asarray(images[key], dtype=np.int64)
+        images["labeled"] = np.asarray(images["labeled"], dtype=bool)
+
+        image_idx = np.repeat(np.arange(len(self._counts), dtype=np.int64),
+                              np.asarray(self._counts, dtype=np.int64))
+        self._flush()
+        class_idx, boxes, area = (np.concatenate(parts) for parts in zip(*self._chunks))
+        self._chunks = []
+        return Dataset(self.categories, self.split_names, images, image_idx, class_idx, boxes, area)
@@ -0,0 +1,265 @@
+import os
+import json
+import numpy as np
+from fileio import HASH_NAME, copy_hashed, hash_file, materialize_image, write_text
+from instrument import count, timer
+from parallel import DEFAULT_IO_THREADS, DEFAULT_QUEUE_DEPTH, iter_tasks
+from pipeline import Pipeline
+
+# 转换函数的 dedup 参数: link 为内容相同的图片只存一份, 其余为硬链接;
+# merge 还把同一划分中内容相同的图片合并为一张, 标注框取并集
+DEDUP_MODES = ("link", "merge")
+DUPLICATES_REPORT = "duplicates.json"
+HASH_INDEX_VERSION = 1
+
+
+def _stamp(path):
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+def _hash_source(path):
+    """源图片的摘要, 无法读取时为 None (在I/O线程或子进程中执行)"""
+    try:
+        return hash_file(path)
+    except OSError:
+        return None
+
+
+def place_hashed(task):
+    """放置图片并计算内容摘要 (在I/O线程或子进程中执行), 返回 (写入的字节数, 摘要); none 时不读取图片"""
+    src, dst, mode = task
+    if mode == "none":
+        return 0, None
+    if mode == "copy":
+        return copy_hashed(src, dst)
+    return materialize_image(src, dst, mode), hash_file(src)
+
+
+class Deduplicator:
+    """
+    按内容去重放置图片: 同一内容只保留一份文件, 其余位置为指向它的硬链接
+
+    参数:
+        index_file: 持久化哈希索引 (JSON) 路径, 为 None 时只在本次运行内去重;
+                    记录源文件 (路径+大小+mtime) 的摘要和各内容已存放的文件,
+                    以后的转换中源文件未变化且内容已存放时直接链接, 不再读取源文件
+    """
+
+    def __init__(self, index_file=None):
+        self.index_file = index_file
+        self.sources = {}  # 源文件绝对路径 -> [大小, mtime_ns, 摘要]
+        self.stored = {}   # 摘要 -> [已存放的文件绝对路径, 大小, mtime_ns]
+        self.groups = {}   # 本次放置: 摘要 -> [目标路径, ...]
+        self.merged = {}   # 本次合并: (划分, 摘要) -> [保留的源图片路径, 被并入的源图片路径, ...]
+        self.bytes_saved = 0
+        if index_file and os.path.exists(index_file):
+            with open(index_file, encoding="utf-8") as f:
+                index = json.load(f)
+            if index.get("version") == HASH_INDEX_VERSION and index.get("hash") == HASH_NAME:
+                self.sources = index["sources"]
+                self.stored = index["stored"]
+
+    def known_digest(self, src):
+        """源文件在索引中且未变化时返回其摘要"""
+        entry = self.sources.get(os.path.abspath(src))
+        try:
+            if entry is not None and _stamp(src) == entry[:2]:
+                return entry[2]
+        except OSError:
+            pass
+        return None
+
+    def _stored_file(self, digest):
+        """内容已存放且该文件未被修改时返回其路径"""
+        entry = self.stored.get(digest)
+        try:
+            if entry is not None and _stamp(entry[0]) == entry[1:]:
+                return entry[0]
+        except OSError:
+            pass
+        return None
+
+    def _record(self, src, digest):
+        try:
+            self.sources[os.path.abspath(src)] = _stamp(src) + [digest]
+        except OSError:
+            pass
+
+    def _link(self, stored, dst):
+        """把 dst 换成指向 stored 的硬链接, 返回写入的字节数 (不能硬链接时回退到复制)"""
+        if os.path.exists(dst) and os.path.samefile(stored, dst):
+            return 0
+        return materialize_image(stored, dst, "hardlink")
+
+    def hash_sources(self, paths, workers=1, io_threads=DEFAULT_IO_THREADS, queue_depth=DEFAULT_QUEUE_DEPTH):
+        """源图片的摘要 (索引中未变化的不再读取), 无法读取的为 None"""
+        digests = [self.known_digest(path) for path in paths]
+        todo = [i for i, digest in enumerate(digests) if digest is None]
+        func = Pipeline([("hash", _hash_source, max(io_threads, 1))], queue_depth, threaded=io_threads > 0)
+        with timer("hash"):
+            for i, digest in zip(todo, iter_tasks(func, [paths[i] for i in todo], workers, desc="Hashing images")):
+                digests[i] = digest
+                if digest is not None:
+                    self._record(paths[i], digest)
+        count("images_hashed", len(todo))
+        return digests
+
+    def merge_duplicates(self, dataset, workers=1, io_threads=DEFAULT_IO_THREADS, queue_depth=DEFAULT_QUEUE_DEPTH):
+        """
+        同一划分中内容相同的图片只保留第一张, 其余图片的标注框并入该图片
+        (类别和坐标完全相同的框只保留一个); 需要先读取全部源图片计算摘要
+        """
+        digests = self.hash_sources(dataset.path, workers, io_threads, queue_depth)
+        target = np.arange(dataset.num_images, dtype=np.int64)
+        canonical = {}
+        for i, (split, digest) in enumerate(zip(dataset.split, digests)):
+            if digest is not None:
+                target[i] = first = canonical.setdefault((split, digest), i)
+                if first != i:
+                    self.merged.setdefault((split, digest), [dataset.path[first]]).append(dataset.path[i])
+        rows = np.flatnonzero(target == np.arange(dataset.num_images))
+        if len(rows) == dataset.num_images:
+            return dataset
+
+        with timer("coordinates"):
+            image_idx = target[dataset.image_idx]
+            key = np.column_stack([image_idx, dataset.class_idx, dataset.boxes])
+            _, first = np.unique(key, axis=0, return_index=True)
+            keep = np.sort(first)
+            order = keep[np.argsort(image_idx[keep], kind="stable")]
+            labeled = dataset.labeled.copy()
+            np.logical_or.at(labeled, target, dataset.labeled)
+            merged = dataset.with_images(labeled=labeled).with_boxes(keep=order)
+            merged.image_idx = image_idx[order]
+        count("images_merged", dataset.num_images - len(rows))
+        return merged.select_images(rows)
+
+    def place(self, tasks, workers=1, io_threads=DEFAULT_IO_THREADS, queue_depth=DEFAULT_QUEUE_DEPTH, desc=None):
+        """
+        放置图片 (任务为 (源路径, 目标路径, image_mode)): 每个内容只写出一次, 其余位置为指向它的硬链接
+
+        源文件在哈希索引中未变化且内容已存放过时直接链接; 大小与本次其他图片或已存放的内容相同
+        (可能重复) 的图片先计算摘要, 同一内容只放置第一张, 其余链接到它; 其余图片复制的同时计算摘要
+
+        返回:
+            每个任务净写入的字节数
+        """
+        written = [0] * len(tasks)
+        pending = []
+        with timer("write"):
+            for j, (src, dst, mode) in enumerate(tasks):
+                digest = self.known_digest(src) if mode != "none" else None
+                stored = self._stored_file(digest) if digest is not None else None
+                if stored is None:
+                    pending.append(j)
+                    continue
+                # 源文件未变化且内容已存放过: 不读取源文件, 直接链接
+                written[j] = self._link(stored, dst)
+                if mode == "copy":
+                    self.bytes_saved += self.stored[digest][1] - written[j]
+                self.groups.setdefault(digest, []).append(dst)
+
+            # 与本次其他图片或已存放的内容大小相同的图片才可能重复: 先计算它们的摘要, 重复的内容不再写出
+            by_size = {entry[1]: [None] for entry in self.stored.values()}
+            for j in pending:
+                src, _, mode = tasks[j]
+                if mode != "none" and os.path.exists(src):
+                    by_size.setdefault(os.path.getsize(src), []).append(j)
+            candidates = sorted(j for group in by_size.values() if len(group) > 1 for j in group if j is not None)
+            digests = self.hash_sources([tasks[j][0] for j in candidates], workers, io_threads, queue_depth)
+            first = {}
+            duplicates = []
+            for j, digest in zip(candidates, digests):
+                if digest is not None and (digest in first or self._stored_file(digest) is not None):
+                    duplicates.append((j, digest))
+                elif digest is not None:
+                    first[digest] = j
+            skipped = {j for j, _ in duplicates}
+            pending = [j for j in pending if j not in skipped]
+
+            func = Pipeline([("place", place_hashed, max(io_threads, 1))], queue_depth, threaded=io_threads > 0)
+            for j, (nbytes, digest) in zip(pending, iter_tasks(func, [tasks[j] for j in pending], workers, desc)):
+                written[j] = nbytes
+                if digest is None:
+                    continue
+                src, dst, _ = tasks[j]
+                self._record(src, digest)
+                stored = self._stored_file(digest)
+                if stored is not None and stored != os.path.abspath(dst):
+                    written[j] = self._link(stored, dst)
+                    self.bytes_saved += nbytes - written[j]
+                else:
+                    self.stored[digest] = [os.path.abspath(dst)] + _stamp(dst)
+                self.groups.setdefault(digest, []).append(dst)
+
+            # 本次运行中重复的图片: 链接到同一内容第一张放置的文件
+            for j, digest in duplicates:
+                src, dst, mode = tasks[j]
+                stored = self._stored_file(digest)
+                if stored is None:
+                    # 第一张未能放置 (如源文件在放置前被修改): 单独放置
+                    written[j], digest = place_hashed(tasks[j])
+                    if digest is not None:
+                        self._record(src, digest)
+                        self.stored.setdefault(digest, [os.path.abspath(dst)] + _stamp(dst))
+                else:
+                    written[j] = self._link(stored, dst)
+                    if mode == "copy":
+                        self.bytes_saved += self.stored[digest][1] - written[j]
+                if digest is not None:
+                    self.groups.setdefault(digest, []).append(dst)
+        return written
+
+    def summary(self):
+        """{"duplicate_images": 换成链接的图片数, "merged_images": 被合并的图片数, "bytes_saved"}"""
+        return {
+            "duplicate_images": sum(len(paths) - 1 for paths in self.groups.values()),
+            "merged_images": sum(len(paths) - 1 for paths in self.merged.values()),
+            "bytes_saved": self.bytes_saved,
+        }
+
+    def write_report(self, path, root):
+        """写出重复图片报告 (放置的路径相对于 root), 返回写入的字节数"""
+        report = dict(self.summary(), hash=HASH_NAME)
+        report["duplicate_groups"] = [[os.path.relpath(p, root) for p in paths]
+                                      for paths in self.groups.values() if len(paths) > 1]
+        report["merged_groups"] = [paths for paths in self.merged.values() if len(paths) > 1]
+        return write_text(path, json.dumps(report, ensure_ascii=False, indent=2))
+
+    def save(self):
+        if not self.index_file:
+            return
+        tmp_file = f"{self.index_file}.tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump({"version": HASH_INDEX_VERSION, "hash": HASH_NAME,
+                       "sources": self.sources, "stored": self.stored}, f, separators=(",", ":"))
+        os.replace(tmp_file, self.index_file)
+
+
+def start_dedup(dedup, hash_index=None, incremental=False):
+    """
+    转换函数开始时调用, 返回 Deduplicator (dedup 为 None 时返回 None)
+
+    参数:
+        dedup: None | link | merge (见 DEDUP_MODES)
+        hash_index: 持久化哈希索引路径, 多次转换共用时已存放的内容不再复制
+    """
+    if dedup is None:
+        return None
+    if dedup not in DEDUP_MODES:
+        raise ValueError(f"未知的dedup: {dedup}, 可选: {', '.join(DEDUP_MODES)}")
+    if incremental:
+        raise ValueError("dedup 不能与 incremental 同时使用 (可用 hash_index 跳过已存放的图片)")
+    return Deduplicator(hash_index)
+
+
+def finish_dedup(deduplicator, output_dir, stats):
+    """转换函数结束时调用: 保存哈希索引, 写出 duplicates.json, 统计信息中加入 "duplicates" """
+    if deduplicator is None:
+        return
+    deduplicator.save()
+    stats["bytes_written"] += deduplicator.write_report(os.path.join(output_dir, DUPLICATES_REPORT), output_dir)
+    stats["duplicates"] = deduplicator.summary()
+    count("duplicate_images", stats["duplicates"]["duplicate_images"])
+    count("bytes_saved", stats["duplicates"]["bytes_saved"])
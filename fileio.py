@@ -0,0 +1,122 @@
+import os
+import errno
+import shutil
+import hashlib
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# 图片落盘方式
+IMAGE_MODES = ("copy", "hardlink", "symlink", "reflink", "none")
+
+# linux/fs.h: _IOW(0x94, 9, int)
+_FICLONE = 0x40049409
+
+
+def _copy(src, dst):
+    shutil.copy(src, dst)
+    return os.path.getsize(dst)
+
+
+def _reflink(src, dst):
+    """写时复制克隆 (FICLONE), 不支持时依次回退到 copy_file_range 和普通复制"""
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        if fcntl is not None:
+            try:
+                fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
+                return 0  # 与源文件共享数据块, 没有实际写入
+            except OSError:
+                pass
+        if hasattr(os, "copy_file_range"):
+            try:
+                remaining = os.fstat(fsrc.fileno()).st_size
+                written = 0
+                while remaining > 0:
+                    n = os.copy_file_range(fsrc.fileno(), fdst.fileno(), remaining)
+                    if n == 0:
+                        break
+                    written += n
+                    remaining -= n
+                if remaining == 0:
+                    shutil.copymode(src, dst)
+                    return written
+            except OSError:
+                pass
+    os.remove(dst)
+    return _copy(src, dst)
+
+
+def materialize_image(src, dst, mode="copy"):
+    """
+    将图片放到输出目录, 返回实际写入的字节数
+
+    参数:
+        src: 源图片路径
+        dst: 目标路径, 已存在时会先删除 (避免写穿旧的链接)
+        mode: copy | hardlink | symlink | reflink | none
+              链接失败 (如跨文件系统) 时自动回退到复制
+    """
+    if mode == "none":
+        return 0
+    if mode not in IMAGE_MODES:
+        raise ValueError(f"未知的image_mode: {mode}, 可选: {', '.join(IMAGE_MODES)}")
+
+    if os.path.lexists(dst):
+        os.remove(dst)
+
+    if mode == "hardlink":
+        try:
+            os.link(src, dst)
+            return 0
+        except OSError as e:
+            if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP, errno.EACCES):
+                raise
+    elif mode == "symlink":
+        try:
+            os.symlink(os.path.abspath(src), dst)
+            return 0
+        except OSError as e:
+            if e.errno not in (errno.EPERM, errno.ENOTSUP, errno.EACCES):
+                raise
+    elif mode == "reflink":
+        return _reflink(src, dst)
+
+    return _copy(src, dst)
+
+
+# 内容哈希: 标准库中较快的 blake2b, 128位摘要; 按块流式计算
+HASH_NAME = "blake2b-128"
+_HASH_CHUNK = 1 << 20
+
+
+def hash_file(path):
+    """文件内容的十六进制摘要"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def copy_hashed(src, dst):
+    """复制文件, 同一遍读取中计算内容摘要, 返回 (写入的字节数, 摘要); dst 已存在时先删除"""
+    if os.path.lexists(dst):
+        os.remove(dst)
+    digest = hashlib.blake2b(digest_size=16)
+    nbytes = 0
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        for chunk in iter(lambda: fsrc.read(_HASH_CHUNK), b""):
+            digest.update(chunk)
+            fdst.write(chunk)
+            nbytes += len(chunk)
+    shutil.copymode(src, dst)
+    return nbytes, digest.hexdigest()
+
+
+def write_text(path, text):
+    """写入文本文件, 返回写入的字节数"""
+    with open(path, "w") as f:
+        f.write(text)
+        return f.tell()
@@ -0,0 +1,136 @@
+import os
+import struct
+import pickle
+from PIL import Image
+
+# 携带图像尺寸的JPEG SOF标记 (排除 DHT/JPG/DAC)
+_JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7,
+                     0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def _jpeg_size(f):
+    f.seek(2)
+    while True:
+        byte = f.read(1)
+        # 跳到下一个标记前的0xFF (允许填充字节)
+        while byte and byte != b"\xff":
+            byte = f.read(1)
+        while byte == b"\xff":
+            byte = f.read(1)
+        if not byte:
+            return None
+        marker = byte[0]
+        if marker == 0xD8 or 0xD0 <= marker <= 0xD7 or marker == 0x01:
+            continue
+        if marker == 0xD9 or marker == 0xDA:
+            return None
+        header = f.read(2)
+        if len(header) != 2:
+            return None
+        length = struct.unpack(">H", header)[0]
+        if marker in _JPEG_SOF_MARKERS:
+            data = f.read(5)
+            if len(data) != 5:
+                return None
+            height, width = struct.unpack(">HH", data[1:5])
+            return width, height
+        f.seek(length - 2, os.SEEK_CUR)
+
+
+def _header_size(f):
+    head = f.read(32)
+    if head[:2] == b"\xff\xd8":
+        return _jpeg_size(f)
+    if head[:8] == b"\x89PNG\r\n\x1a\n" and head[12:16] == b"IHDR":
+        return struct.unpack(">II", head[16:24])
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return struct.unpack("<HH", head[6:10])
+    if head[:2] == b"BM" and len(head) >= 26:
+        dib_size = struct.unpack("<I", head[14:18])[0]
+        if dib_size == 12:
+            return struct.unpack("<HH", head[18:22])
+        width, height = struct.unpack("<ii", head[18:26])
+        return width, abs(height)
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        chunk = head[12:16]
+        if chunk == b"VP8 " and head[23:26] == b"\x9d\x01\x2a":
+            width, height = struct.unpack("<HH", head[26:30])
+            return width & 0x3FFF, height & 0x3FFF
+        if chunk == b"VP8L" and head[20:21] == b"\x2f":
+            bits = struct.unpack("<I", head[21:25])[0]
+            return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+        if chunk == b"VP8X":
+            width = int.from_bytes(head[24:27], "little") + 1
+            height = int.from_bytes(head[27:30], "little") + 1
+            return width, height
+    return None
+
+
+def get_image_size(path):
+    """
+    读取图片宽高, 只解析文件头 (JPEG SOF / PNG IHDR / GIF / BMP / WebP), 不解码像素
+
+    无法识别的格式回退到PIL, 图片无法读取时抛出 OSError
+    """
+    with open(path, "rb") as f:
+        size = _header_size(f)
+    if size is not None and size[0] > 0 and size[1] > 0:
+        return int(size[0]), int(size[1])
+
+    # 回退到PIL (同样是惰性读取, 不解码像素)
+    with Image.open(path) as img:
+        return img.size
+
+
+class SizeCache:
+    """
+    图片尺寸的持久化缓存, 以 路径+mtime+文件大小 为键
+
+    参数:
+        cache_file: 缓存文件路径, 为 None 时不启用缓存
+    """
+
+    def __init__(self, cache_file=None):
+        self.cache_file = cache_file
+        self._entries = {}
+        self._pending = {}
+        self._dirty = False
+        if cache_file and os.path.exists(cache_file):
+            with open(cache_file, "rb") as f:
+                self._entries = pickle.load(f)
+
+    def lookup(self, path):
+        """返回缓存中的 (width, height), 未命中时返回 None"""
+        if self.cache_file is None:
+            return None
+        key = os.path.abspath(path)
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        stamp = (st.st_mtime_ns, st.st_size)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == stamp:
+            return entry[1]
+        self._pending[key] = stamp
+        return None
+
+    def put(self, path, size):
+        """记录 lookup 未命中的图片尺寸"""
+        if self.cache_file is None or size is None:
+            return
+        key = os.path.abspath(path)
+        stamp = self._pending.pop(key, None)
+        if stamp is None:
+            return
+        self._entries[key] = (stamp, tuple(size))
+        self._dirty = True
+
+    def save(self):
+        if self.cache_file is None or not self._dirty:
+            return
+        tmp_file = f"{self.cache_file}.tmp"
+        with open(tmp_file, "wb") as f:
+            pickle.dump(self._entries, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file, self.cache_file)
+        self._dirty = False
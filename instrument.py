@@ -0,0 +1,160 @@
+import sys
+import json
+import time
+import cProfile
+from contextlib import contextmanager
+
+# 同一类警告最多打印的条数, 其余只计数并在报告中汇总
+WARN_LIMIT = 10
+
+# 当前正在统计的运行 (measure_run 中), 不在统计中时各函数不做任何记录
+_active = None
+_verbose = False
+
+
+class Metrics:
+    """一次转换的计时器、计数器和流水线各阶段统计"""
+
+    def __init__(self, name):
+        self.name = name
+        self.timers = {}
+        self.counters = {}
+        self.stages = {}
+        self.warnings = {}
+        self.start = time.perf_counter()
+        self.elapsed = None
+
+    def add_time(self, name, seconds):
+        self.timers[name] = self.timers.get(name, 0.0) + seconds
+
+    def add_count(self, name, n):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def report(self):
+        """可直接写为JSON的统计结果"""
+        elapsed = self.elapsed if self.elapsed is not None else time.perf_counter() - self.start
+        return {
+            "name": self.name,
+            "total_s": round(elapsed, 4),
+            "timers": {name: round(seconds, 4) for name, seconds in self.timers.items()},
+            "counters": dict(self.counters),
+            "stages": self.stages,
+            "warnings": dict(self.warnings),
+        }
+
+
+def set_verbose(verbose):
+    """打开或关闭进度条和信息输出 (默认关闭, 警告总是输出)"""
+    global _verbose
+    _verbose = bool(verbose)
+
+
+def is_verbose():
+    return _verbose
+
+
+@contextmanager
+def timer(name):
+    """累计代码块的耗时到计时器 name"""
+    if _active is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _active.add_time(name, time.perf_counter() - start)
+
+
+def count(name, n=1):
+    """计数器 name 加 n"""
+    if _active is not None and n:
+        _active.add_count(name, int(n))
+
+
+def record_stages(name, pipeline):
+    """记录流水线 (pipeline.Pipeline) 各阶段的吞吐量, 同名的多次运行合并为最后一次的累计值"""
+    if _active is not None and hasattr(pipeline, "report"):
+        _active.stages[name] = pipeline.report()
+
+
+def log(message):
+    """信息输出, 只在 verbose 时打印"""
+    if _verbose:
+        print(message)
+
+
+def warn(key, message):
+    """警告输出: 同一 key 只打印前 WARN_LIMIT 条, 其余计数后在运行结束时汇总"""
+    if _active is None:
+        print(message, file=sys.stderr)
+        return
+    seen = _active.warnings.get(key, 0) + 1
+    _active.warnings[key] = seen
+    if seen <= WARN_LIMIT:
+        print(message, file=sys.stderr)
+    elif seen == WARN_LIMIT + 1:
+        print(f"... ({key}) 后续警告不再逐条输出", file=sys.stderr)
+
+
+@contextmanager
+def _profiler(profile):
+    """profile 为 .html 时使用 pyinstrument (需安装), 否则使用 cProfile 写出 .prof 文件"""
+    if profile is None:
+        yield
+        return
+    if profile.endswith(".html"):
+        from pyinstrument import Profiler
+        profiler = Profiler()
+        profiler.start()
+        try:
+            yield
+        finally:
+            profiler.stop()
+            with open(profile, "w", encoding="utf-8") as f:
+                f.write(profiler.output_html())
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(profile)
+
+
+@contextmanager
+def measure_run(name, report=None, profile=None, verbose=None):
+    """
+    统计一次转换: 期间的 timer/count/warn 都记录到返回的 Metrics 中
+
+    参数:
+        name: 报告中的名称 (如转换函数名)
+        report: JSON报告的输出路径, 为 None 时不写文件
+        profile: 性能剖析结果的输出路径 (.prof 为 cProfile, .html 为 pyinstrument)
+        verbose: 是否显示进度条和信息输出, 为 None 时保持当前设置
+
+    嵌套调用时内层直接使用外层的 Metrics
+    """
+    global _active
+    if _active is not None:
+        yield _active
+        return
+
+    previous_verbose = _verbose
+    if verbose is not None:
+        set_verbose(verbose)
+    metrics = _active = Metrics(name)
+    try:
+        with _profiler(profile):
+            yield metrics
+    finally:
+        _active = None
+        set_verbose(previous_verbose)
+        metrics.elapsed = time.perf_counter() - metrics.start
+        suppressed = {key: n - WARN_LIMIT for key, n in metrics.warnings.items() if n > WARN_LIMIT}
+        for key, n in suppressed.items():
+            print(f"另有 {n} 条 {key} 警告未显示", file=sys.stderr)
+        if report is not None:
+            with open(report, "w", encoding="utf-8") as f:
+                json.dump(metrics.report(), f, ensure_ascii=False, indent=2)
@@ -0,0 +1,145 @@
+import os
+import json
+import hashlib
+from parallel import iter_tasks
+
+MANIFEST_NAME = ".convert_manifest.jsonl"
+
+# 每记录这么多条就把日志刷到磁盘, 中断后最多重做这么多张图片
+_FLUSH_EVERY = 256
+
+
+def file_stamp(path):
+    """文件的 [大小, mtime_ns], 文件不存在时返回 None"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+
+def fingerprint(*parts):
+    """由源文件状态、标注内容等组成的指纹 (需要repr稳定)"""
+    return hashlib.md5(repr(parts).encode("utf-8")).hexdigest()
+
+
+class ConversionManifest:
+    """
+    转换清单: 记录每张源图片的指纹、产生的输出文件和转换结果,
+    重新运行时只处理新增或变化的图片, 并删除已移除图片的输出
+
+    清单以追加写入的 JSON Lines 保存在输出目录下, 转换中途被终止时
+    已记录的图片在下次运行时直接跳过; finish() 时压缩为只含有效条目的文件
+
+    参数:
+        output_dir: 输出目录, 为 None 时不启用 (所有任务都重新执行)
+        config: 影响所有输出的转换参数 (如类别表、image_mode), 变化时全部重新转换
+    """
+
+    def __init__(self, output_dir=None, config=None):
+        self.enabled = output_dir is not None
+        self.config = fingerprint(config)
+        self.entries = {}
+        self.seen = set()
+        self._journal = None
+        self._pending = 0
+        if not self.enabled:
+            return
+
+        os.makedirs(output_dir, exist_ok=True)
+        self.path = os.path.join(output_dir, MANIFEST_NAME)
+        config_matches = False
+        if os.path.exists(self.path):
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        item = json.loads(line)
+                    except ValueError:
+                        # 上次运行被中断时最后一行可能不完整
+                        continue
+                    if "config" in item:
+                        config_matches = item["config"] == self.config
+                    elif "key" in item:
+                        if not config_matches:
+                            item["fp"] = None
+                        self.entries[item["key"]] = item
+
+        # 重写清单头部, 之后的记录追加写入
+        self._rewrite()
+
+    def _rewrite(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"config": self.config}) + "\n")
+            for entry in self.entries.values():
+                f.write(json.dumps(entry, separators=(",", ":")) + "\n")
+        os.replace(tmp_path, self.path)
+        self._journal = open(self.path, "a", encoding="utf-8")
+
+    def lookup(self, key, fp):
+        """指纹一致且输出文件都在时返回 (True, 上次的结果), 否则返回 (False, None)"""
+        if not self.enabled:
+            return False, None
+        self.seen.add(key)
+        entry = self.entries.get(key)
+        if entry is None or entry["fp"] != fp:
+            return False, None
+        if not all(os.path.lexists(path) for path in entry["outputs"]):
+            return False, None
+        return True, entry["result"]
+
+    def record(self, key, fp, outputs, result):
+        """记录一张图片的转换结果 (result 需要能被JSON序列化)"""
+        if not self.enabled:
+            return
+        entry = {"key": key, "fp": fp,
+                 "outputs": [path for path in outputs if os.path.lexists(path)],
+                 "result": result}
+        self.entries[key] = entry
+        self._journal.write(json.dumps(entry, separators=(",", ":")) + "\n")
+        self._pending += 1
+        if self._pending >= _FLUSH_EVERY:
+            self._journal.flush()
+            self._pending = 0
+
+    def run(self, func, tasks, keys, fingerprints, outputs, workers=1, desc=None):
+        """
+        只对清单中没有或已变化的任务执行 func, 按任务顺序产出 (result, fresh)
+
+        fresh 为 False 表示结果来自清单 (本次没有写入任何文件)
+        """
+        tasks = list(tasks)
+        if not self.enabled:
+            for result in iter_tasks(func, tasks, workers, desc):
+                yield result, True
+            return
+
+        cached = [self.lookup(key, fp) for key, fp in zip(keys, fingerprints)]
+        stale = [i for i, (hit, _) in enumerate(cached) if not hit]
+        fresh_results = iter_tasks(func, [tasks[i] for i in stale], workers, desc)
+        for i, (hit, result) in enumerate(cached):
+            if hit:
+                yield result, False
+                continue
+            result = next(fresh_results)
+            self.record(keys[i], fingerprints[i], outputs[i], result)
+            yield result, True
+
+    def finish(self):
+        """删除本次运行中已不存在的源图片对应的输出, 并压缩清单"""
+        if not self.enabled:
+            return 0
+        removed = [key for key in self.entries if key not in self.seen]
+        live_outputs = {path for key in self.seen if key in self.entries
+                        for path in self.entries[key]["outputs"]}
+        deleted = 0
+        for key in removed:
+            for path in self.entries.pop(key)["outputs"]:
+                if path not in live_outputs and os.path.lexists(path):
+                    os.remove(path)
+                    deleted += 1
+        self._journal.close()
+        self._rewrite()
+        self._journal.close()
+        self._journal = None
+        return deleted
@@ -0,0 +1,236 @@
+import os
+import json
+import argparse
+import numpy as np
+from dataset import Dataset
+from fileio import IMAGE_MODES, write_text
+from parallel import DEFAULT_IO_THREADS, DEFAULT_QUEUE_DEPTH, run_tasks
+from instrument import measure_run, timer
+from writers import count_written, image_pipeline, stage_report, write_coco, write_voc, write_yolo
+
+# 打包格式: 一个目录中只有三个文件 (图片可选放在 images/{split}/ 下)
+#   boxes.npy: 全部标注框, 按图片顺序连续存放, 可直接内存映射
+#   offsets.npy: 第 i 张图片的框为 boxes[offsets[i]:offsets[i+1]]
+#   index.json: 类别表、划分名和图片表 (文件名、路径、宽高等)
+PACKED_VERSION = 1
+PACKED_INDEX = "index.json"
+PACKED_BOXES = "boxes.npy"
+PACKED_OFFSETS = "offsets.npy"
+
+# 展开为VOC时的写出格式 (见 write_voc), classes_eol 为 classes.txt 每行以换行结尾;
+# 索引中没有保存格式时使用这里的默认值
+VOC_STYLE = {"indent": "  ", "with_source": False, "image_set_eol": True, "classes_eol": False}
+
+# boxes.npy 的记录格式: 像素坐标 x1, y1, x2, y2; area/wh 未知时为 NaN
+BOX_DTYPE = np.dtype([("class_idx", "<i4"), ("box", "<f8", (4,)), ("area", "<f8"), ("wh", "<f8", (2,))])
+
+
+def is_packed(root):
+    """目录是否为打包格式的数据集"""
+    return os.path.isfile(os.path.join(root, PACKED_INDEX)) and os.path.isfile(os.path.join(root, PACKED_BOXES))
+
+
+class PackedLabels:
+    """
+    打包格式的只读访问: 标注框以内存映射方式打开, 取单张图片的框不复制数据
+
+    用法:
+        labels = PackedLabels("packed/")
+        i = labels.find("000001.jpg", "train")
+        labels.boxes(i)      # (n, 4) 的视图
+        labels.class_idx(i)
+    """
+
+    def __init__(self, root):
+        self.root = root
+        with open(os.path.join(root, PACKED_INDEX), encoding="utf-8") as f:
+            index = json.load(f)
+        if index.get("version") != PACKED_VERSION:
+            raise ValueError(f"不支持的打包格式版本: {index.get('version')}")
+        self.categories = index["categories"]
+        self.split_names = index["split_names"]
+        self.has_wh = index["has_wh"]
+        self.voc_style = dict(VOC_STYLE, **index.get("voc_style", {}))
+        images = index["images"]
+        self.split = [self.split_names[s] for s in images["split"]]
+        self.file_name = images["file_name"]
+        self.path = [path if os.path.isabs(path) else os.path.join(root, path) for path in images["path"]]
+        self.width = np.asarray(images["width"], dtype=np.int64)
+        self.height = np.asarray(images["height"], dtype=np.int64)
+        self.image_id = np.asarray(images["image_id"], dtype=np.int64)
+        self.labeled = np.asarray(images["labeled"], dtype=bool)
+        self.offsets = np.load(os.path.join(root, PACKED_OFFSETS), mmap_mode="r")
+        self.records = np.load(os.path.join(root, PACKED_BOXES), mmap_mode="r")
+        self._rows = None
+
+    def __len__(self):
+        return len(self.file_name)
+
+    @property
+    def num_boxes(self):
+        return len(self.records)
+
+    def find(self, file_name, split=None):
+        """按文件名 (和划分) 查找图片行号, 找不到时抛出 KeyError"""
+        if self._rows is None:
+            self._rows = {}
+            for i, (name, split_name) in enumerate(zip(self.file_name, self.split)):
+                self._rows.setdefault((name, split_name), i)
+                self._rows.setdefault((name, None), i)
+        return self._rows[(file_name, split)]
+
+    def labels(self, i):
+        """第 i 张图片的全部标注记录 (BOX_DTYPE 结构数组的视图)"""
+        return self.records[int(self.offsets[i]):int(self.offsets[i + 1])]
+
+    def boxes(self, i):
+        """第 i 张图片的框 (x1, y1, x2, y2), 内存映射文件上的视图"""
+        return self.labels(i)["box"]
+
+    def class_idx(self, i):
+        return self.labels(i)["class_idx"]
+
+    def to_dataset(self, splits=None):
+        """转换为 Dataset; splits 不为 None 时只保留这些划分"""
+        records = self.records
+        image_idx = np.repeat(np.arange(len(self), dtype=np.int64), np.diff(self.offsets))
+        images = {"split": list(self.split), "file_name": list(self.file_name), "path": list(self.path),
+                  "width": self.width, "height": self.height, "image_id": self.image_id,
+                  "labeled": self.labeled}
+        dataset = Dataset(self.categories, list(self.split_names), images, image_idx,
+                          records["class_idx"].astype(np.int64), np.array(records["box"]),
+                          np.array(records["area"]), np.array(records["wh"]) if self.has_wh else None)
+        if splits is not None:
+            dataset = dataset.select_images([i for i, split in enumerate(self.split) if split in splits])
+        return dataset
+
+
+def read_packed(packed_root, splits=None):
+    """读取打包格式的数据集为 Dataset"""
+    return PackedLabels(packed_root).to_dataset(splits)
+
+
+def _save_npy(path, array):
+    tmp_file = f"{path}.tmp"
+    with open(tmp_file, "wb") as f:
+        np.save(f, array)
+    return tmp_file
+
+
+def write_packed(dataset, packed_root, workers=1, image_mode="none", io_threads=DEFAULT_IO_THREADS,
+                 queue_depth=DEFAULT_QUEUE_DEPTH, deduplicator=None, transform=None, voc_style=None):
+    """
+    写出打包格式的数据集: 全部标注写入一个可内存映射的文件, 不再每张图片一个标注文件
+
+    参数:
+        image_mode: 图片落盘方式; 为 none 时索引中记录源图片的绝对路径,
+                    否则图片放置到 images/{split}/ 下并记录相对路径
+        workers: 放置图片的并行进程数
+        io_threads: 放置图片的线程数, 0 为逐张串行处理
+        queue_depth: 同时在途的图片数上限
+        deduplicator: dedup.Deduplicator, 给出时按内容去重放置图片
+        transform: transform.ImageTransform, 给出时缩放/重新编码图片 (数据集须已经过 transform.apply)
+        voc_style: 展开为VOC时的写出格式 (见 VOC_STYLE), 保存在索引中, 使展开结果与直接转换的输出一致
+
+    返回:
+        统计信息 {"images", "images_skipped", "bytes_written"}
+    """
+    os.makedirs(packed_root, exist_ok=True)
+    stats = {"images": dataset.num_images, "images_skipped": 0, "bytes_written": 0}
+
+    if image_mode == "none":
+        paths = [os.path.abspath(path) for path in dataset.path]
+    else:
+        for split in dataset.split_names:
+            os.makedirs(os.path.join(packed_root, "images", split), exist_ok=True)
+        paths = [os.path.join("images", split, file_name)
+                 for split, file_name in zip(dataset.split, dataset.file_name)]
+        tasks = [(src, os.path.join(packed_root, dst), image_mode) for src, dst in zip(dataset.path, paths)]
+        placer = deduplicator or transform
+        if placer is not None:
+            stats["bytes_written"] += sum(placer.place(tasks, workers, io_threads, queue_depth, desc="Placing images"))
+        else:
+            func = image_pipeline(None, io_threads, queue_depth)
+            with timer("write"):
+                stats["bytes_written"] += sum(run_tasks(func, tasks, workers, desc="Placing images"))
+            stage_report("write_packed", func, workers)
+
+    with timer("write"):
+        records = np.zeros(dataset.num_boxes, dtype=BOX_DTYPE)
+        records["class_idx"] = dataset.class_idx
+        records["box"] = dataset.boxes
+        records["area"] = dataset.area
+        records["wh"] = np.nan if dataset.wh is None else dataset.wh
+
+        split_index = {split: i for i, split in enumerate(dataset.split_names)}
+        index = {
+            "version": PACKED_VERSION,
+            "categories": dataset.categories,
+            "split_names": dataset.split_names,
+            "has_wh": dataset.wh is not None,
+            "voc_style": dict(VOC_STYLE, **(voc_style or {})),
+            "images": {
+                "split": [split_index[split] for split in dataset.split],
+                "file_name": dataset.file_name,
+                "path": paths,
+                "width": dataset.width.tolist(),
+                "height": dataset.height.tolist(),
+                "image_id": dataset.image_id.tolist(),
+                "labeled": dataset.labeled.tolist(),
+            },
+        }
+
+        # 先写临时文件, 索引最后替换
+        boxes_tmp = _save_npy(os.path.join(packed_root, PACKED_BOXES), records)
+        offsets_tmp = _save_npy(os.path.join(packed_root, PACKED_OFFSETS), dataset.box_offsets())
+        index_file = os.path.join(packed_root, PACKED_INDEX)
+        with open(f"{index_file}.tmp", "w", encoding="utf-8") as f:
+            json.dump(index, f, ensure_ascii=False, separators=(",", ":"))
+        for tmp_file in (boxes_tmp, offsets_tmp, f"{index_file}.tmp"):
+            stats["bytes_written"] += os.path.getsize(tmp_file)
+            os.replace(tmp_file, tmp_file[:-4])
+    count_written(stats)
+    return stats
+
+
+def export_packed(packed_root, fmt, output_dir, splits=None, workers=1, image_mode="copy"):
+    """
+    把打包格式展开为普通的每张图片一个标注文件的数据集
+
+    参数:
+        fmt: yolo | voc | coco
+        splits: 只导出这些划分, 默认全部
+    """
+    labels = PackedLabels(packed_root)
+    dataset = labels.to_dataset(splits)
+    if fmt == "yolo":
+        return write_yolo(dataset, output_dir, workers=workers, image_mode=image_mode)
+    if fmt == "voc":
+        # 按打包时保存的格式写出XML、ImageSets 和 classes.txt
+        style = labels.voc_style
+        stats = write_voc(dataset, output_dir, indent=style["indent"], with_source=style["with_source"],
+                          image_set_eol=style["image_set_eol"], workers=workers, image_mode=image_mode)
+        class_names = list(dict.fromkeys(dataset.class_names))
+        text = "".join(f"{name}\n" for name in class_names) if style["classes_eol"] else "\n".join(class_names)
+        stats["bytes_written"] += write_text(os.path.join(output_dir, "classes.txt"), text)
+        return stats
+    if fmt == "coco":
+        return write_coco(dataset, output_dir, workers=workers, image_mode=image_mode)
+    raise ValueError(f"未知的数据集格式: {fmt}, 可选: yolo/voc/coco")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="把打包格式的数据集展开为 YOLO/VOC/COCO")
+    parser.add_argument("input", help="打包格式的数据集目录")
+    parser.add_argument("output", help="输出目录")
+    parser.add_argument("--format", required=True, choices=["yolo", "voc", "coco"], help="输出格式")
+    parser.add_argument("--splits", nargs="*", help="只导出这些划分")
+    parser.add_argument("--image-mode", default="copy", choices=IMAGE_MODES, help="图片落盘方式")
+    parser.add_argument("--workers", type=int, default=1, help="并行进程数, <=0 为全部CPU核心")
+    parser.add_argument("--verbose", action="store_true", help="显示进度条")
+    parser.add_argument("--report", help="写出JSON统计报告 (各步骤耗时和计数) 的路径")
+    args = parser.parse_args()
+
+    with measure_run("export_packed", args.report, verbose=args.verbose):
+        stats = export_packed(args.input, args.format, args.output, args.splits, args.workers, args.image_mode)
+    print(f"已导出 {stats['images']} 张图片到 {args.output}，写入 {stats['bytes_written']} 字节")
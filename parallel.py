@@ -0,0 +1,58 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from tqdm import tqdm
+from instrument import is_verbose
+from pipeline import Pipeline
+
+# 线程流水线的默认I/O线程数和在途任务数
+DEFAULT_IO_THREADS = 8
+DEFAULT_QUEUE_DEPTH = 64
+
+
+def resolve_workers(workers):
+    """workers<=0 表示使用全部CPU核心, None 表示单进程"""
+    if workers is None:
+        return 1
+    if workers <= 0:
+        return os.cpu_count() or 1
+    return workers
+
+
+def iter_tasks(func, tasks, workers=1, desc=None, chunksize=None):
+    """
+    在进程池中对每个任务执行 func, 按任务顺序逐个产出结果
+
+    参数:
+        func: 模块级函数 (需要能被pickle), 每次接收一个任务描述;
+              也可以是 Pipeline, 单进程且 threaded 时在线程流水线中运行, 否则依次执行各阶段
+        tasks: 任务描述列表, 应只包含单张图片所需的少量数据
+        workers: 进程数, 1 为串行执行, <=0 为全部CPU核心
+        desc: 进度条描述, 为 None 或未打开 verbose 时不显示进度条
+        chunksize: 每次发送给子进程的任务数量, 默认自动计算
+    """
+    tasks = list(tasks)
+    workers = resolve_workers(workers)
+    if not is_verbose():
+        desc = None
+    progress = dict(total=len(tasks), desc=desc, disable=desc is None)
+
+    if isinstance(func, Pipeline) and func.threaded and workers == 1:
+        yield from func.imap(tasks, desc)
+        return
+
+    if workers == 1 or len(tasks) <= 1:
+        for task in tqdm(tasks, **progress):
+            yield func(task)
+        return
+
+    if chunksize is None:
+        # 每个进程约分到8批, 兼顾负载均衡与通信开销
+        chunksize = max(1, min(256, len(tasks) // (workers * 8)))
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from tqdm(executor.map(func, tasks, chunksize=chunksize), **progress)
+
+
+def run_tasks(func, tasks, workers=1, desc=None, chunksize=None):
+    """与 iter_tasks 相同, 但返回结果列表"""
+    return list(iter_tasks(func, tasks, workers, desc, chunksize))
@@ -0,0 +1,191 @@
+import time
+import queue
+import threading
+from tqdm import tqdm
+
+# 阶段之间传递的结束标记
+_DONE = object()
+
+
+class _Failure:
+    """某个阶段抛出的异常, 随任务传到最后由调用方重新抛出"""
+
+    def __init__(self, exc):
+        self.exc = exc
+
+
+class StageStats:
+    """单个阶段的统计: 处理数量、累计耗时和吞吐量"""
+
+    def __init__(self, name, threads):
+        self.name = name
+        self.threads = threads
+        self.items = 0
+        self.busy = 0.0
+        self.wall = 0.0
+        self._start = None
+        self._end = None
+        self._lock = threading.Lock()
+
+    def record(self, count, start, end):
+        with self._lock:
+            self.items += count
+            self.busy += end - start
+            if self._start is None or start < self._start:
+                self._start = start
+            if self._end is None or end > self._end:
+                self._end = end
+
+    def finish_run(self):
+        """一次运行结束, 把本次的时间跨度计入 wall"""
+        if self._start is not None:
+            self.wall += self._end - self._start
+        self._start = self._end = None
+
+    def as_dict(self):
+        # 逐个调用 (未经 imap) 时本次运行尚未结束, 时间跨度算到最后一次记录为止
+        wall = self.wall + (self._end - self._start if self._start is not None else 0.0)
+        return {
+            "threads": self.threads,
+            "items": self.items,
+            "busy_s": round(self.busy, 4),
+            "items_per_s": round(self.items / wall, 1) if wall > 0 else None,
+            "utilization": round(self.busy / (wall * self.threads), 3) if wall > 0 else None,
+        }
+
+
+class Pipeline:
+    """
+    多阶段线程流水线: 任务依次经过各阶段, 每个阶段有自己的线程数, 阶段之间并行重叠
+
+    适合网络存储等高延迟I/O: 图片复制、标签读取、标注写入在不同线程中同时进行,
+    不再一张图片一张图片地等待; 按任务顺序产出结果
+
+    参数:
+        stages: [(阶段名, 函数, 线程数), ...] 或 [(阶段名, 函数, 线程数, 批大小), ...];
+                函数接收上一阶段的输出 (第一个阶段接收任务描述), 需为模块级函数;
+                批大小大于1时函数一次接收一个列表并返回等长的结果列表
+        queue_depth: 同时在流水线中的任务数上限 (生产者在达到上限时等待)
+        threaded: 为 False 时 iter_tasks 不启动线程, 逐个任务依次执行各阶段 (仍统计各阶段耗时)
+
+    也可以像普通函数一样调用 (依次执行所有阶段), 用于进程池
+    """
+
+    def __init__(self, stages, queue_depth=64, threaded=True):
+        self.stages = [tuple(stage) + (1,) * (4 - len(stage)) for stage in stages]
+        self.queue_depth = max(1, queue_depth)
+        self.threaded = threaded
+        self.stats = [StageStats(name, threads if threaded else 1) for name, _, threads, _ in self.stages]
+
+    def __getstate__(self):
+        # 传给子进程时不带统计信息 (含锁)
+        return {"stages": self.stages, "queue_depth": self.queue_depth, "threaded": self.threaded}
+
+    def __setstate__(self, state):
+        self.__init__(state["stages"], state["queue_depth"], state["threaded"])
+
+    def __call__(self, task):
+        for (_, func, _, batch), stats in zip(self.stages, self.stats):
+            start = time.perf_counter()
+            task = func([task])[0] if batch > 1 else func(task)
+            stats.record(1, start, time.perf_counter())
+        return task
+
+    def report(self):
+        """{阶段名: {"threads", "items", "busy_s", "items_per_s", "utilization"}}"""
+        return {stats.name: stats.as_dict() for stats in self.stats}
+
+    def imap(self, tasks, desc=None):
+        """在线程中运行流水线, 按任务顺序逐个产出结果"""
+        tasks = list(tasks)
+        in_flight = threading.Semaphore(self.queue_depth)
+        stop = threading.Event()
+        queues = [queue.Queue() for _ in range(len(self.stages) + 1)]
+        remaining = [threads for _, _, threads, _ in self.stages]
+        remaining_lock = threading.Lock()
+
+        def produce():
+            for seq, task in enumerate(tasks):
+                while not in_flight.acquire(timeout=0.1):
+                    if stop.is_set():
+                        return
+                if stop.is_set():
+                    return
+                queues[0].put((seq, task))
+            for _ in range(self.stages[0][2]):
+                queues[0].put(_DONE)
+
+        def work(index):
+            name, func, threads, batch = self.stages[index]
+            source, target = queues[index], queues[index + 1]
+            stats = self.stats[index]
+            done = False
+            while not done and not stop.is_set():
+                try:
+                    item = source.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                if item is _DONE:
+                    break
+                items = [item]
+                while len(items) < batch:
+                    try:
+                        item = source.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is _DONE:
+                        done = True
+                        break
+                    items.append(item)
+
+                # 已失败的任务直接传给下一阶段
+                ok = [(seq, value) for seq, value in items if not isinstance(value, _Failure)]
+                for seq, value in items:
+                    if isinstance(value, _Failure):
+                        target.put((seq, value))
+                if not ok:
+                    continue
+                start = time.perf_counter()
+                try:
+                    if batch > 1:
+                        results = func([value for _, value in ok])
+                    else:
+                        results = [func(ok[0][1])]
+                except Exception as exc:
+                    results = [_Failure(exc)] * len(ok)
+                stats.record(len(ok), start, time.perf_counter())
+                for (seq, _), result in zip(ok, results):
+                    target.put((seq, result))
+
+            # 本阶段最后一个线程结束时通知下一阶段
+            with remaining_lock:
+                remaining[index] -= 1
+                last = remaining[index] == 0
+            if last and index + 1 < len(self.stages):
+                for _ in range(self.stages[index + 1][2]):
+                    queues[index + 1].put(_DONE)
+
+        threads = [threading.Thread(target=produce, daemon=True)]
+        for index, (_, _, count, _) in enumerate(self.stages):
+            threads.extend(threading.Thread(target=work, args=(index,), daemon=True) for _ in range(count))
+        for thread in threads:
+            thread.start()
+
+        output = queues[-1]
+        pending = {}
+        try:
+            for seq in tqdm(range(len(tasks)), desc=desc, disable=desc is None):
+                while seq not in pending:
+                    done_seq, result = output.get()
+                    pending[done_seq] = result
+                result = pending.pop(seq)
+                in_flight.release()
+                if isinstance(result, _Failure):
+                    raise result.exc
+                yield result
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+            for stats in self.stats:
+                stats.finish_run()
@@ -0,0 +1,363 @@
+import os
+import numpy as np
+from coco_shards import find_shards
+from coco_stream import load_coco_index
+from dataset import Dataset, DatasetBuilder
+from image_size import get_image_size, SizeCache
+from instrument import count, record_stages, timer, warn
+from packed import is_packed, read_packed
+from parallel import DEFAULT_IO_THREADS, DEFAULT_QUEUE_DEPTH, iter_tasks, run_tasks
+from pipeline import Pipeline
+from subset import select_subset, subset_categories
+from voc_reader import load_voc_annotations
+from yolo_reader import load_yolo_labels, report_malformed
+
+
+def _probe_size(path):
+    """读取图片宽高, 图片不存在或无法读取时返回 None (在子进程中执行)"""
+    try:
+        return get_image_size(path)
+    except OSError:
+        return None
+
+
+def _io_func(func, io_threads, queue_depth):
+    """把单个I/O函数包装为流水线, io_threads 大于0时在线程中执行"""
+    return Pipeline([("read", func, max(io_threads, 1))], queue_depth, threaded=io_threads > 0)
+
+
+def _count_read(dataset):
+    count("images_read", dataset.num_images)
+    count("boxes_read", dataset.num_boxes)
+
+
+def _select_min_area(dataset, subset):
+    """
+    读取尺寸之后按 min_area 筛选 (需要像素坐标); 类别条件和 drop_empty 已在读取尺寸之前生效,
+    这里 drop_empty 只去掉因 min_area 而变空的图片, 不重复计数
+    """
+    min_area = subset.get("min_area")
+    if not min_area:
+        return dataset
+    had_boxes = np.bincount(dataset.image_idx, minlength=dataset.num_images) > 0
+    dataset = select_subset(dataset, min_area=min_area)
+    if subset.get("drop_empty"):
+        emptied = had_boxes & (np.bincount(dataset.image_idx, minlength=dataset.num_images) == 0)
+        if emptied.any():
+            count("images_filtered", int(emptied.sum()))
+            dataset = dataset.select_images(~emptied)
+    return dataset
+
+
+def read_class_names(path):
+    """读取类别文件 (每行一个类别名称, 忽略空行)"""
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def _load_coco_file(ann_file):
+    """
+    读取一个COCO标注文件或分片 (在子进程中执行)
+
+    返回:
+        (类别表, [(file_name, width, height, image_id, [category_id, ...], [bbox, ...]), ...])
+    """
+    categories, images, anns_by_image = load_coco_index(ann_file)
+    records = []
+    for img in images:
+        # 取出后即释放, 原始标注与记录不同时完整占用内存
+        anns = anns_by_image.pop(img["id"], [])
+        records.append((img["file_name"], img["width"], img["height"], img["id"],
+                        [category_id for _, category_id, _ in anns], [bbox for _, _, bbox in anns]))
+    return categories, records
+
+
+def read_coco(coco_root, splits=("train", "val"), workers=1):
+    """
+    读取COCO数据集 (annotations/instances_{split}2014.json, images/{split}2014/), 标注文件不存在的划分会被跳过
+
+    类别表按各划分标注文件中出现的顺序合并 (同一 category_id 以后读到的为准);
+    划分为分片格式 (见 coco_shards.py) 时用 workers 个进程并行读取各分片, 按分片顺序合并;
+    coco_root 为打包格式的目录时读取其中的这些划分
+    """
+    if is_packed(coco_root):
+        return read_packed(coco_root, splits)
+
+    builder = DatasetBuilder()
+    categories = {}
+    with timer("parse"):
+        for split in splits:
+            ann_dir = f"{coco_root}/annotations"
+            ann_files = find_shards(ann_dir, f"{split}2014") or [f"{ann_dir}/instances_{split}2014.json"]
+            if not os.path.exists(ann_files[0]):
+                continue
+            count("coco_files_read", len(ann_files))
+
+            builder.add_split(split)
+            for split_categories, records in iter_tasks(_load_coco_file, ann_files, workers):
+                categories.update({cat["id"]: cat for cat in split_categories})
+                # 逐条取出, 已加入的记录即释放; 先记录 category_id, 所有划分读完后再换成类别下标
+                records.reverse()
+                while records:
+                    file_name, width, height, image_id, class_idx, boxes = records.pop()
+                    builder.add_image(split, file_name, f"{coco_root}/images/{split}2014/{file_name}",
+                                      width, height, image_id, True, class_idx, boxes)
+
+        builder.categories = list(categories.values())
+        dataset = builder.build()
+
+    with timer("coordinates"):
+        # bbox 为 (x, y, 宽, 高), 保留原始宽高
+        dataset.wh = dataset.boxes[:, 2:].copy()
+        dataset.boxes[:, 2:] += dataset.boxes[:, :2]
+        cat_index = {cat_id: i for i, cat_id in enumerate(categories)}
+        dataset.class_idx = np.asarray([cat_index[c] for c in dataset.class_idx.tolist()], dtype=np.int64)
+    _count_read(dataset)
+    return dataset
+
+
+def read_voc(voc_root, splits=("train", "val", "test"), workers=1, xml_cache=None, size_cache=None,
+             trust_xml_size=True, io_threads=DEFAULT_IO_THREADS, queue_depth=DEFAULT_QUEUE_DEPTH, subset=None):
+    """
+    读取VOC数据集 (Annotations/, JPEGImages/, ImageSets/Main/{split}.txt)
+
+    类别为全部XML中出现的名称排序后的列表, id 从 1 开始; image_id 为图片在划分文件中的行号;
+    源图片不存在的行会被跳过
+
+    参数:
+        splits: 要读取的划分, 为 None 时把全部标注文件作为一个名为 "all" 的划分
+        workers: 解析XML和读取图片尺寸的进程数
+        xml_cache: XML解析结果缓存文件 (见 load_voc_annotations)
+        size_cache: 图片尺寸缓存文件
+        trust_xml_size: 优先使用XML中的<size>, 为 False 时总是从图片文件头读取
+        io_threads: 读取XML和图片文件头的线程数, 0 为逐个串行读取
+        queue_depth: 同时在途的文件数上限
+        subset: 筛选条件 (见 subset.make_subset); 类别条件和 drop_empty 在读取图片尺寸之前按XML生效,
+                去掉的图片不再读取, min_area 在得到尺寸之后生效
+
+    voc_root 为打包格式的目录时直接读取 (splits 为 None 时读取全部划分)
+    """
+    if is_packed(voc_root):
+        return select_subset(read_packed(voc_root, splits), **(subset or {}))
+
+    # 每个XML只解析一次
+    records = load_voc_annotations(f"{voc_root}/Annotations", workers, xml_cache, io_threads, queue_depth)
+    names = sorted({obj[0] for record in records.values() for obj in record.objects})
+    class_ids = {name: i for i, name in enumerate(names)}
+    categories = [{"id": i + 1, "name": name} for i, name in enumerate(names)]
+    subset = subset or {}
+    remap = subset_categories(categories, subset.get("keep_classes"), subset.get("exclude_classes"),
+                              subset.get("class_map"))
+    if remap is not None:
+        # 类别筛选/重映射只用XML中的名称, 去掉的类别映射为 -1
+        categories, mapping = remap
+        class_ids = {name: int(mapping[i]) for name, i in class_ids.items()}
+    builder = DatasetBuilder(categories)
+    size_cache = SizeCache(size_cache)
+
+    rows = []
+    for split in (splits if splits is not None else ["all"]):
+        if splits is None:
+            # 未划分的数据集: 全部标注文件作为一个划分
+            image_names = list(records)
+        else:
+            split_file = f"{voc_root}/ImageSets/Main/{split}.txt"
+            if not os.path.exists(split_file):
+                continue
+            with open(split_file) as f:
+                image_names = [line.strip() for line in f.readlines()]
+        first_row = len(rows)
+        for image_id, base_name in enumerate(image_names):
+            record = records.get(base_name)
+            if subset.get("drop_empty") and (record is None or
+                                             all(class_ids[obj[0]] < 0 for obj in record.objects)):
+                # 筛选后没有框的图片: 不读取尺寸, 也不加入数据集 (其中的框都属于去掉的类别)
+                count("images_filtered")
+                count("boxes_filtered", len(record.objects) if record is not None else 0)
+                continue
+            rows.append((split, image_id, base_name, f"{voc_root}/JPEGImages/{base_name}.jpg"))
+        if len(rows) > first_row or not subset.get("drop_empty"):
+            builder.add_split(split)
+
+    # 图片尺寸: 缓存 > XML中的<size> (可选) > 图片文件头
+    sizes = []
+    probes = []
+    for split, _, base_name, src_img in rows:
+        record = records.get(base_name)
+        size = size_cache.lookup(src_img)
+        if size is None and trust_xml_size and record is not None and record.width and record.height:
+            size = (record.width, record.height) if os.path.exists(src_img) else False
+        if size is None:
+            probes.append(len(sizes))
+        sizes.append(size)
+    probe = _io_func(_probe_size, io_threads, queue_depth)
+    with timer("probe_sizes"):
+        results = run_tasks(probe, [rows[i][3] for i in probes], workers)
+    if workers == 1:
+        record_stages("probe_sizes", probe)
+    count("images_probed", len(probes))
+    for i, size in zip(probes, results):
+        sizes[i] = size
+        size_cache.put(rows[i][3], size)
+    size_cache.save()
+    count("images_missing", sizes.count(None) + sizes.count(False))
+
+    for (split, image_id, base_name, src_img), size in zip(rows, sizes):
+        if not size:
+            continue
+        record = records.get(base_name)
+        objects = record.objects if record is not None else []
+        selected = [obj for obj in objects if class_ids[obj[0]] >= 0]
+        if len(selected) < len(objects):
+            count("boxes_filtered", len(objects) - len(selected))
+        builder.add_image(split, f"{base_name}.jpg", src_img, size[0], size[1], image_id,
+                          record is not None,
+                          [class_ids[obj[0]] for obj in selected],
+                          [obj[1:] for obj in selected])
+    dataset = builder.build()
+    _count_read(dataset)
+    return _select_min_area(dataset, subset)
+
+
+def read_yolo(yolo_root, splits=("train", "val", "test"), class_names=None, workers=1, size_cache=None,
+              extensions=None, long_rows="skip", io_threads=DEFAULT_IO_THREADS, queue_depth=DEFAULT_QUEUE_DEPTH,
+              subset=None):
+    """
+    读取YOLO数据集 ({split}/images/, {split}/labels/), images 目录不存在的划分会被跳过
+
+    参数:
+        class_names: 类别名称列表 (按YOLO类别索引顺序); 为 None 时以标签中出现的
+                     类别编号 (按字符串) 排序后作为类别表
+        workers: 读取标签和图片尺寸的进程数
+        size_cache: 图片尺寸缓存文件
+        extensions: 只读取这些扩展名的图片 (不区分大小写), 为 None 时读取目录下全部文件
+        long_rows: 多于5列的标签行的处理方式, "skip" 跳过, "bbox" 取前4个数作为框,
+                   "polygon" 取分割多边形的外接框
+        io_threads: 读取标签和图片文件头的线程数, 0 为逐个串行读取
+        queue_depth: 同时在途的图片数上限
+        subset: 筛选条件 (见 subset.make_subset); 类别条件和 drop_empty 在读取图片尺寸之前按标签生效,
+                去掉的图片不再读取, min_area 在得到尺寸之后生效
+
+    每张图片的 image_id 在各划分内从 1 开始; 无法读取的图片会被报告, 宽高记为 0 且不带标注;
+    格式错误的标签行会被跳过并报告; yolo_root 为打包格式的目录时直接读取, 使用其中保存的类别表
+    """
+    if is_packed(yolo_root):
+        return select_subset(read_packed(yolo_root, splits), **(subset or {}))
+
+    subset = subset or {}
+    size_cache = SizeCache(size_cache)
+    rows = []
+    label_paths = []
+    split_names = []
+    with timer("list"):
+        for split in splits:
+            images_dir = os.path.join(yolo_root, split, "images")
+            labels_dir = os.path.join(yolo_root, split, "labels")
+            if not os.path.isdir(images_dir):
+                continue
+            split_names.append(split)
+            for img_name in os.listdir(images_dir):
+                if extensions is not None and not img_name.lower().endswith(tuple(extensions)):
+                    continue
+                rows.append((split, img_name, os.path.join(images_dir, img_name)))
+                label_paths.append(os.path.join(labels_dir, f"{os.path.splitext(img_name)[0]}.txt"))
+
+    # image_id 为图片在所属划分中的序号 (从1开始), 筛选前确定
+    image_id = np.zeros(len(rows), dtype=np.int64)
+    for split in split_names:
+        split_rows = [i for i, (name, _, _) in enumerate(rows) if name == split]
+        image_id[split_rows] = np.arange(1, len(split_rows) + 1)
+
+    # 先把全部标签一次性读入一个数组 (不读取图片), 筛选后只读取剩下的图片的尺寸
+    labels = load_yolo_labels(label_paths, long_rows, workers, io_threads, queue_depth)
+    report_malformed(labels.malformed)
+    count("long_rows_skipped", labels.skipped)
+    labeled = labels.labeled
+    image_idx = np.repeat(np.arange(len(rows), dtype=np.int64), np.diff(labels.offsets))
+    class_ids, values = labels.class_ids, labels.boxes
+
+    # 类别表
+    if class_names is None:
+        present = np.unique(class_ids)
+        names = sorted(str(c) for c in present.tolist())
+        mapping = np.zeros(int(present.max()) + 1 if len(present) else 0, dtype=np.int64)
+        name_index = {name: i for i, name in enumerate(names)}
+        mapping[present] = [name_index[str(c)] for c in present.tolist()]
+        categories = [{"id": i, "name": name} for i, name in enumerate(names)]
+        class_idx = mapping[class_ids]
+    else:
+        categories = [{"id": i, "name": name, "supercategory": "none"} for i, name in enumerate(class_names)]
+        known = class_ids < len(categories)
+        if not known.all():
+            count("boxes_unknown_class", int((~known).sum()))
+            warn("unknown_class", f"跳过 {int((~known).sum())} 个类别编号超出类别表的标注")
+            image_idx, class_ids, values = image_idx[known], class_ids[known], values[known]
+        class_idx = class_ids
+
+    # 类别筛选/重映射和 drop_empty 只用标签, 去掉的图片不再读取尺寸
+    remap = subset_categories(categories, subset.get("keep_classes"), subset.get("exclude_classes"),
+                              subset.get("class_map"))
+    if remap is not None:
+        categories, mapping = remap
+        class_idx = mapping[class_idx]
+        keep = class_idx >= 0
+        count("boxes_filtered", int((~keep).sum()))
+        image_idx, class_idx, values = image_idx[keep], class_idx[keep], values[keep]
+    if subset.get("drop_empty"):
+        selected = np.unique(image_idx)
+        count("images_filtered", len(rows) - len(selected))
+        new_index = np.full(len(rows), -1, dtype=np.int64)
+        new_index[selected] = np.arange(len(selected), dtype=np.int64)
+        image_idx = new_index[image_idx]
+        rows = [rows[i] for i in selected.tolist()]
+        image_id, labeled = image_id[selected], labeled[selected]
+        present = {split for split, _, _ in rows}
+        split_names = [split for split in split_names if split in present]
+
+    # 图片尺寸: 缓存 > 图片文件头
+    sizes = [size_cache.lookup(img_path) for _, _, img_path in rows]
+    probes = [i for i, size in enumerate(sizes) if size is None]
+    probe = _io_func(_probe_size, io_threads, queue_depth)
+    with timer("probe_sizes"):
+        results = run_tasks(probe, [rows[i][2] for i in probes], workers)
+    if workers == 1:
+        record_stages("probe_sizes", probe)
+    count("images_probed", len(probes))
+    for i, size in zip(probes, results):
+        sizes[i] = size
+        if size is None:
+            count("images_unreadable")
+            warn("unreadable_image", f"无法读取图片: {rows[i][2]}")
+    for (_, _, img_path), size in zip(rows, sizes):
+        size_cache.put(img_path, size)
+    size_cache.save()
+
+    # 无法读取的图片不带标注
+    readable = np.asarray([size is not None for size in sizes], dtype=bool)
+    labeled = labeled & readable
+    keep = readable[image_idx]
+    image_idx, class_idx, values = image_idx[keep], class_idx[keep], values[keep]
+
+    images = {
+        "split": [split for split, _, _ in rows],
+        "file_name": [img_name for _, img_name, _ in rows],
+        "path": [img_path for _, _, img_path in rows],
+        "width": np.asarray([size[0] if size else 0 for size in sizes], dtype=np.int64),
+        "height": np.asarray([size[1] if size else 0 for size in sizes], dtype=np.int64),
+        "image_id": image_id,
+        "labeled": labeled,
+    }
+    dataset = Dataset(categories, split_names, images, image_idx, class_idx, values,
+                      np.full(len(image_idx), np.nan))
+
+    # 归一化的 (中心x, 中心y, 宽, 高) 一次性换算为像素坐标
+    with timer("coordinates"):
+        width, height = dataset.image_sizes()
+        xc, yc, w, h = dataset.boxes.T
+        dataset.wh = np.stack([w * width, h * height], axis=1)
+        dataset.area = dataset.wh[:, 0] * dataset.wh[:, 1]
+        dataset.boxes = np.stack([(xc - w / 2) * width, (yc - h / 2) * height,
+                                  (xc + w / 2) * width, (yc + h / 2) * height], axis=1)
+    _count_read(dataset)
+    # min_area 需要像素坐标, 在读取尺寸之后生效
+    return _select_min_area(dataset, subset)
@@ -0,0 +1,290 @@
+import os
+import argparse
+import numpy as np
+from fileio import IMAGE_MODES, write_text
+from instrument import measure_run
+from packed import read_packed, write_packed
+from readers import read_class_names, read_coco, read_voc, read_yolo
+from writers import write_coco, write_voc, write_yolo
+
+DEFAULT_RATIOS = {"train": 0.8, "val": 0.1, "test": 0.1}
+
+
+def parse_ratios(text):
+    """解析 "train=0.8,val=0.1,test=0.1" 或 "0.8,0.1,0.1" (依次对应 train/val/test)"""
+    ratios = {}
+    for i, item in enumerate(part for part in text.split(",") if part.strip()):
+        if "=" in item:
+            name, value = item.split("=", 1)
+        else:
+            name, value = list(DEFAULT_RATIOS)[i], item
+        ratios[name.strip()] = float(value)
+    return ratios
+
+
+def _split_counts(total, weights):
+    """按权重把 total 分为整数份 (最大余数法), 总和严格等于 total"""
+    weights = np.asarray(weights, dtype=np.float64)
+    if total <= 0 or weights.sum() <= 0:
+        return np.zeros(len(weights), dtype=np.int64)
+    exact = total * weights / weights.sum()
+    counts = np.floor(exact).astype(np.int64)
+    # 余数大的优先, 相同时靠前的划分优先
+    order = np.argsort(-(exact - counts), kind="stable")
+    counts[order[:total - counts.sum()]] += 1
+    return counts
+
+
+def random_split(num_images, ratios, seed=0):
+    """随机划分, 返回每张图片的划分下标 (ratios 的顺序)"""
+    rng = np.random.default_rng(seed)
+    counts = _split_counts(num_images, list(ratios.values()))
+    assign = np.empty(num_images, dtype=np.int64)
+    assign[rng.permutation(num_images)] = np.repeat(np.arange(len(counts)), counts)
+    return assign
+
+
+def _gather(offsets, values, rows):
+    """CSR 结构中取出多行的全部元素, 返回 (元素, 所在行在 rows 中的下标)"""
+    lengths = offsets[rows + 1] - offsets[rows]
+    total = int(lengths.sum())
+    owner = np.repeat(np.arange(len(rows)), lengths)
+    position = np.arange(total) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return values[offsets[rows][owner] + position], owner
+
+
+def stratified_split(num_images, image_idx, class_idx, num_classes, ratios, seed=0):
+    """
+    多标签迭代分层划分, 返回每张图片的划分下标 (ratios 的顺序)
+
+    按类别出现的图片数从少到多依次处理: 每次取剩余图片最少的类别, 把含该类别且尚未分配的
+    图片按各划分对该类别的剩余需求成批分配, 再统一扣减这些图片包含的全部类别的需求;
+    没有标注的图片最后用来补齐各划分的图片数。每批分配不超过各划分剩余的图片数, 各划分的图片数
+    与按比例 (最大余数法) 计算的数量一致。每个类别只处理一次, 全部为数组运算。
+
+    参数:
+        num_images: 图片数
+        image_idx, class_idx: 每个标注框的图片行号和类别下标
+        num_classes: 类别数
+        ratios: {划分名: 比例}
+        seed: 随机种子
+    """
+    rng = np.random.default_rng(seed)
+    weights = np.asarray(list(ratios.values()), dtype=np.float64)
+    weights /= weights.sum()
+    num_splits = len(weights)
+
+    # 每张图片包含的类别 (去重) 的 CSR 结构, 按图片和按类别各一份
+    pairs = np.unique(image_idx * num_classes + class_idx)
+    pair_img = pairs // num_classes
+    pair_cls = pairs % num_classes
+    img_offsets = np.searchsorted(pair_img, np.arange(num_images + 1))
+    by_class = np.argsort(pair_cls, kind="stable")
+    cls_images = pair_img[by_class]
+    cls_offsets = np.searchsorted(pair_cls[by_class], np.arange(num_classes + 1))
+
+    label_counts = np.diff(cls_offsets)
+    desired_images = _split_counts(num_images, weights).astype(np.float64)
+    desired_labels = weights[:, None] * label_counts[None, :]
+    remaining = label_counts.copy()
+    assign = np.full(num_images, -1, dtype=np.int64)
+
+    while True:
+        pending = np.flatnonzero(remaining > 0)
+        if len(pending) == 0:
+            break
+        label = pending[np.argmin(remaining[pending])]
+        candidates = cls_images[cls_offsets[label]:cls_offsets[label + 1]]
+        candidates = candidates[assign[candidates] < 0]
+        candidates = candidates[rng.permutation(len(candidates))]
+
+        # 按各划分对该类别的剩余需求分配, 都已满足时按剩余图片数分配
+        need = np.maximum(desired_labels[:, label], 0)
+        if need.sum() <= 0:
+            need = np.maximum(desired_images, 0)
+        if need.sum() <= 0:
+            need = weights
+        counts = _split_counts(len(candidates), need)
+        # 每个划分不超过其剩余的图片数, 超出的部分按各划分剩余的空位分配
+        capacity = np.maximum(desired_images, 0).astype(np.int64)
+        counts = np.minimum(counts, capacity)
+        overflow = len(candidates) - int(counts.sum())
+        if overflow > 0:
+            counts += _split_counts(overflow, capacity - counts)
+        target = np.repeat(np.arange(num_splits), counts)
+        assign[candidates] = target
+
+        # 扣减这批图片包含的全部类别的需求
+        classes, owner = _gather(img_offsets, pair_cls, candidates)
+        desired_images -= counts
+        desired_labels -= np.bincount(target[owner] * num_classes + classes,
+                                      minlength=num_splits * num_classes).reshape(num_splits, num_classes)
+        remaining -= np.bincount(classes, minlength=num_classes)
+
+    # 没有标注的图片补齐各划分的图片数
+    rest = np.flatnonzero(assign < 0)
+    rest = rest[rng.permutation(len(rest))]
+    need = np.maximum(desired_images, 0)
+    counts = _split_counts(len(rest), need if need.sum() > 0 else weights)
+    assign[rest] = np.repeat(np.arange(num_splits), counts)
+    return assign
+
+
+def split_dataset(dataset, ratios=None, seed=0, stratify=False):
+    """
+    重新划分数据集, 返回每张图片属于新划分的数据集
+
+    同一源图片出现在多个原划分中时只保留第一次; 原 image_id 有重复时在新划分内从 1 重新编号
+
+    参数:
+        ratios: {划分名: 比例}, 比例会被归一化, 默认 train/val/test = 0.8/0.1/0.1
+        seed: 随机种子, 相同的输入和种子得到相同的划分
+        stratify: 按类别分层 (多标签迭代分层), 否则随机划分
+    """
+    ratios = dict(ratios or DEFAULT_RATIOS)
+    first = {}
+    for i, path in enumerate(dataset.path):
+        first.setdefault(path, i)
+    if len(first) < dataset.num_images:
+        dataset = dataset.select_images(list(first.values()))
+
+    if stratify:
+        assign = stratified_split(dataset.num_images, dataset.image_idx, dataset.class_idx,
+                                  len(dataset.categories), ratios, seed)
+    else:
+        assign = random_split(dataset.num_images, ratios, seed)
+
+    names = list(ratios)
+    image_id = dataset.image_id
+    if len(np.unique(image_id)) < len(image_id):
+        image_id = np.empty(dataset.num_images, dtype=np.int64)
+        for s in range(len(names)):
+            rows = assign == s
+            image_id[rows] = np.arange(1, rows.sum() + 1)
+    return dataset.with_images(split_names=names, split=[names[s] for s in assign.tolist()],
+                               image_id=image_id)
+
+
+def split_summary(dataset):
+    """每个划分的图片数、框数, 以及各类别所占比例与整体的最大偏差"""
+    split_index = {name: i for i, name in enumerate(dataset.split_names)}
+    image_split = np.asarray([split_index[name] for name in dataset.split], dtype=np.int64)
+    num_splits = len(dataset.split_names)
+    num_classes = len(dataset.categories)
+    images = np.bincount(image_split, minlength=num_splits)
+    box_split = image_split[dataset.image_idx]
+    hist = np.bincount(box_split * num_classes + dataset.class_idx,
+                       minlength=num_splits * num_classes).reshape(num_splits, num_classes)
+    boxes = hist.sum(axis=1)
+
+    summary = {}
+    total = hist.sum(axis=0)
+    for s, name in enumerate(dataset.split_names):
+        share = hist[s] / np.maximum(boxes[s], 1)
+        overall = total / max(total.sum(), 1)
+        summary[name] = {"images": int(images[s]), "boxes": int(boxes[s]),
+                         "max_class_deviation": float(np.abs(share - overall).max()) if num_classes else 0.0}
+    return summary
+
+
+def write_split_lists(dataset, output_dir, paths=True):
+    """
+    写出划分清单 {output_dir}/{split}.txt, 每行一张图片
+
+    参数:
+        paths: 写入源图片的绝对路径 (YOLO的 train.txt 形式), 为 False 时写入不含扩展名的文件名
+               (VOC的 ImageSets/Main 形式)
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    nbytes = 0
+    for split in dataset.split_names:
+        rows = dataset.split_rows(split)
+        if paths:
+            lines = [os.path.abspath(dataset.path[i]) for i in rows]
+        else:
+            lines = [os.path.splitext(dataset.file_name[i])[0] for i in rows]
+        nbytes += write_text(os.path.join(output_dir, f"{split}.txt"), "".join(f"{line}\n" for line in lines))
+    return nbytes
+
+
+def read_dataset(fmt, root, splits=None, class_names=None, workers=1):
+    """
+    读取任意格式的数据集用于重新划分
+
+    参数:
+        fmt: yolo | voc | coco | packed
+        splits: 要合并的原划分; 默认 YOLO 为 train/val/test (根目录下直接有 images/ 时为未划分),
+                VOC 为全部标注文件, COCO 为 train/val, 打包格式为全部划分
+        class_names: YOLO类别名称, 默认读取根目录下的 classes.txt
+    """
+    if fmt == "yolo":
+        if splits is None:
+            splits = [""] if os.path.isdir(os.path.join(root, "images")) else ["train", "val", "test"]
+        classes_file = os.path.join(root, "classes.txt")
+        if class_names is None and os.path.exists(classes_file):
+            class_names = read_class_names(classes_file)
+        dataset = read_yolo(root, splits, class_names, workers=workers)
+        if class_names is None and all(name.isdigit() for name in dataset.class_names):
+            # 没有类别文件时保持原类别编号不变
+            ids = [int(name) for name in dataset.class_names]
+            categories = [{"id": i, "name": str(i)} for i in range(max(ids, default=-1) + 1)]
+            dataset = dataset.remap_categories(categories, ids)
+        return dataset
+    if fmt == "voc":
+        return read_voc(root, splits, workers=workers)
+    if fmt == "coco":
+        return read_coco(root, splits or ("train", "val"))
+    if fmt == "packed":
+        return read_packed(root, splits)
+    raise ValueError(f"未知的数据集格式: {fmt}, 可选: yolo/voc/coco/packed")
+
+
+def write_dataset(dataset, fmt, output_dir, workers=1, image_mode="hardlink"):
+    """按格式写出划分后的数据集 (VOC/COCO 另外写出 classes.txt), 图片默认以硬链接放置 (跨文件系统时回退到复制)"""
+    if fmt == "yolo":
+        return write_yolo(dataset, output_dir, workers=workers, image_mode=image_mode)
+    if fmt == "voc":
+        stats = write_voc(dataset, output_dir, image_set_eol=True, workers=workers, image_mode=image_mode)
+    elif fmt == "coco":
+        stats = write_coco(dataset, output_dir, round_bbox=False, workers=workers, image_mode=image_mode)
+    elif fmt == "packed":
+        return write_packed(dataset, output_dir, workers=workers, image_mode=image_mode)
+    else:
+        raise ValueError(f"未知的数据集格式: {fmt}, 可选: yolo/voc/coco/packed")
+    # 与各转换函数的输出一样写出 classes.txt (YOLO 由 write_yolo 写出)
+    stats["bytes_written"] += write_text(os.path.join(output_dir, "classes.txt"), "\n".join(dataset.class_names))
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="数据集划分 (train/val/test)")
+    parser.add_argument("input", help="输入数据集根目录")
+    parser.add_argument("output", help="输出目录")
+    parser.add_argument("--format", required=True, choices=["yolo", "voc", "coco", "packed"], help="输入数据集格式")
+    parser.add_argument("--output-format", choices=["yolo", "voc", "coco", "packed"],
+                        help="输出格式, 默认与输入相同")
+    parser.add_argument("--ratios", default="train=0.8,val=0.1,test=0.1", help="划分比例")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    parser.add_argument("--stratify", action="store_true", help="按类别分层划分")
+    parser.add_argument("--splits", nargs="*", help="要合并重新划分的原划分")
+    parser.add_argument("--classes", help="YOLO类别文件, 默认为输入目录下的 classes.txt")
+    parser.add_argument("--lists-only", action="store_true", help="只写出划分清单 {split}.txt, 不放置图片")
+    parser.add_argument("--image-mode", default="hardlink", choices=IMAGE_MODES, help="图片落盘方式")
+    parser.add_argument("--workers", type=int, default=1, help="并行进程数, <=0 为全部CPU核心")
+    parser.add_argument("--verbose", action="store_true", help="显示进度条")
+    parser.add_argument("--report", help="写出JSON统计报告 (各步骤耗时和计数) 的路径")
+    parser.add_argument("--profile", help="性能剖析结果的输出路径 (.prof 为 cProfile, .html 为 pyinstrument)")
+    args = parser.parse_args()
+
+    with measure_run("split", args.report, args.profile, args.verbose):
+        class_names = read_class_names(args.classes) if args.classes else None
+        dataset = read_dataset(args.format, args.input, args.splits, class_names, args.workers)
+        dataset = split_dataset(dataset, parse_ratios(args.ratios), args.seed, args.stratify)
+        output_format = args.output_format or args.format
+        if args.lists_only:
+            write_split_lists(dataset, args.output, paths=output_format != "voc")
+        else:
+            write_dataset(dataset, output_format, args.output, args.workers, args.image_mode)
+    for name, info in split_summary(dataset).items():
+        print(f"{name}: {info['images']} images, {info['boxes']} boxes, "
+              f"max class deviation {info['max_class_deviation']:.4f}")
@@ -0,0 +1,123 @@
+import numpy as np
+from instrument import count, log, timer
+
+# 转换函数中筛选子集的参数, 在读取标注之后、放置/缩放/去重任何图片之前生效
+SUBSET_OPTIONS = ("keep_classes", "exclude_classes", "class_map", "min_area", "drop_empty")
+
+
+def parse_class_map(text):
+    """解析 "cat=animal,dog=animal" 或 "3=0,5=1" 为 {旧类别: 新类别}"""
+    class_map = {}
+    for item in text.split(","):
+        if item.strip():
+            old, new = item.split("=", 1)
+            class_map[old.strip()] = new.strip()
+    return class_map
+
+
+def _is_id(value):
+    return isinstance(value, int) or (isinstance(value, str) and value.lstrip("-").isdigit())
+
+
+def _class_index(categories, key):
+    """类别名称或 category id 对应的类别下标 (先按名称查找, 找不到时按 id), 找不到时抛出 ValueError"""
+    for i, cat in enumerate(categories):
+        if cat["name"] == str(key):
+            return i
+    if _is_id(key):
+        for i, cat in enumerate(categories):
+            if cat["id"] == int(key):
+                return i
+    raise ValueError(f"类别表中没有: {key}, 可选: {', '.join(cat['name'] for cat in categories)}")
+
+
+def subset_categories(categories, keep_classes=None, exclude_classes=None, class_map=None):
+    """
+    筛选和重映射后的类别表, 以及旧类别下标到新类别下标的数组 (-1 为删除); 没有类别条件时返回 None
+
+    只用类别表, 读取函数在读取图片尺寸之前即可据此去掉标注框和图片
+    """
+    if keep_classes is None and not (exclude_classes or class_map):
+        return None
+    keep = np.ones(len(categories), dtype=bool)
+    if keep_classes is not None:
+        keep[:] = False
+        keep[[_class_index(categories, key) for key in keep_classes]] = True
+    for key in exclude_classes or ():
+        keep[_class_index(categories, key)] = False
+    targets = {_class_index(categories, old): new for old, new in (class_map or {}).items()}
+
+    # 映射到同一名称或同一 id 的类别合并为一个 (使用先出现的类别的 id/名称)
+    new_categories = []
+    mapping = np.full(len(categories), -1, dtype=np.int64)
+    renumbered = False
+    for i in np.flatnonzero(keep).tolist():
+        cat = dict(categories[i])
+        if i in targets and _is_id(targets[i]) and _is_id(cat["name"]):
+            # 名称即为类别编号 (没有类别名称的YOLO数据集): 改为新的编号名称
+            cat["name"] = str(int(targets[i]))
+        elif i in targets and _is_id(targets[i]):
+            cat["id"] = int(targets[i])
+            renumbered = True
+        elif i in targets:
+            cat["name"] = targets[i]
+        for j, other in enumerate(new_categories):
+            if other["id"] == cat["id"] or other["name"] == cat["name"]:
+                mapping[i] = j
+                break
+        else:
+            mapping[i] = len(new_categories)
+            new_categories.append(cat)
+
+    if renumbered:
+        # 指定了新 id 时类别表按 id 排列, YOLO 的类别编号即为排序后的下标
+        order = sorted(range(len(new_categories)), key=lambda j: new_categories[j]["id"])
+        position = np.empty(len(order), dtype=np.int64)
+        position[order] = np.arange(len(order), dtype=np.int64)
+        mapping[mapping >= 0] = position[mapping[mapping >= 0]]
+        new_categories = [new_categories[j] for j in order]
+    return new_categories, mapping
+
+
+def make_subset(keep_classes=None, exclude_classes=None, class_map=None, min_area=None, drop_empty=False):
+    """转换函数的筛选参数打包为传给读取函数的 subset (dict), 没有筛选条件时返回 None"""
+    if keep_classes is None and not (exclude_classes or class_map or min_area or drop_empty):
+        return None
+    return {"keep_classes": keep_classes, "exclude_classes": exclude_classes, "class_map": class_map,
+            "min_area": min_area, "drop_empty": drop_empty}
+
+
+def select_subset(dataset, keep_classes=None, exclude_classes=None, class_map=None, min_area=None,
+                  drop_empty=False):
+    """
+    按类别和框大小筛选数据集, 只用内存中的标注表, 不读取图片; 返回新的数据集 (没有筛选条件时原样返回)
+
+    参数:
+        keep_classes: 只保留这些类别 (名称或 category id), 为 None 时保留全部
+        exclude_classes: 去掉这些类别
+        class_map: {旧类别: 新类别}, 新类别为名称时改名, 为整数时改为该 id (类别表按 id 重新排列);
+                   映射到同一名称或 id 的类别合并为一个
+        min_area: 去掉像素面积 (宽 x 高, 转换前的坐标) 小于这个值的框
+        drop_empty: 去掉筛选后没有框的图片, 这些图片不再放置也不写出标注
+    """
+    if keep_classes is None and not (exclude_classes or class_map or min_area or drop_empty):
+        return dataset
+    num_images, num_boxes = dataset.num_images, dataset.num_boxes
+    with timer("coordinates"):
+        remap = subset_categories(dataset.categories, keep_classes, exclude_classes, class_map)
+        if remap is not None:
+            dataset = dataset.remap_categories(*remap)
+        if min_area:
+            wh = dataset.box_wh()
+            keep = wh[:, 0] * wh[:, 1] >= min_area
+            if not keep.all():
+                dataset = dataset.with_boxes(keep=keep)
+        if drop_empty:
+            has_boxes = np.bincount(dataset.image_idx, minlength=dataset.num_images) > 0
+            if not has_boxes.all():
+                dataset = dataset.select_images(has_boxes)
+    count("boxes_filtered", num_boxes - dataset.num_boxes)
+    count("images_filtered", num_images - dataset.num_images)
+    log(f"筛选后保留 {dataset.num_images}/{num_images} 张图片, {dataset.num_boxes}/{num_boxes} 个标注框, "
+        f"{len(dataset.categories)} 个类别")
+    return dataset
@@ -0,0 +1,48 @@
+import os
+import sys
+import pytest
+from PIL import Image
+
+# 模块都在仓库根目录下
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def make_yolo():
+    """
+    返回生成YOLO数据集的函数 make_yolo(root, labels, sizes=None, colors=None)
+
+    参数:
+        labels: {(划分, 图片名): [类别编号, ...]}, 每个框为 "类别 0.5 0.5 0.25 0.25"
+        sizes, colors: {(划分, 图片名): 图片尺寸/颜色}, 默认为 32x32 黑色; 颜色相同的图片内容相同
+    """
+    def make(root, labels, sizes=None, colors=None):
+        for (split, name), classes in labels.items():
+            os.makedirs(root / split / "images", exist_ok=True)
+            os.makedirs(root / split / "labels", exist_ok=True)
+            size = (sizes or {}).get((split, name), (32, 32))
+            Image.new("RGB", size, (colors or {}).get((split, name), "black")).save(
+                root / split / "images" / f"{name}.jpg")
+            (root / split / "labels" / f"{name}.txt").write_text(
+                "".join(f"{c} 0.5 0.5 0.25 0.25\n" for c in classes))
+    return make
+
+
+@pytest.fixture
+def make_voc():
+    """
+    返回生成VOC数据集的函数 make_voc(root, objects)
+
+    参数:
+        objects: {图片名: [类别名, ...]}, 都在 train 划分, 每张图片 32x32; XML中不带 <size>, 需要读取图片文件头
+    """
+    def make(root, objects):
+        for sub in ("JPEGImages", "Annotations", "ImageSets/Main"):
+            os.makedirs(root / sub)
+        for name, classes in objects.items():
+            Image.new("RGB", (32, 32)).save(root / "JPEGImages" / f"{name}.jpg")
+            body = "".join(f"<object><name>{c}</name><bndbox><xmin>4</xmin><ymin>4</ymin><xmax>20</xmax>"
+                           f"<ymax>20</ymax></bndbox></object>" for c in classes)
+            (root / "Annotations" / f"{name}.xml").write_text(f"<annotation>{body}</annotation>")
+        (root / "ImageSets" / "Main" / "train.txt").write_text("\n".join(objects))
+    return make
@@ -0,0 +1,22 @@
+import os
+import tarfile
+from PIL import Image
+from yolo2voc import yolo_to_voc
+
+
+def test_archive_keys_are_unique_and_unlabeled_images_have_no_label(tmp_path):
+    root = tmp_path / "yolo" / "train"
+    os.makedirs(root / "images")
+    os.makedirs(root / "labels")
+    for name in ("a.jpg", "a.png", "a_1.jpg", "b.jpg"):
+        Image.new("RGB", (32, 32)).save(root / "images" / name)
+    for stem in ("a", "a_1"):
+        (root / "labels" / f"{stem}.txt").write_text("0 0.5 0.5 0.25 0.25\n")
+    yolo_to_voc(str(tmp_path / "yolo"), str(tmp_path / "out"), archive=True)
+
+    with tarfile.open(tmp_path / "out" / "train-000000.tar") as tar:
+        names = tar.getnames()
+    keys = [name.split(".")[0] for name in names if not name.endswith(".xml")]
+    assert len(keys) == 4 and len(set(keys)) == 4
+    # b.jpg 没有标签文件: 只写入图片
+    assert sum(name.endswith(".xml") for name in names) == 3
@@ -0,0 +1,39 @@
+import json
+import pytest
+import coco_stream
+from coco_stream import iter_coco, load_coco_index
+
+COCO = {
+    "info": {"description": "测试 \"quoted\" \\ text", "year": 2023},
+    "images": [{"id": 1, "file_name": "a b.jpg", "width": 640, "height": 480},
+               {"id": 12345678, "file_name": "猫é.jpg", "width": 1, "height": 2}],
+    "annotations": [{"id": 7, "image_id": 12345678, "category_id": 3, "bbox": [1.25, -0.5, 1e-3, 123456.75],
+                     "iscrowd": 0, "segmentation": [[1, 2, 3, 4]]}],
+    "licenses": [],
+    "categories": [{"id": 3, "name": "a,b:{c}"}],
+}
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 64, 1 << 20])
+def test_tokens_split_across_chunks(tmp_path, monkeypatch, chunk_size):
+    # 分块大小很小时数字、字符串 (含转义和多字节字符) 和分隔符都会被截断在分块边界上
+    monkeypatch.setattr(coco_stream, "_CHUNK_SIZE", chunk_size)
+    path = tmp_path / "instances.json"
+    path.write_text(json.dumps(COCO, ensure_ascii=False, indent=1), encoding="utf-8")
+
+    items = list(iter_coco(str(path), sections=("info", "images", "annotations", "licenses", "categories")))
+    assert items == [("info", COCO["info"])] + [("images", item) for item in COCO["images"]] + \
+        [("annotations", item) for item in COCO["annotations"]] + [("categories", COCO["categories"][0])]
+
+    categories, images, anns_by_image = load_coco_index(str(path))
+    assert categories == COCO["categories"]
+    assert images == COCO["images"]
+    assert anns_by_image == {12345678: [(7, 3, [1.25, -0.5, 1e-3, 123456.75])]}
+
+
+def test_malformed_json_raises(tmp_path, monkeypatch):
+    monkeypatch.setattr(coco_stream, "_CHUNK_SIZE", 4)
+    path = tmp_path / "instances.json"
+    path.write_text('{"images": [{"id": 1} {"id": 2}]}', encoding="utf-8")
+    with pytest.raises(ValueError):
+        list(iter_coco(str(path)))
@@ -0,0 +1,34 @@
+import os
+import json
+import xml.etree.ElementTree as ET
+from convert import convert, load_jobs
+
+
+def test_yolo_to_voc_uses_classes_file_and_splits(tmp_path, make_yolo):
+    make_yolo(tmp_path / "yolo", {("train", "a"): [1, 0], ("val", "b"): [1]})
+    (tmp_path / "yolo" / "classes.txt").write_text("cat\ndog\n")
+    convert("yolo", "voc", str(tmp_path / "yolo"), str(tmp_path / "voc"), splits=["train"])
+
+    names = [obj.findtext("name") for obj in ET.parse(tmp_path / "voc" / "Annotations" / "a.xml").iter("object")]
+    assert sorted(names) == ["cat", "dog"]
+    assert (tmp_path / "voc" / "classes.txt").read_text() == "cat\ndog\n"
+    assert os.listdir(tmp_path / "voc" / "JPEGImages") == ["a.jpg"]
+
+
+def test_yolo_to_voc_without_classes_file_uses_label_ids(tmp_path, make_yolo):
+    make_yolo(tmp_path / "yolo", {("train", "a"): [3]})
+    convert("yolo", "voc", str(tmp_path / "yolo"), str(tmp_path / "voc"))
+
+    assert ET.parse(tmp_path / "voc" / "Annotations" / "a.xml").find("object/name").text == "3"
+
+
+def test_command_line_options_override_job_file(tmp_path):
+    jobs_file = tmp_path / "jobs.json"
+    jobs_file.write_text(json.dumps({
+        "defaults": {"workers": 4, "image_mode": "hardlink"},
+        "jobs": [{"from": "yolo", "to": "voc", "input": "a", "output": "out/a", "image_mode": "copy"},
+                 {"from": "coco", "to": "yolo", "input": "b", "output": "out/b"}]}))
+    jobs = load_jobs(str(jobs_file), {"image_mode": "none"})
+
+    assert [job["image_mode"] for job in jobs] == ["none", "none"]
+    assert [job["workers"] for job in jobs] == [4, 4]
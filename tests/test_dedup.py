@@ -0,0 +1,39 @@
+import os
+import json
+import dedup
+from yolo2voc import yolo_to_voc
+
+
+def make_colored(make_yolo, root, colors):
+    """colors: {(划分, 图片名): 颜色}, 每张图片一个类别 0 的框"""
+    make_yolo(root, {key: [0] for key in colors}, colors=colors)
+
+
+def test_link_writes_each_content_once(tmp_path, monkeypatch, make_yolo):
+    copied = []
+    copy_hashed = dedup.copy_hashed
+    monkeypatch.setattr(dedup, "copy_hashed", lambda src, dst: copied.append(src) or copy_hashed(src, dst))
+    make_colored(make_yolo, tmp_path / "yolo", {("train", "a"): "red", ("train", "b"): "red",
+                                                ("train", "c"): "blue", ("val", "d"): "red"})
+    out = tmp_path / "voc"
+    stats = yolo_to_voc(str(tmp_path / "yolo"), str(out), dedup="link")
+
+    images = out / "JPEGImages"
+    assert os.path.samefile(images / "a.jpg", images / "b.jpg")
+    assert os.path.samefile(images / "a.jpg", images / "d.jpg")
+    assert stats["duplicates"]["duplicate_images"] == 2
+    assert stats["duplicates"]["bytes_saved"] == 2 * os.path.getsize(images / "a.jpg")
+    # 重复的内容没有先复制再换成链接
+    names = sorted(os.path.basename(src) for src in copied)
+    assert len(names) == 2 and "c.jpg" in names and "d.jpg" not in names
+
+
+def test_merge_counts_only_rows_merged_within_a_split(tmp_path, make_yolo):
+    make_colored(make_yolo, tmp_path / "yolo", {("train", "a"): "red", ("train", "b"): "red", ("val", "c"): "red"})
+    out = tmp_path / "voc"
+    stats = yolo_to_voc(str(tmp_path / "yolo"), str(out), dedup="merge")
+
+    assert stats["duplicates"]["merged_images"] == 1
+    with open(out / "duplicates.json", encoding="utf-8") as f:
+        groups = json.load(f)["merged_groups"]
+    assert [sorted(os.path.basename(path) for path in group) for group in groups] == [["a.jpg", "b.jpg"]]
@@ -0,0 +1,73 @@
+import pytest
+from PIL import Image
+import image_size
+from image_size import get_image_size
+
+SIZE = (37, 21)
+
+
+def _no_pil(*args, **kwargs):
+    raise AssertionError("文件头可以识别时不应打开PIL")
+
+
+@pytest.mark.parametrize("fmt, options", [
+    ("JPEG", {}),
+    ("PNG", {}),
+    ("GIF", {}),
+    ("BMP", {}),
+    ("WEBP", {"lossless": False}),
+    ("WEBP", {"lossless": True}),
+])
+def test_header_probe(tmp_path, monkeypatch, fmt, options):
+    path = tmp_path / f"image.{fmt.lower()}"
+    Image.new("RGB", SIZE).save(path, fmt, **options)
+    monkeypatch.setattr(image_size.Image, "open", _no_pil)
+    assert get_image_size(path) == SIZE
+
+
+def test_jpeg_sof_after_exif(tmp_path, monkeypatch):
+    # SOF 之前有 APP0 (JFIF) 和较大的 APP1 (EXIF) 段, 需要按段长度跳过
+    exif = Image.Exif()
+    exif[0x010E] = "x" * 300
+    path = tmp_path / "exif.jpg"
+    Image.new("RGB", SIZE).save(path, "JPEG", exif=exif)
+    assert path.read_bytes()[20:22] == b"\xff\xe1"
+    monkeypatch.setattr(image_size.Image, "open", _no_pil)
+    assert get_image_size(path) == SIZE
+
+
+def test_webp_extended(tmp_path, monkeypatch):
+    # 带透明通道的有损WebP为扩展格式 (VP8X)
+    path = tmp_path / "alpha.webp"
+    Image.new("RGBA", SIZE).save(path, "WEBP")
+    assert path.read_bytes()[12:16] == b"VP8X"
+    monkeypatch.setattr(image_size.Image, "open", _no_pil)
+    assert get_image_size(path) == SIZE
+
+
+def test_unknown_format_falls_back_to_pil(tmp_path):
+    path = tmp_path / "image.tiff"
+    Image.new("RGB", SIZE).save(path, "TIFF")
+    assert get_image_size(path) == SIZE
+
+
+def test_truncated_jpeg_falls_back_to_pil(tmp_path, monkeypatch):
+    # 文件在 SOF 之前被截断: 文件头中找不到尺寸, 交给PIL (同样无法识别时抛出 OSError)
+    path = tmp_path / "image.jpg"
+    Image.new("RGB", SIZE).save(path, "JPEG")
+    path.write_bytes(path.read_bytes()[:12])
+    opened = []
+    open_image = image_size.Image.open
+    monkeypatch.setattr(image_size.Image, "open", lambda fp: opened.append(fp) or open_image(fp))
+    with pytest.raises(OSError):
+        get_image_size(path)
+    assert opened == [path]
+
+
+def test_truncated_png_after_header(tmp_path, monkeypatch):
+    # 只要文件头完整, 像素数据被截断也能得到尺寸
+    path = tmp_path / "image.png"
+    Image.new("RGB", SIZE).save(path, "PNG")
+    path.write_bytes(path.read_bytes()[:32])
+    monkeypatch.setattr(image_size.Image, "open", _no_pil)
+    assert get_image_size(path) == SIZE
@@ -0,0 +1,46 @@
+import os
+import json
+import filecmp
+from PIL import Image
+from coco2voc import coco_to_voc
+from packed import export_packed
+from yolo2voc import yolo_to_voc
+
+
+def make_coco(root):
+    for split, names in (("train", ["a", "b"]), ("val", ["c"])):
+        os.makedirs(root / "images" / f"{split}2014")
+        images, annotations = [], []
+        for i, name in enumerate(names, 1):
+            Image.new("RGB", (40, 30)).save(root / "images" / f"{split}2014" / f"{name}.jpg")
+            images.append({"id": i, "file_name": f"{name}.jpg", "width": 40, "height": 30})
+            annotations.append({"id": i, "image_id": i, "category_id": i, "bbox": [2, 3, 10, 12],
+                                "area": 120, "iscrowd": 0})
+        os.makedirs(root / "annotations", exist_ok=True)
+        (root / "annotations" / f"instances_{split}2014.json").write_text(json.dumps({
+            "images": images, "annotations": annotations,
+            "categories": [{"id": 1, "name": "cat"}, {"id": 2, "name": "dog"}]}))
+
+
+def assert_same_tree(a, b):
+    files = sorted(os.path.relpath(os.path.join(d, f), a) for d, _, fs in os.walk(a) for f in fs)
+    assert files == sorted(os.path.relpath(os.path.join(d, f), b) for d, _, fs in os.walk(b) for f in fs)
+    _, mismatch, errors = filecmp.cmpfiles(a, b, files, shallow=False)
+    assert mismatch == [] and errors == []
+
+
+def test_yolo_to_voc_packed_export_matches_direct(tmp_path, make_yolo):
+    make_yolo(tmp_path / "yolo", {("train", "a"): [0, 1], ("train", "b"): [1, 1], ("val", "c"): [0, 1]},
+              sizes={("train", "a"): (40, 30), ("train", "b"): (41, 30), ("val", "c"): (40, 30)})
+    yolo_to_voc(str(tmp_path / "yolo"), str(tmp_path / "direct" / "voc"))
+    yolo_to_voc(str(tmp_path / "yolo"), str(tmp_path / "packed"), packed=True)
+    export_packed(str(tmp_path / "packed"), "voc", str(tmp_path / "export" / "voc"))
+    assert_same_tree(tmp_path / "direct" / "voc", tmp_path / "export" / "voc")
+
+
+def test_coco_to_voc_packed_export_matches_direct(tmp_path):
+    make_coco(tmp_path / "coco")
+    coco_to_voc(str(tmp_path / "coco"), str(tmp_path / "direct" / "voc"))
+    coco_to_voc(str(tmp_path / "coco"), str(tmp_path / "packed"), packed=True)
+    export_packed(str(tmp_path / "packed"), "voc", str(tmp_path / "export" / "voc"))
+    assert_same_tree(tmp_path / "direct" / "voc", tmp_path / "export" / "voc")
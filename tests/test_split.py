@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+from split import _split_counts, stratified_split
+
+RATIOS = {"train": 0.6, "val": 0.2, "test": 0.2}
+
+
+def random_labels(num_images, num_classes, seed):
+    """每张图片 0-3 个框, 类别分布不均匀"""
+    rng = np.random.default_rng(seed)
+    image_idx = np.repeat(np.arange(num_images), rng.integers(0, 4, num_images))
+    class_idx = np.minimum(rng.geometric(0.3, len(image_idx)) - 1, num_classes - 1)
+    return image_idx, class_idx
+
+
+def test_split_counts_largest_remainder():
+    assert _split_counts(30, [0.6, 0.2, 0.2]).tolist() == [18, 6, 6]
+    assert _split_counts(10, [1, 1, 1]).tolist() == [4, 3, 3]
+    assert _split_counts(0, [0.5, 0.5]).tolist() == [0, 0]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_stratified_split_matches_ratio_counts(seed):
+    image_idx, class_idx = random_labels(30, 5, seed)
+    assign = stratified_split(30, image_idx, class_idx, 5, RATIOS, seed=seed)
+    assert np.bincount(assign, minlength=3).tolist() == [18, 6, 6]
+
+
+def test_stratified_split_keeps_class_proportions():
+    num_images, num_classes = 3000, 8
+    image_idx, class_idx = random_labels(num_images, num_classes, 0)
+    assign = stratified_split(num_images, image_idx, class_idx, num_classes, RATIOS)
+
+    assert np.bincount(assign).tolist() == _split_counts(num_images, list(RATIOS.values())).tolist()
+    # 每个类别的图片在各划分中的比例接近 ratios
+    pairs = np.unique(image_idx * num_classes + class_idx)
+    hist = np.bincount(assign[pairs // num_classes] * num_classes + pairs % num_classes,
+                       minlength=3 * num_classes).reshape(3, num_classes)
+    share = hist / hist.sum(axis=0)
+    assert np.abs(share - np.asarray(list(RATIOS.values()))[:, None]).max() < 0.02
@@ -0,0 +1,51 @@
+import os
+import xml.etree.ElementTree as ET
+from voc2yolo import voc_to_yolo
+from yolo2voc import yolo_to_voc
+
+
+def test_numeric_class_map_renames_voc_output(tmp_path, make_yolo):
+    make_yolo(tmp_path / "yolo", {("train", "a"): [11, 3], ("train", "b"): [3]})
+    yolo_to_voc(str(tmp_path / "yolo"), str(tmp_path / "voc"), class_map={"11": "5"})
+
+    names = [obj.findtext("name") for obj in ET.parse(tmp_path / "voc" / "Annotations" / "a.xml").iter("object")]
+    assert sorted(names) == ["3", "5"]
+    assert sorted((tmp_path / "voc" / "classes.txt").read_text().split()) == ["3", "5"]
+
+
+def test_yolo_class_filter_probes_only_selected_images(tmp_path, make_yolo):
+    make_yolo(tmp_path / "yolo", {("train", f"img{i}"): [11] if i == 0 else [3] for i in range(10)})
+    stats = yolo_to_voc(str(tmp_path / "yolo"), str(tmp_path / "voc"), keep_classes=["11"], drop_empty=True)
+
+    counters = stats["report"]["counters"]
+    assert counters["images_probed"] == 1
+    assert counters["boxes_filtered"] == 9 and counters["images_filtered"] == 9
+    assert os.listdir(tmp_path / "voc" / "JPEGImages") == ["img0.jpg"]
+
+
+def test_min_area_after_probe_counts_each_filtered_item_once(tmp_path, make_yolo):
+    # img0 的框 8x8 小于 min_area, img1 的框 16x16; img6 无法读取, 不计为筛选掉的图片
+    labels = {("train", f"img{i}"): [11] for i in (0, 1, 6)}
+    labels.update({("train", f"img{i}"): [3] for i in range(2, 6)})
+    labels[("train", "img1")] = [11, 3]
+    make_yolo(tmp_path / "yolo", labels, sizes={("train", "img1"): (64, 64)})
+    (tmp_path / "yolo" / "train" / "images" / "img6.jpg").write_bytes(b"not an image")
+    stats = yolo_to_voc(str(tmp_path / "yolo"), str(tmp_path / "voc"), keep_classes=["11"], min_area=100,
+                        drop_empty=True)
+
+    counters = stats["report"]["counters"]
+    assert counters["images_probed"] == 3 and counters["images_unreadable"] == 1
+    assert counters["boxes_filtered"] == 6
+    assert counters["images_filtered"] == 5
+    assert sorted(os.listdir(tmp_path / "voc" / "Annotations")) == ["img1.xml"]
+
+
+def test_voc_class_filter_probes_only_selected_images(tmp_path, make_voc):
+    make_voc(tmp_path / "voc", {f"img{i}": ["cat"] if i == 0 else ["dog"] for i in range(10)})
+    os.makedirs(tmp_path / "yolo")
+    stats = voc_to_yolo(str(tmp_path / "voc"), str(tmp_path / "yolo"), keep_classes=["cat"], drop_empty=True)
+
+    counters = stats["report"]["counters"]
+    assert counters["images_probed"] == 1
+    assert counters["boxes_filtered"] == 9 and counters["images_filtered"] == 9
+    assert os.listdir(tmp_path / "yolo" / "train" / "labels") == ["img0.txt"]
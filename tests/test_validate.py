@@ -0,0 +1,14 @@
+import os
+from validate import validate
+
+
+def test_missing_voc_images_fail_validation(tmp_path, make_voc):
+    root = tmp_path / "voc"
+    make_voc(root, {f"img{i}": ["cat"] for i in range(4)})
+    assert validate("voc", str(root))["ok"]
+
+    os.remove(root / "JPEGImages" / "img1.jpg")
+    os.remove(root / "JPEGImages" / "img3.jpg")
+    stats = validate("voc", str(root))
+    assert stats["reader"]["images_missing"] == 2
+    assert not stats["ok"]
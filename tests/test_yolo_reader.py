@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+from yolo_reader import _parse_chunk
+
+SEGMENT = b"2 0.1 0.2 0.5 0.2 0.3 0.6"
+
+
+def test_clean_files_parse_in_one_pass():
+    texts = [b"0 0.5 0.5 0.25 0.25\n1 0.1 0.2 0.3 0.4\n", b"", b"\n3 0.5 0.5 1 1"]
+    class_ids, boxes, counts, malformed, skipped = _parse_chunk(texts, ["a", "b", "c"], "skip")
+
+    assert class_ids.tolist() == [0, 1, 3]
+    assert boxes.tolist() == [[0.5, 0.5, 0.25, 0.25], [0.1, 0.2, 0.3, 0.4], [0.5, 0.5, 1, 1]]
+    assert counts.tolist() == [2, 0, 1]
+    assert malformed == [] and skipped == 0
+
+
+def test_malformed_rows_are_skipped_and_reported():
+    texts = [b"0 0.5 0.5 0.25 0.25\n",
+             b"1 0.5 0.5\n1 0.5 0.5 0.1 0.1\n",
+             b"x 0.5 0.5 0.1 0.1\n-1 0.5 0.5 0.1 0.1\n1.5 0.5 0.5 0.1 0.1\n4 0.2 0.2 0.1 0.1\n"]
+    class_ids, boxes, counts, malformed, skipped = _parse_chunk(texts, ["a", "b", "c"], "skip")
+
+    # 格式错误的行不影响同一文件和同一批中其他文件的正确行
+    assert class_ids.tolist() == [0, 1, 4]
+    assert boxes.tolist() == [[0.5, 0.5, 0.25, 0.25], [0.5, 0.5, 0.1, 0.1], [0.2, 0.2, 0.1, 0.1]]
+    assert counts.tolist() == [1, 1, 1]
+    assert malformed == [("b", 1, "1 0.5 0.5"), ("c", 1, "x 0.5 0.5 0.1 0.1"),
+                         ("c", 2, "-1 0.5 0.5 0.1 0.1"), ("c", 3, "1.5 0.5 0.5 0.1 0.1")]
+    assert skipped == 0
+
+
+@pytest.mark.parametrize("long_rows, expected", [
+    ("skip", []),
+    ("bbox", [[0.1, 0.2, 0.5, 0.2]]),
+    ("polygon", [[0.3, 0.4, 0.4, 0.4]]),
+])
+def test_long_rows(long_rows, expected):
+    texts = [b"0 0.5 0.5 0.25 0.25\n", SEGMENT + b"\n"]
+    class_ids, boxes, counts, malformed, skipped = _parse_chunk(texts, ["a", "b"], long_rows)
+
+    assert class_ids.tolist() == [0] + [2] * len(expected)
+    np.testing.assert_allclose(boxes[1:], np.asarray(expected).reshape(-1, 4))
+    assert counts.tolist() == [1, len(expected)]
+    assert malformed == []
+    assert skipped == (1 if long_rows == "skip" else 0)
+
+
+def test_polygon_with_odd_coordinate_count_is_malformed():
+    class_ids, _, counts, malformed, _ = _parse_chunk([SEGMENT + b" 0.7\n"], ["a"], "polygon")
+    assert class_ids.tolist() == [] and counts.tolist() == [0]
+    assert malformed == [("a", 1, SEGMENT.decode() + " 0.7")]
@@ -0,0 +1,188 @@
+import io
+import os
+import numpy as np
+from fileio import materialize_image
+from instrument import count, timer, warn
+from parallel import DEFAULT_IO_THREADS, DEFAULT_QUEUE_DEPTH, iter_tasks
+from pipeline import Pipeline
+
+# 输出格式: 名称 -> (PIL格式名, 扩展名); 为 None 时保持源图片的格式
+IMAGE_FORMATS = {"jpeg": ("JPEG", ".jpg"), "webp": ("WEBP", ".webp")}
+_SOURCE_FORMATS = {".jpg": "JPEG", ".jpeg": "JPEG", ".webp": "WEBP", ".png": "PNG", ".bmp": "BMP"}
+DEFAULT_QUALITY = 90
+# letterbox 填充色 (与 YOLOv5/v8 的默认值相同)
+LETTERBOX_FILL = 114
+
+
+def encode_image(src, plan, fmt=None, quality=None):
+    """
+    按 plan (缩放后宽, 高, 画布宽, 高, 左边距, 上边距) 缩放/填充源图片并编码为 fmt (PIL格式名, None 为源格式)
+
+    返回:
+        (编码后的字节内容, 源图片实际的 (宽, 高))
+    """
+    from PIL import Image
+
+    new_w, new_h, canvas_w, canvas_h, pad_x, pad_y = plan
+    with Image.open(src) as img:
+        size = img.size
+        if img.format == "JPEG" and (new_w < size[0] or new_h < size[1]):
+            # 在DCT域中按 1/2, 1/4, 1/8 缩小解码, 只解码到不小于目标的尺寸
+            img.draft(img.mode, (new_w, new_h))
+        fmt = fmt or img.format
+        if img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+        if img.size != (new_w, new_h):
+            img = img.resize((new_w, new_h), Image.BILINEAR)
+        if (canvas_w, canvas_h) != (new_w, new_h):
+            canvas = Image.new(img.mode, (canvas_w, canvas_h), (LETTERBOX_FILL,) * len(img.getbands()))
+            canvas.paste(img, (pad_x, pad_y))
+            img = canvas
+        options = {"quality": quality or DEFAULT_QUALITY} if fmt in ("JPEG", "WEBP") else {}
+        buf = io.BytesIO()
+        img.save(buf, fmt, **options)
+    return buf.getvalue(), size
+
+
+def transform_image(task):
+    """
+    缩放/填充/重新编码一张图片 (在子进程或I/O线程中执行)
+
+    任务为 (源路径, 目标路径, plan, PIL格式名, quality, image_mode); plan 为 None 时按 image_mode 原样放置
+
+    返回:
+        (写入的字节数, 源图片实际的 (宽, 高); 原样放置时为 None)
+    """
+    src, dst, plan, fmt, quality, image_mode = task
+    if plan is None:
+        return materialize_image(src, dst, image_mode), None
+    data, size = encode_image(src, plan, fmt, quality)
+    # 先写临时文件再替换: 目标可能是指向源图片的旧硬链接
+    tmp_file = f"{dst}.tmp"
+    with open(tmp_file, "wb") as f:
+        f.write(data)
+    os.replace(tmp_file, dst)
+    return len(data), size
+
+
+class ImageTransform:
+    """
+    转换时缩放和重新编码图片, 标注框和图片宽高在同一遍中按相同比例换算
+
+    参数:
+        resize: 长边缩放到不超过这个像素数 (不放大), 为 None 时不缩放
+        letterbox: 等比缩放后居中填充为 resize x resize 的正方形, 标注框加上填充的边距
+        image_format: 输出格式 jpeg | webp, 为 None 时保持源格式 (文件扩展名随之改变)
+        quality: JPEG/WebP 的编码质量, 为 None 时不需要缩放的图片原样放置, 需要时使用 DEFAULT_QUALITY
+    """
+
+    def __init__(self, resize=None, letterbox=False, image_format=None, quality=None):
+        if letterbox and not resize:
+            raise ValueError("letterbox 需要同时指定 resize")
+        if image_format is not None and image_format not in IMAGE_FORMATS:
+            raise ValueError(f"未知的image_format: {image_format}, 可选: {', '.join(IMAGE_FORMATS)}")
+        self.resize = resize
+        self.letterbox = letterbox
+        self.image_format = image_format
+        self.quality = quality
+        self.plans = {}  # 源图片路径 -> (plan, PIL格式名, 标注中的源图片宽高)
+
+    def apply(self, dataset):
+        """
+        计算每张图片的缩放方案并换算标注框, 返回新的数据集 (宽高、文件名随之改变)
+
+        宽高未知 (无法读取) 的图片原样放置
+        """
+        with timer("coordinates"):
+            width = dataset.width.astype(np.float64)
+            height = dataset.height.astype(np.float64)
+            sized = (width > 0) & (height > 0)
+            scale = np.ones(dataset.num_images)
+            if self.resize:
+                long_side = np.maximum(width, height)
+                scale[sized] = np.minimum(1.0, self.resize / long_side[sized])
+            new_w = np.where(sized, np.maximum(np.rint(width * scale), 1), width).astype(np.int64)
+            new_h = np.where(sized, np.maximum(np.rint(height * scale), 1), height).astype(np.int64)
+            canvas_w, canvas_h = new_w.copy(), new_h.copy()
+            if self.letterbox:
+                canvas_w[sized] = canvas_h[sized] = self.resize
+            pad_x, pad_y = (canvas_w - new_w) // 2, (canvas_h - new_h) // 2
+
+            # 按实际缩放后的像素尺寸分别计算两个方向的比例
+            sx = np.where(sized, new_w / np.where(sized, width, 1), 1.0)
+            sy = np.where(sized, new_h / np.where(sized, height, 1), 1.0)
+            box_sx, box_sy = sx[dataset.image_idx], sy[dataset.image_idx]
+            box_px, box_py = pad_x[dataset.image_idx], pad_y[dataset.image_idx]
+            boxes = dataset.boxes * np.stack([box_sx, box_sy, box_sx, box_sy], axis=1)
+            boxes += np.stack([box_px, box_py, box_px, box_py], axis=1)
+
+            changed = sized & ((new_w != width) | (new_h != height) | (canvas_w != new_w) | (canvas_h != new_h))
+            file_names = list(dataset.file_name)
+            target_fmt, ext = IMAGE_FORMATS.get(self.image_format, (None, None))
+            for i, path in enumerate(dataset.path):
+                stem, src_ext = os.path.splitext(dataset.file_name[i])
+                src_fmt = _SOURCE_FORMATS.get(src_ext.lower())
+                encode = bool(changed[i]) or (self.quality is not None and src_fmt in ("JPEG", "WEBP"))
+                if target_fmt is not None and target_fmt != src_fmt:
+                    encode = True
+                    file_names[i] = stem + ext
+                if not sized[i]:
+                    encode, file_names[i] = False, dataset.file_name[i]
+                plan = None
+                if encode:
+                    plan = (int(new_w[i]), int(new_h[i]), int(canvas_w[i]), int(canvas_h[i]),
+                            int(pad_x[i]), int(pad_y[i]))
+                self.plans[path] = (plan, target_fmt, (int(width[i]), int(height[i])))
+
+            transformed = dataset.with_images(width=canvas_w, height=canvas_h, file_name=file_names)
+            transformed = transformed.with_boxes(boxes)
+            if dataset.wh is not None:
+                transformed.wh = dataset.wh * np.stack([box_sx, box_sy], axis=1)
+            transformed.area = dataset.area * box_sx * box_sy
+        count("images_resized", int(changed.sum()))
+        return transformed
+
+    def place(self, tasks, workers=1, io_threads=DEFAULT_IO_THREADS, queue_depth=DEFAULT_QUEUE_DEPTH, desc=None):
+        """
+        放置图片 (任务为 (源路径, 目标路径, image_mode)): 需要缩放或改变格式的图片解码后重新编码,
+        其余按 image_mode 放置; workers 个进程并行, 每个进程中 io_threads 个线程 (PIL解码/编码时释放GIL)
+
+        返回:
+            每个任务写入的字节数
+        """
+        jobs = []
+        for src, dst, mode in tasks:
+            plan, fmt, _ = self.plans.get(src, (None, None, None))
+            jobs.append((src, dst, plan, fmt, self.quality, mode))
+        func = Pipeline([("transform", transform_image, max(io_threads, 1))], queue_depth,
+                        threaded=io_threads > 0)
+        written = []
+        with timer("transform"):
+            for (src, _, plan, _, _, _), (nbytes, size) in zip(jobs, iter_tasks(func, jobs, workers, desc)):
+                written.append(nbytes)
+                if plan is not None:
+                    self.check_size(src, size)
+        return written
+
+    def check_size(self, src, size):
+        """重新编码后调用: 统计图片数, 源图片实际尺寸与标注中的尺寸不同时给出警告"""
+        count("images_encoded")
+        expected = self.plans[src][2]
+        if tuple(size) != expected:
+            count("transform_size_mismatch")
+            warn("transform_size_mismatch",
+                 f"图片实际尺寸 {tuple(size)} 与标注中的尺寸 {expected} 不同, 标注框可能错位: {src}")
+
+
+def start_transform(resize=None, letterbox=False, image_format=None, quality=None, image_mode="copy",
+                    incremental=False, dedup=None):
+    """转换函数开始时调用, 返回 ImageTransform (没有要求缩放或重新编码时返回 None)"""
+    if not (resize or letterbox or image_format or quality is not None):
+        return None
+    if image_mode == "none":
+        raise ValueError("缩放或重新编码图片时需要写出图片, image_mode 不能为 none")
+    if incremental:
+        raise ValueError("缩放或重新编码图片时不支持 incremental")
+    if dedup is not None:
+        raise ValueError("缩放或重新编码图片时不支持 dedup")
+    return ImageTransform(resize, letterbox, image_format, quality)
@@ -0,0 +1,231 @@
+import os
+import sys
+import json
+import argparse
+import numpy as np
+from instrument import measure_run, timer
+from parallel import DEFAULT_IO_THREADS, DEFAULT_QUEUE_DEPTH
+
+# 直方图分箱的左边界, 最后一箱为 [最后一个边界, +inf)
+#   size: 框的边长 sqrt(宽*高) (像素), 32/96 为COCO的小/中/大目标分界
+#   aspect: 宽高比 宽/高, 按2的幂对称分箱
+SIZE_EDGES = [0, 8, 16, 32, 64, 96, 128, 256, 512, 1024]
+ASPECT_EDGES = [0, 1 / 16, 1 / 8, 1 / 4, 1 / 2, 1, 2, 4, 8, 16]
+
+# 每类问题在报告中列出的样例数
+MAX_EXAMPLES = 10
+
+# 读取时已丢弃或跳过、数据集中看不到的问题 (读取函数的计数器)
+_READER_COUNTERS = ("malformed_lines", "long_rows_skipped", "boxes_unknown_class",
+                    "images_missing", "images_unreadable")
+# 其中表示数据丢失的计数, 计入 "ok" 判断 (多于5列的行按 long_rows 的设置跳过, 不算问题)
+_READER_PROBLEMS = ("malformed_lines", "boxes_unknown_class", "images_missing", "images_unreadable")
+
+# 计入 "ok" 判断的问题; 未标注和空标注的图片可能是有意的负样本, 只统计不报错
+_ERRORS = ("non_finite", "zero_area", "out_of_bounds", "duplicate_boxes", "unknown_class",
+           "duplicate_images", "unsized_images")
+
+
+def _histogram(values, edges):
+    """按左边界 edges 分箱计数, values 须不小于 edges[0]"""
+    bins = np.searchsorted(np.asarray(edges, dtype=np.float64), values, side="right") - 1
+    return {"edges": [float(edge) for edge in edges],
+            "counts": np.bincount(bins, minlength=len(edges)).tolist()}
+
+
+def _box_examples(dataset, mask, limit):
+    rows = np.flatnonzero(mask)[:limit].tolist()
+    names = dataset.class_names
+    examples = []
+    for j in rows:
+        i = int(dataset.image_idx[j])
+        c = int(dataset.class_idx[j])
+        examples.append({"split": dataset.split[i], "file_name": dataset.file_name[i],
+                         "class": names[c] if 0 <= c < len(names) else c,
+                         "box": dataset.boxes[j].tolist(),
+                         "image_size": [int(dataset.width[i]), int(dataset.height[i])]})
+    return examples
+
+
+def _image_examples(dataset, mask, limit):
+    return [{"split": dataset.split[i], "file_name": dataset.file_name[i]}
+            for i in np.flatnonzero(mask)[:limit].tolist()]
+
+
+def dataset_stats(dataset, tolerance=0.01, max_examples=MAX_EXAMPLES):
+    """
+    对数据集做一次向量化统计和检查, 不读取图片
+
+    检查项 (每个框):
+        non_finite: 坐标含 NaN/inf
+        zero_area: 宽或高不为正 (含 x2<x1 的反向框)
+        out_of_bounds: 超出图片范围 (超过 tolerance 像素), 其中 outside 为完全在图片外
+        duplicate_boxes: 同一图片中类别和坐标完全相同的框 (第一个以外的)
+        unknown_class: 类别下标超出类别表
+    检查项 (每张图片):
+        unlabeled: 没有标注文件; empty: 有标注文件但没有框
+        duplicate_images: 同一划分中重复出现的文件名; unsized_images: 宽高未知
+
+    返回:
+        可直接写为JSON的统计结果 (计数、各类问题的样例、每个类别的统计和框尺寸/宽高比直方图)
+    """
+    with timer("stats"):
+        num_classes = len(dataset.categories)
+        width, height = dataset.image_sizes()
+        x1, y1, x2, y2 = dataset.boxes.T
+        w, h = dataset.box_wh().T
+        finite = np.isfinite(dataset.boxes).all(axis=1) & np.isfinite(w) & np.isfinite(h)
+        zero_area = finite & ((w <= 0) | (h <= 0))
+        sized = (width > 0) & (height > 0)
+        out_of_bounds = finite & sized & ((x1 < -tolerance) | (y1 < -tolerance) |
+                                          (x2 > width + tolerance) | (y2 > height + tolerance))
+        outside = out_of_bounds & ((x2 <= 0) | (y2 <= 0) | (x1 >= width) | (y1 >= height))
+        unknown_class = (dataset.class_idx < 0) | (dataset.class_idx >= num_classes)
+
+        # 重复框: 按 (图片, 类别, 坐标) 排序后与前一个比较
+        duplicate = np.zeros(dataset.num_boxes, dtype=bool)
+        if dataset.num_boxes > 1:
+            order = np.lexsort((y2, x2, y1, x1, dataset.class_idx, dataset.image_idx))
+            key = np.column_stack([dataset.image_idx, dataset.class_idx, dataset.boxes])[order]
+            duplicate[order[1:]] = (key[1:] == key[:-1]).all(axis=1)
+
+        boxes_per_image = np.diff(dataset.box_offsets())
+        unlabeled = ~dataset.labeled
+        empty = dataset.labeled & (boxes_per_image == 0)
+        image_keys = list(zip(dataset.split, dataset.file_name))
+        first_row = {}
+        for i, image_key in enumerate(image_keys):
+            first_row.setdefault(image_key, i)
+        duplicate_images = np.ones(dataset.num_images, dtype=bool)
+        duplicate_images[list(first_row.values())] = False
+        unsized = ~(dataset.width > 0) | ~(dataset.height > 0)
+
+        box_checks = {"non_finite": ~finite, "zero_area": zero_area, "out_of_bounds": out_of_bounds,
+                      "outside": outside, "duplicate_boxes": duplicate, "unknown_class": unknown_class}
+        image_checks = {"unlabeled": unlabeled, "empty": empty, "duplicate_images": duplicate_images,
+                        "unsized_images": unsized}
+        counts = {name: int(mask.sum()) for name, mask in {**box_checks, **image_checks}.items()}
+
+        # 每个类别: 框数、含该类别的图片数、问题框数
+        known = ~unknown_class
+        class_idx = dataset.class_idx[known]
+        pairs = np.unique(dataset.image_idx[known] * max(num_classes, 1) + class_idx)
+        per_class = {
+            "boxes": np.bincount(class_idx, minlength=num_classes),
+            "images": np.bincount(pairs % max(num_classes, 1), minlength=num_classes),
+            "zero_area": np.bincount(class_idx, weights=zero_area[known], minlength=num_classes),
+            "out_of_bounds": np.bincount(class_idx, weights=out_of_bounds[known], minlength=num_classes),
+        }
+        classes = [dict({"id": cat.get("id"), "name": cat["name"]},
+                        **{key: int(column[c]) for key, column in per_class.items()})
+                   for c, cat in enumerate(dataset.categories)]
+
+        # 直方图只统计有效框
+        valid = finite & ~zero_area
+        splits = {}
+        split_of_image = np.asarray([dataset.split_names.index(split) for split in dataset.split], dtype=np.int64)
+        images_per_split = np.bincount(split_of_image, minlength=len(dataset.split_names))
+        boxes_per_split = np.bincount(split_of_image[dataset.image_idx], minlength=len(dataset.split_names))
+        for s, split in enumerate(dataset.split_names):
+            splits[split] = {"images": int(images_per_split[s]), "boxes": int(boxes_per_split[s])}
+        image_size = None
+        if (~unsized).any():
+            widths, heights = dataset.width[~unsized], dataset.height[~unsized]
+            image_size = {"width": [int(widths.min()), int(widths.max())],
+                          "height": [int(heights.min()), int(heights.max())]}
+
+        stats = {
+            "images": dataset.num_images,
+            "boxes": dataset.num_boxes,
+            "classes": num_classes,
+            "splits": splits,
+            "checks": counts,
+            "ok": not any(counts[name] for name in _ERRORS),
+            "boxes_per_image": {"max": int(boxes_per_image.max()) if dataset.num_images else 0,
+                                "mean": round(float(boxes_per_image.mean()), 4) if dataset.num_images else 0.0},
+            "image_size": image_size,
+            "size_histogram": _histogram(np.sqrt(w[valid] * h[valid]), SIZE_EDGES),
+            "aspect_histogram": _histogram(w[valid] / h[valid], ASPECT_EDGES),
+            "per_class": classes,
+            "examples": {name: _box_examples(dataset, mask, max_examples)
+                         for name, mask in box_checks.items() if counts[name]},
+        }
+        stats["examples"].update({name: _image_examples(dataset, mask, max_examples)
+                                  for name, mask in image_checks.items() if counts[name]})
+    return stats
+
+
+def validate(fmt, root, splits=None, class_names=None, workers=1, size_cache=None, long_rows="skip",
+             io_threads=DEFAULT_IO_THREADS, queue_depth=DEFAULT_QUEUE_DEPTH, tolerance=0.01,
+             verbose=False, report=None, profile=None):
+    """
+    校验数据集并统计: 读取标注 (和图片文件头), 不复制或解码图片
+
+    参数:
+        fmt: coco | voc | yolo; root 为打包格式时自动识别
+        splits: 要检查的划分, 默认为各格式的默认划分 (VOC为 None 时检查全部标注文件)
+        class_names: YOLO的类别名称列表或类别文件路径, 默认读取 root/classes.txt (不存在时按标签中的编号)
+        size_cache: 图片尺寸缓存文件, 重复检查时无需再读取图片文件头
+        long_rows: YOLO多于5列的标签行的处理方式 (见 read_yolo)
+        tolerance: 判断越界时允许的误差 (像素)
+        report: 统计结果的JSON输出路径
+
+    返回:
+        dataset_stats 的结果, 另含 "reader": 读取时丢弃或跳过的计数, "run": 运行统计
+    """
+    from readers import read_class_names, read_coco, read_voc, read_yolo
+
+    with measure_run("validate", None, profile, verbose) as metrics:
+        if fmt == "coco":
+            dataset = read_coco(root, splits or ("train", "val"), workers=workers)
+        elif fmt == "voc":
+            dataset = read_voc(root, splits, workers=workers, size_cache=size_cache,
+                               io_threads=io_threads, queue_depth=queue_depth)
+        elif fmt == "yolo":
+            if class_names is None and os.path.exists(os.path.join(root, "classes.txt")):
+                class_names = os.path.join(root, "classes.txt")
+            if isinstance(class_names, str):
+                class_names = read_class_names(class_names)
+            dataset = read_yolo(root, splits or ("train", "val", "test"), class_names, workers=workers,
+                                size_cache=size_cache, long_rows=long_rows, io_threads=io_threads,
+                                queue_depth=queue_depth)
+        else:
+            raise ValueError(f"未知的数据集格式: {fmt}, 可选: coco/voc/yolo")
+        stats = dataset_stats(dataset, tolerance)
+    stats["reader"] = {name: metrics.counters.get(name, 0) for name in _READER_COUNTERS}
+    stats["ok"] = stats["ok"] and not any(stats["reader"][name] for name in _READER_PROBLEMS)
+    stats["run"] = metrics.report()
+    if report is not None:
+        with open(report, "w", encoding="utf-8") as f:
+            json.dump(stats, f, ensure_ascii=False, indent=2)
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="校验数据集并统计类别、框尺寸和各类问题 (不复制图片)")
+    parser.add_argument("format", choices=["coco", "voc", "yolo"], help="数据集格式")
+    parser.add_argument("root", help="数据集根目录")
+    parser.add_argument("--splits", nargs="*", help="要检查的划分")
+    parser.add_argument("--classes", help="YOLO的类别文件, 默认为根目录下的 classes.txt")
+    parser.add_argument("--workers", type=int, default=1, help="并行进程数, <=0 为全部CPU核心")
+    parser.add_argument("--io-threads", type=int, default=DEFAULT_IO_THREADS, help="I/O线程数, 0 为逐个串行读取")
+    parser.add_argument("--size-cache", help="图片尺寸缓存文件")
+    parser.add_argument("--long-rows", default="skip", choices=["skip", "bbox", "polygon"],
+                        help="YOLO多于5列的标签行的处理方式")
+    parser.add_argument("--tolerance", type=float, default=0.01,
+                        help="判断越界时允许的误差 (像素, 容许标签文本的舍入误差)")
+    parser.add_argument("--report", help="统计结果的JSON输出路径")
+    parser.add_argument("--strict", action="store_true", help="发现问题时以状态码 1 退出")
+    parser.add_argument("--verbose", action="store_true", help="显示进度条和信息输出")
+    args = parser.parse_args()
+
+    stats = validate(args.format, args.root, args.splits, args.classes, workers=args.workers,
+                     size_cache=args.size_cache, long_rows=args.long_rows, io_threads=args.io_threads,
+                     tolerance=args.tolerance, verbose=args.verbose, report=args.report)
+    print(f"{stats['images']} 张图片, {stats['boxes']} 个标注框, {stats['classes']} 个类别, "
+          f"{stats['run']['total_s']:.1f}s")
+    for name, n in {**stats["checks"], **stats["reader"]}.items():
+        if n:
+            print(f"  {name}: {n}")
+    print("检查通过" if stats["ok"] else "发现问题, 详见报告中的 examples")
+    sys.exit(1 if args.strict and not stats["ok"] else 0)
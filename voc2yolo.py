@@ -1,62 +1,35 @@
-import os
-import xml.etree.ElementTree as ET
-from tqdm import tqdm
-import shutil
+from archive import DEFAULT_SHARD_BYTES
+from instrument import measure_run
+from readers import read_voc
+from parallel import DEFAULT_IO_THREADS, DEFAULT_QUEUE_DEPTH
+from subset import make_subset
+from writers import write_converted, write_yolo
 
-def voc_to_yolo(voc_root, yolo_output):
-    # 自动获取类别列表
-    class_set = set()
-    for xml_file in os.listdir(os.path.join(voc_root, "Annotations")):
-        tree = ET.parse(os.path.join(voc_root, "Annotations", xml_file))
-        for obj in tree.findall("object"):
-            class_set.add(obj.find("name").text)
-    class_list = sorted(list(class_set))
-    with open(os.path.join(yolo_output, "classes.txt"), 'w') as f:
-        f.write("\n".join(class_list))
-    
-    # 创建YOLO目录结构
-    splits = ["train", "val", "test"]
-    for split in splits:
-        os.makedirs(os.path.join(yolo_output, split, "images"), exist_ok=True)
-        os.makedirs(os.path.join(yolo_output, split, "labels"), exist_ok=True)
-    
-    # 处理每个split
-    for split in splits:
-        with open(os.path.join(voc_root, "ImageSets/Main", f"{split}.txt")) as f:
-            img_names = [line.strip() for line in f.readlines()]
-        
-        for img_name in tqdm(img_names, desc=f"Processing {split}"):
-            # 复制图片
-            src_img = os.path.join(voc_root, "JPEGImages", f"{img_name}.jpg")
-            dst_img = os.path.join(yolo_output, split, "images", f"{img_name}.jpg")
-            shutil.copy(src_img, dst_img)
-            
-            # 转换标签
-            xml_path = os.path.join(voc_root, "Annotations", f"{img_name}.xml")
-            tree = ET.parse(xml_path)
-            root = tree.getroot()
-            w = int(root.find("size/width").text)
-            h = int(root.find("size/height").text)
-            
-            txt_path = os.path.join(yolo_output, split, "labels", f"{img_name}.txt")
-            with open(txt_path, 'w') as f:
-                for obj in root.findall("object"):
-                    cls = obj.find("name").text
-                    class_id = class_list.index(cls)
-                    bbox = obj.find("bndbox")
-                    xmin = float(bbox.find("xmin").text)
-                    ymin = float(bbox.find("ymin").text)
-                    xmax = float(bbox.find("xmax").text)
-                    ymax = float(bbox.find("ymax").text)
-                    
-                    x_center = (xmin + xmax) / 2 / w
-                    y_center = (ymin + ymax) / 2 / h
-                    bw = (xmax - xmin) / w
-                    bh = (ymax - ymin) / h
-                    f.write(f"{class_id} {x_center:.6f} {y_center:.6f} {bw:.6f} {bh:.6f}\n")
+
+def voc_to_yolo(voc_root, yolo_output, workers=1, image_mode="copy", xml_cache=None, incremental=False,
+                io_threads=DEFAULT_IO_THREADS, queue_depth=DEFAULT_QUEUE_DEPTH, packed=False,
+                dedup=None, hash_index=None, resize=None, letterbox=False,
+                image_format=None, quality=None, archive=False, shard_bytes=DEFAULT_SHARD_BYTES,
+                keep_classes=None, exclude_classes=None, class_map=None, min_area=None, drop_empty=False,
+                verbose=False, report=None, profile=None):
+    with measure_run("voc_to_yolo", report, profile, verbose) as metrics:
+        # 筛选子集 (见 subset.py): 类别条件和 drop_empty 在读取图片尺寸之前按标注生效, 之后只处理选中的图片
+        subset = make_subset(keep_classes, exclude_classes, class_map, min_area, drop_empty)
+        # 每个XML只解析一次, 类别为全部标注中出现的名称排序后的列表
+        dataset = read_voc(voc_root, splits=("train", "val", "test"), workers=workers, xml_cache=xml_cache,
+                           io_threads=io_threads, queue_depth=queue_depth, subset=subset)
+
+        stats = write_converted(
+            dataset, yolo_output, write_yolo, "yolo", workers=workers, image_mode=image_mode,
+            incremental=incremental, io_threads=io_threads, queue_depth=queue_depth, dedup=dedup,
+            hash_index=hash_index, resize=resize, letterbox=letterbox, image_format=image_format,
+            quality=quality, packed=packed, archive=archive, shard_bytes=shard_bytes)
+    stats["report"] = metrics.report()
+    return stats
 
 if __name__ == "__main__":
     voc_to_yolo(
         voc_root="./datasets/VOC2007",
-        yolo_output="./voc2yolo"
-    )
\ No newline at end of file
+        yolo_output="./voc2yolo",
+        verbose=True
+    )
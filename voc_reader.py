@@ -0,0 +1,118 @@
+import os
+import pickle
+from collections import namedtuple
+from instrument import count, record_stages, timer
+from parallel import DEFAULT_QUEUE_DEPTH, run_tasks
+from pipeline import Pipeline
+
+try:
+    from lxml import etree as ET
+except ImportError:
+    import xml.etree.ElementTree as ET
+
+# 单张图片的VOC标注: width/height 缺失或无效时为 None,
+# objects 为 [(name, xmin, ymin, xmax, ymax), ...], 坐标为 float
+VocRecord = namedtuple("VocRecord", ["filename", "width", "height", "objects"])
+
+
+def _child_text(elem, tag):
+    child = elem.find(tag)
+    return None if child is None else child.text
+
+
+def _size_value(text):
+    try:
+        value = int(float(text))
+    except (TypeError, ValueError):
+        return None
+    return value if value > 0 else None
+
+
+def read_bytes(path):
+    """读取整个文件 (在I/O线程中执行)"""
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def parse_voc_xml(xml_path):
+    """解析单个VOC标注文件 (有lxml时使用lxml), 返回 VocRecord"""
+    return _parse_voc_root(ET.parse(xml_path).getroot())
+
+
+def parse_voc_bytes(data):
+    """解析已读入内存的VOC标注文件内容, 返回 VocRecord"""
+    return _parse_voc_root(ET.fromstring(data))
+
+
+def _parse_voc_root(root):
+    width = height = None
+    size = root.find("size")
+    if size is not None:
+        width = _size_value(_child_text(size, "width"))
+        height = _size_value(_child_text(size, "height"))
+
+    objects = []
+    for obj in root.findall("object"):
+        bndbox = obj.find("bndbox")
+        objects.append((obj.find("name").text,
+                        float(bndbox.find("xmin").text),
+                        float(bndbox.find("ymin").text),
+                        float(bndbox.find("xmax").text),
+                        float(bndbox.find("ymax").text)))
+    return VocRecord(_child_text(root, "filename"), width, height, objects)
+
+
+def load_voc_annotations(ann_dir, workers=1, cache_file=None, io_threads=0, queue_depth=DEFAULT_QUEUE_DEPTH):
+    """
+    解析 Annotations 目录下的全部XML (每个文件只解析一次), 返回 {文件名(不含扩展名): VocRecord}
+
+    参数:
+        ann_dir: VOC的 Annotations 目录
+        workers: 并行解析的进程数
+        cache_file: 解析结果缓存文件, 以文件mtime和大小判断是否变化;
+                    VOC目录未变化时重复转换无需再解析XML
+        io_threads: 大于0时用线程流水线读取文件 (读取与解析重叠), 适合网络存储
+        queue_depth: 流水线中同时在途的文件数上限
+    """
+    cache = {}
+    if cache_file and os.path.exists(cache_file):
+        with open(cache_file, "rb") as f:
+            cache = pickle.load(f)
+
+    records = {}
+    stamps = {}
+    misses = []
+    with timer("list"):
+        entries = sorted(os.scandir(ann_dir), key=lambda e: e.name)
+    for entry in entries:
+        if not entry.name.endswith(".xml"):
+            continue
+        stem = entry.name[:-4]
+        st = entry.stat()
+        stamp = (st.st_mtime_ns, st.st_size)
+        cached = cache.get(stem)
+        if cached is not None and cached[0] == stamp:
+            records[stem] = cached[1]
+        else:
+            misses.append((stem, entry.path))
+        stamps[stem] = stamp
+
+    parse = Pipeline([("read", read_bytes, max(io_threads, 1)), ("parse", parse_voc_bytes, 1)], queue_depth,
+                     threaded=io_threads > 0)
+    with timer("parse"):
+        parsed = run_tasks(parse, [path for _, path in misses], workers)
+    if workers == 1:
+        record_stages("read_voc_xml", parse)
+    count("xml_parsed", len(misses))
+    count("xml_cached", len(records))
+    for (stem, _), record in zip(misses, parsed):
+        records[stem] = record
+
+    if cache_file and (misses or len(cache) != len(records)):
+        new_cache = {stem: (stamps[stem], record) for stem, record in records.items()}
+        tmp_file = f"{cache_file}.tmp"
+        with open(tmp_file, "wb") as f:
+            pickle.dump(new_cache, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file, cache_file)
+
+    return records
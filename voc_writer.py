@@ -0,0 +1,72 @@
+from xml.sax.saxutils import escape
+
+# 与 minidom 的文本转义规则一致 (& < > 以及双引号)
+_ENTITIES = {'"': "&quot;"}
+
+# yolo2voc 写入的固定 source/owner 信息
+_VOC2007_SOURCE = (
+    ("source", (("database", "The VOC2007 Database"),
+                ("annotation", "PASCAL VOC2007"),
+                ("image", "flickr"),
+                ("flickrid", "325991873"))),
+    ("owner", (("flickrid", "archintent louisville"),
+               ("name", "?"))),
+)
+
+
+def _leaf(pad, tag, text):
+    """单个文本元素, 空文本与 minidom 一样输出为自闭合标签"""
+    text = "" if text is None else str(text)
+    if not text:
+        return f"{pad}<{tag}/>\n"
+    return f"{pad}<{tag}>{escape(text, _ENTITIES)}</{tag}>\n"
+
+
+def render_voc_xml(folder, filename, width, height, objects, indent="  ", with_source=False):
+    """
+    直接拼接VOC标注XML文本, 与 ET.tostring -> minidom.toprettyxml 的输出逐字节一致
+
+    参数:
+        folder, filename: <folder>/<filename> 的内容
+        width, height: 图片尺寸, depth 固定为 3
+        objects: [(name, xmin, ymin, xmax, ymax), ...], 坐标原样写入
+        indent: 每级缩进
+        with_source: 是否写入 VOC2007 的 source/owner/segmented 信息
+    """
+    pad1 = indent
+    pad2 = indent * 2
+    pad3 = indent * 3
+    parts = ['<?xml version="1.0" ?>\n<annotation>\n',
+             _leaf(pad1, "folder", folder),
+             _leaf(pad1, "filename", filename)]
+
+    if with_source:
+        for tag, children in _VOC2007_SOURCE:
+            parts.append(f"{pad1}<{tag}>\n")
+            parts.extend(_leaf(pad2, child, text) for child, text in children)
+            parts.append(f"{pad1}</{tag}>\n")
+
+    parts.append(f"{pad1}<size>\n"
+                 f"{pad2}<width>{width}</width>\n"
+                 f"{pad2}<height>{height}</height>\n"
+                 f"{pad2}<depth>3</depth>\n"
+                 f"{pad1}</size>\n")
+    if with_source:
+        parts.append(f"{pad1}<segmented>0</segmented>\n")
+
+    for name, xmin, ymin, xmax, ymax in objects:
+        parts.append(f"{pad1}<object>\n")
+        parts.append(_leaf(pad2, "name", name))
+        parts.append(f"{pad2}<pose>Unspecified</pose>\n"
+                     f"{pad2}<truncated>0</truncated>\n"
+                     f"{pad2}<difficult>0</difficult>\n"
+                     f"{pad2}<bndbox>\n"
+                     f"{pad3}<xmin>{xmin}</xmin>\n"
+                     f"{pad3}<ymin>{ymin}</ymin>\n"
+                     f"{pad3}<xmax>{xmax}</xmax>\n"
+                     f"{pad3}<ymax>{ymax}</ymax>\n"
+                     f"{pad2}</bndbox>\n"
+                     f"{pad1}</object>\n")
+
+    parts.append("</annotation>\n")
+    return "".join(parts)
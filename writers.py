@@ -0,0 +1,473 @@
+import os
+import numpy as np
+from coco_shards import remove_shards, shard_file_name, write_shard_index, write_shard_meta
+from coco_stream import CocoWriter
+from dedup import finish_dedup, start_dedup
+from fileio import materialize_image, write_text
+from instrument import count, record_stages, timer
+from manifest import ConversionManifest, file_stamp, fingerprint
+from parallel import DEFAULT_IO_THREADS, DEFAULT_QUEUE_DEPTH
+from pipeline import Pipeline
+from transform import start_transform
+from voc_writer import render_voc_xml
+
+
+def _split_by_image(dataset, values):
+    """把按框排列的列表切分为每张图片一段"""
+    offsets = dataset.box_offsets().tolist()
+    return [values[offsets[i]:offsets[i + 1]] for i in range(dataset.num_images)]
+
+
+def render_yolo_label(class_ids, boxes):
+    """YOLO标签文本, boxes 为归一化的 (中心x, 中心y, 宽, 高), 保留6位小数"""
+    return "".join(f"{class_id} {xc:.6f} {yc:.6f} {bw:.6f} {bh:.6f}\n"
+                   for class_id, (xc, yc, bw, bh) in zip(class_ids, boxes))
+
+
+# ---- 各格式每张图片的标注 (按图片切分的列表), 供写出函数和归档输出共用 ----
+
+def voc_objects(dataset):
+    """每张图片的 [(类别名, xmin, ymin, xmax, ymax), ...], 坐标四舍五入为整数"""
+    names = dataset.class_names
+    objects = list(zip([names[c] for c in dataset.class_idx.tolist()],
+                       *np.rint(dataset.boxes).astype(np.int64).T.tolist()))
+    return _split_by_image(dataset, objects)
+
+
+def yolo_labels(dataset):
+    """每张图片的类别编号列表和归一化框列表"""
+    class_ids = _split_by_image(dataset, dataset.class_idx.tolist())
+    boxes = _split_by_image(dataset, dataset.normalized_cxcywh().tolist())
+    return class_ids, boxes
+
+
+def coco_annotations(dataset, round_bbox=True):
+    """每张图片的 [(category_id, [x, y, w, h], area), ...]; 源格式没有给出面积的框用 bbox 计算"""
+    xywh = dataset.xywh()
+    if round_bbox:
+        xywh = np.rint(xywh).astype(np.int64)
+    area = dataset.area.tolist()
+    computed_area = (xywh[:, 2] * xywh[:, 3]).tolist()
+    for j in np.flatnonzero(np.isnan(dataset.area)).tolist():
+        area[j] = computed_area[j]
+    cat_ids = [cat["id"] for cat in dataset.categories]
+    anns = list(zip([cat_ids[c] for c in dataset.class_idx.tolist()], xywh.tolist(), area))
+    return _split_by_image(dataset, anns)
+
+
+def _place_image(task):
+    """只放置图片 (在子进程中执行)"""
+    src_img, dst_img, image_mode = task
+    return materialize_image(src_img, dst_img, image_mode)
+
+
+# ---- 写出流水线的各阶段: 放置图片 (I/O线程) -> 生成标注文本 (CPU) -> 批量写入标注 ----
+
+def _place_stage(task):
+    """放置图片, 任务描述的前两项为源/目标路径, 最后一项为 image_mode"""
+    return task, materialize_image(task[0], task[1], task[-1])
+
+
+def _render_voc_stage(item):
+    """生成VOC XML文本, 无标注文件的图片为 None"""
+    task, nbytes = item
+    _, _, xml_path, folder_name, file_name, width, height, objects, indent, with_source, _ = task
+    text = None
+    if objects is not None:
+        text = render_voc_xml(folder_name, file_name, width, height, objects,
+                              indent=indent, with_source=with_source)
+    return xml_path, text, nbytes
+
+
+def _render_yolo_stage(item):
+    """生成YOLO标签文本"""
+    task, nbytes = item
+    _, _, txt_path, class_ids, boxes, _ = task
+    return txt_path, render_yolo_label(class_ids, boxes), nbytes
+
+
+def _write_stage(items):
+    """批量写入标注文件, 返回每张图片写出的字节数"""
+    return [nbytes + (write_text(path, text) if text is not None else 0) for path, text, nbytes in items]
+
+
+def image_pipeline(render, io_threads, queue_depth):
+    """
+    放置 -> 生成 -> 写入 的流水线 (render 为 None 时只有放置阶段);
+    io_threads 为 0 时不启动线程, 逐张图片依次执行各阶段 (多进程时也是如此)
+    """
+    threads = max(io_threads, 1)
+    if render is None:
+        return Pipeline([("place", _place_image, threads)], queue_depth, threaded=io_threads > 0)
+    return Pipeline([("place", _place_stage, threads), ("render", render, 1),
+                     ("write", _write_stage, 1, 32)], queue_depth, threaded=io_threads > 0)
+
+
+def stage_report(name, pipeline, workers):
+    """流水线在本进程中运行时各阶段的吞吐量 (多进程时为 None)"""
+    if workers != 1:
+        return None
+    record_stages(name, pipeline)
+    return pipeline.report()
+
+
+def _run_split(manifest, func, tasks, keys, fingerprints, outputs, workers, desc, stats):
+    with timer("write"):
+        for nbytes, fresh in manifest.run(func, tasks, keys, fingerprints, outputs, workers, desc=desc):
+            stats["images"] += 1
+            if fresh:
+                stats["bytes_written"] += nbytes
+            else:
+                stats["images_skipped"] += 1
+
+
+def _place_first(placer, tasks, workers, io_threads, queue_depth, desc, stats):
+    """
+    先用 placer (dedup.Deduplicator 或 transform.ImageTransform) 放置各任务的图片,
+    返回把 image_mode 换成 none 的任务 (流水线中只写标注)
+    """
+    written = placer.place([(task[0], task[1], task[-1]) for task in tasks], workers, io_threads,
+                           queue_depth, desc)
+    stats["bytes_written"] += sum(written)
+    return [task[:-1] + ("none",) for task in tasks]
+
+
+def count_written(stats):
+    """写出结束时按统计信息记录写出和未变化 (增量转换时跳过) 的图片数"""
+    count("images_written", stats["images"] - stats["images_skipped"])
+    count("images_unchanged", stats["images_skipped"])
+    count("bytes_written", stats["bytes_written"])
+
+
+def write_voc(dataset, voc_root, indent="  ", with_source=False, image_set_eol=False, workers=1,
+              image_mode="copy", incremental=False, io_threads=DEFAULT_IO_THREADS,
+              queue_depth=DEFAULT_QUEUE_DEPTH, deduplicator=None, transform=None):
+    """
+    写出VOC数据集 (JPEGImages/, Annotations/, ImageSets/Main/{split}.txt)
+
+    坐标四舍五入为整数写入; 没有标注文件 (labeled 为 False) 的图片只放置图片、不写XML
+
+    参数:
+        indent: XML缩进
+        with_source: 写入 VOC2007 的 source/owner/segmented 信息
+        image_set_eol: ImageSets 文件每行都以换行结尾 (否则最后一行没有换行符)
+        workers: 并行进程数 (1为串行, <=0为全部CPU核心)
+        image_mode: 图片落盘方式 (copy/hardlink/symlink/reflink/none)
+        incremental: 根据转换清单只处理新增或变化的图片
+        io_threads: 放置图片的线程数, 图片放置、XML生成和写入在流水线中重叠进行; 0 为逐张串行处理
+        queue_depth: 流水线中同时在途的图片数上限
+        deduplicator: dedup.Deduplicator, 给出时先按内容去重放置图片, 流水线中只写标注
+        transform: transform.ImageTransform, 给出时先缩放/重新编码图片 (数据集须已经过 transform.apply)
+
+    返回:
+        统计信息 {"images", "images_skipped", "bytes_written", "stages"},
+        stages 为流水线各阶段的吞吐量 (未使用线程流水线时为 None)
+    """
+    os.makedirs(f"{voc_root}/JPEGImages", exist_ok=True)
+    os.makedirs(f"{voc_root}/Annotations", exist_ok=True)
+    os.makedirs(f"{voc_root}/ImageSets/Main", exist_ok=True)
+
+    # 获取父文件夹名称
+    folder_name = os.path.basename(os.path.normpath(voc_root))
+    manifest = ConversionManifest(voc_root if incremental else None,
+                                  config=("voc", folder_name, image_mode, indent, with_source))
+    stats = {"images": 0, "images_skipped": 0, "bytes_written": 0}
+    func = image_pipeline(_render_voc_stage, io_threads, queue_depth)
+
+    with timer("coordinates"):
+        objects = voc_objects(dataset)
+        widths = dataset.width.tolist()
+        heights = dataset.height.tolist()
+
+    for split in dataset.split_names:
+        tasks = []
+        keys, fingerprints, outputs = [], [], []
+        image_sets = []
+        for i in dataset.split_rows(split):
+            file_name = dataset.file_name[i]
+            stem = os.path.splitext(file_name)[0]
+            image_sets.append(stem)
+            dst_img = f"{voc_root}/JPEGImages/{file_name}"
+            xml_path = f"{voc_root}/Annotations/{stem}.xml"
+            image_objects = objects[i] if dataset.labeled[i] else None
+            tasks.append((dataset.path[i], dst_img, xml_path, folder_name, file_name,
+                          widths[i], heights[i], image_objects, indent, with_source, image_mode))
+            if manifest.enabled:
+                keys.append(f"{split}/{file_name}")
+                fingerprints.append(fingerprint(file_stamp(dataset.path[i]), widths[i], heights[i],
+                                                image_objects))
+                outputs.append([dst_img, xml_path])
+
+        if (deduplicator or transform) is not None:
+            tasks = _place_first(deduplicator or transform, tasks, workers, io_threads, queue_depth,
+                                 f"Placing {split} images", stats)
+        _run_split(manifest, func, tasks, keys, fingerprints, outputs,
+                   workers, f"Processing {split} set", stats)
+
+        # 保存图像集文件
+        if image_set_eol:
+            text = "".join(f"{stem}\n" for stem in image_sets)
+        else:
+            text = "\n".join(image_sets)
+        stats["bytes_written"] += write_text(f"{voc_root}/ImageSets/Main/{split}.txt", text)
+
+    manifest.finish()
+    stats["stages"] = stage_report("write_voc", func, workers)
+    count_written(stats)
+    return stats
+
+
+def write_yolo(dataset, yolo_root, workers=1, image_mode="copy", incremental=False,
+               io_threads=DEFAULT_IO_THREADS, queue_depth=DEFAULT_QUEUE_DEPTH, deduplicator=None,
+               transform=None):
+    """
+    写出YOLO数据集 ({split}/images/, {split}/labels/, classes.txt)
+
+    标签中的坐标为归一化的 (中心x, 中心y, 宽, 高), 保留6位小数
+
+    参数:
+        workers: 并行进程数 (1为串行, <=0为全部CPU核心)
+        image_mode: 图片落盘方式 (copy/hardlink/symlink/reflink/none)
+        incremental: 根据转换清单只处理新增或变化的图片
+        io_threads: 放置图片的线程数 (见 write_voc), 0 为逐张串行处理
+        queue_depth: 流水线中同时在途的图片数上限
+        deduplicator: 按内容去重放置图片 (见 write_voc)
+        transform: 缩放/重新编码图片 (见 write_voc)
+
+    返回:
+        统计信息 {"images", "images_skipped", "bytes_written", "stages"}
+    """
+    for split in dataset.split_names:
+        os.makedirs(os.path.join(yolo_root, split, "images"), exist_ok=True)
+        os.makedirs(os.path.join(yolo_root, split, "labels"), exist_ok=True)
+
+    stats = {"images": 0, "images_skipped": 0, "bytes_written": 0}
+    stats["bytes_written"] += write_text(os.path.join(yolo_root, "classes.txt"), "\n".join(dataset.class_names))
+
+    # 类别表变化时所有标签都需要重新生成
+    manifest = ConversionManifest(yolo_root if incremental else None,
+                                  config=("yolo", dataset.class_names, image_mode))
+    func = image_pipeline(_render_yolo_stage, io_threads, queue_depth)
+
+    # 所有标注框一次性归一化
+    with timer("coordinates"):
+        class_ids, boxes = yolo_labels(dataset)
+
+    for split in dataset.split_names:
+        tasks = []
+        keys, fingerprints, outputs = [], [], []
+        for i in dataset.split_rows(split):
+            file_name = dataset.file_name[i]
+            src_img = dataset.path[i]
+            dst_img = os.path.join(yolo_root, split, "images", file_name)
+            txt_path = os.path.join(yolo_root, split, "labels", f"{os.path.splitext(file_name)[0]}.txt")
+            tasks.append((src_img, dst_img, txt_path, class_ids[i], boxes[i], image_mode))
+            if manifest.enabled:
+                keys.append(f"{split}/{file_name}")
+                fingerprints.append(fingerprint(file_stamp(src_img) if image_mode != "none" else None,
+                                                class_ids[i], boxes[i]))
+                outputs.append([dst_img, txt_path])
+
+        if (deduplicator or transform) is not None:
+            tasks = _place_first(deduplicator or transform, tasks, workers, io_threads, queue_depth,
+                                 f"Placing {split} images", stats)
+        _run_split(manifest, func, tasks, keys, fingerprints, outputs,
+                   workers, f"Processing {split}", stats)
+
+    manifest.finish()
+    stats["stages"] = stage_report("write_yolo", func, workers)
+    count_written(stats)
+    return stats
+
+
+def write_coco(dataset, coco_root, split_dirs=None, header=None, image_fields=None, first_ann_id=1,
+               round_bbox=True, compact=False, workers=1, image_mode="copy", incremental=False,
+               io_threads=DEFAULT_IO_THREADS, queue_depth=DEFAULT_QUEUE_DEPTH, shards=1, shard_index=None,
+               deduplicator=None, transform=None):
+    """
+    写出COCO数据集 (annotations/instances_{dir}.json, images/{dir}/)
+
+    参数:
+        split_dirs: 划分名到目录名的映射, 默认为 {split}2014; 多个划分映射到同一目录时后者覆盖前者
+        header: 写在JSON开头的顶层字段 (如 info、licenses), 可用值为 None 的
+                "categories"/"images"/"annotations" 键指定它们的位置
+        image_fields: 每条 image 记录额外附带的字段 (如 {"license": 1})
+        first_ann_id: 每个划分中第一条标注的id
+        round_bbox: bbox 四舍五入为整数; 数据集未给出面积时面积由 bbox 计算
+        compact: 输出不带缩进的紧凑JSON
+        workers: 并行进程数 (1为串行, <=0为全部CPU核心)
+        image_mode: 图片落盘方式 (copy/hardlink/symlink/reflink/none)
+        incremental: 根据转换清单只放置新增或变化的图片, JSON总是完整重写
+        io_threads: 放置图片的线程数, 图片在后台放置的同时写出JSON记录; 0 为逐张串行处理
+        queue_depth: 同时在途的图片数上限
+        shards: 每个划分的标注拆为多少个分片文件 (按图片顺序均分, 格式见 coco_shards.py), 1 为不分片
+        shard_index: 只写出这一个分片及其图片 (多台机器分别转换), 全部完成后用 coco_shards.py index 生成索引
+        deduplicator: 按内容去重放置图片 (见 write_voc)
+        transform: 缩放/重新编码图片 (见 write_voc)
+
+    无法读取的图片 (宽高为 0) 不会写入
+
+    返回:
+        统计信息 {"images", "images_skipped", "bytes_written", "stages"}
+    """
+    if shard_index is not None and not 0 <= shard_index < shards:
+        raise ValueError(f"shard_index 应在 [0, {shards}) 范围内: {shard_index}")
+    if shard_index is not None and incremental:
+        raise ValueError("只写出单个分片时不支持 incremental (转换清单需要看到全部图片)")
+    split_dirs = split_dirs or {}
+    split_dirs = {split: split_dirs.get(split, f"{split}2014") for split in dataset.split_names}
+    ann_dir = os.path.join(coco_root, "annotations")
+    os.makedirs(ann_dir, exist_ok=True)
+    for dir_name in split_dirs.values():
+        os.makedirs(os.path.join(coco_root, "images", dir_name), exist_ok=True)
+
+    manifest = ConversionManifest(coco_root if incremental else None, config=("coco", image_mode))
+    stats = {"images": 0, "images_skipped": 0, "bytes_written": 0}
+    func = image_pipeline(None, io_threads, queue_depth)
+
+    # 所有标注框一次性换算为 [x, y, w, h]
+    with timer("coordinates"):
+        anns = coco_annotations(dataset, round_bbox)
+
+    for split in dataset.split_names:
+        dir_name = split_dirs[split]
+        rows = [i for i in dataset.split_rows(split) if dataset.width[i] > 0]
+        # 按图片顺序均分为各分片, 只写出本次负责的分片
+        parts = [part.tolist() for part in np.array_split(np.asarray(rows, dtype=np.int64), shards)]
+        selected = range(shards) if shard_index is None else [shard_index]
+        tasks = []
+        keys, fingerprints, outputs = [], [], []
+        for i in (i for k in selected for i in parts[k]):
+            dst_img = os.path.join(coco_root, "images", dir_name, dataset.file_name[i])
+            tasks.append((dataset.path[i], dst_img, image_mode))
+            if manifest.enabled:
+                keys.append(f"{split}/{dataset.file_name[i]}")
+                fingerprints.append(fingerprint(file_stamp(dataset.path[i])))
+                outputs.append([dst_img])
+        if (deduplicator or transform) is not None:
+            tasks = _place_first(deduplicator or transform, tasks, workers, io_threads, queue_depth,
+                                 f"Placing {split} images", stats)
+        results = manifest.run(func, tasks, keys, fingerprints, outputs,
+                               workers, desc=f"Processing {split} set")
+
+        coco_data = dict(header or {})
+        for key in ("images", "annotations"):
+            if coco_data.get(key) is None:
+                coco_data[key] = []
+        coco_data["categories"] = dataset.categories
+
+        # 不再使用的旧分片 (或分片后的旧单文件) 会被误读, 先删除
+        if shards == 1:
+            remove_shards(ann_dir, dir_name)
+        else:
+            remove_shards(ann_dir, dir_name, keep_total=shards)
+            if os.path.exists(os.path.join(ann_dir, f"instances_{dir_name}.json")):
+                os.remove(os.path.join(ann_dir, f"instances_{dir_name}.json"))
+
+        with timer("write"):
+            # 按图片顺序分配标注id; 记录产生后立即写盘
+            shard_stats = []
+            for k in selected:
+                if shards == 1:
+                    ann_path = os.path.join(ann_dir, f"instances_{dir_name}.json")
+                else:
+                    ann_path = os.path.join(ann_dir, shard_file_name(dir_name, k, shards))
+                with CocoWriter(ann_path, coco_data, indent=None if compact else 2) as writer:
+                    ann_id = first_ann_id
+                    for i, (nbytes, fresh) in zip(parts[k], results):
+                        stats["images"] += 1
+                        if fresh:
+                            stats["bytes_written"] += nbytes
+                        else:
+                            stats["images_skipped"] += 1
+
+                        image_id = int(dataset.image_id[i])
+                        writer.add("images", {
+                            "id": image_id,
+                            "file_name": dataset.file_name[i],
+                            "width": int(dataset.width[i]),
+                            "height": int(dataset.height[i]),
+                            **(image_fields or {})
+                        })
+                        for category_id, bbox, box_area in anns[i]:
+                            writer.add("annotations", {
+                                "id": ann_id,
+                                "image_id": image_id,
+                                "category_id": category_id,
+                                "bbox": bbox,
+                                "area": box_area,
+                                "iscrowd": 0
+                            })
+                            ann_id += 1
+                stats["bytes_written"] += writer.bytes_written
+                shard_stats.append({"file": os.path.basename(ann_path), "images": writer.counts["images"],
+                                    "annotations": writer.counts["annotations"]})
+            if shards > 1 and shard_index is not None:
+                stats["bytes_written"] += write_shard_meta(ann_path, coco_data, shard_stats[0]["images"],
+                                                         shard_stats[0]["annotations"])
+            elif shards > 1:
+                stats["bytes_written"] += write_shard_index(ann_dir, dir_name, coco_data, shard_stats)
+
+    manifest.finish()
+    stats["stages"] = stage_report("write_coco", func, workers)
+    count_written(stats)
+    return stats
+
+
+# write_archive 也接受的写出参数, 归档输出时原样传给它
+_ARCHIVE_OPTIONS = ("indent", "with_source", "first_ann_id")
+
+
+def write_converted(dataset, output_dir, write, label_format, prepare=None, workers=1, image_mode="copy",
+                    incremental=False, io_threads=DEFAULT_IO_THREADS, queue_depth=DEFAULT_QUEUE_DEPTH,
+                    dedup=None, hash_index=None, resize=None, letterbox=False, image_format=None, quality=None,
+                    packed=False, voc_style=None, archive=False, shard_bytes=None, **options):
+    """
+    转换函数读取 (并筛选) 之后的共同步骤: 去重 -> 缩放/重新编码 -> 写出 (文件/打包/归档) -> 去重报告
+
+    参数:
+        dataset: 读取函数返回的数据集
+        write: 写出单独文件时的写出函数 (write_voc/write_yolo/write_coco)
+        label_format: 归档样本中标注的格式 voc | yolo | coco
+        prepare: 写出前对数据集的处理 (如四舍五入和裁剪标注框), 在缩放之后调用
+        packed: 写为打包格式 (见 packed.py), voc_style 为其中保存的VOC输出样式
+        archive: 写为 tar 分片 (见 archive.py), shard_bytes 为每个分片的大小上限
+        options: 传给 write 的其他参数 (indent、header 等); 其中 indent/with_source/first_ann_id 也传给归档
+        其余参数见各转换函数
+
+    返回:
+        写出函数的统计信息, dedup 时另含 "duplicates"
+    """
+    from archive import write_archive
+    from packed import write_packed
+
+    deduplicator = start_dedup(dedup, hash_index, incremental)
+    if dedup == "merge":
+        # 同一划分中内容相同的图片合并为一张 (需要先读取全部图片计算摘要)
+        dataset = deduplicator.merge_duplicates(dataset, workers, io_threads, queue_depth)
+    transform = start_transform(resize, letterbox, image_format, quality, image_mode, incremental, dedup)
+    if transform is not None:
+        # 缩放/重新编码图片: 标注框、宽高和文件名在这里一次性换算, 写出时再处理图片
+        dataset = transform.apply(dataset)
+    if prepare is not None:
+        dataset = prepare(dataset)
+
+    if archive:
+        # 图片和标注作为样本直接写入 tar 分片, 不写出单独的文件
+        archive_options = {key: options[key] for key in _ARCHIVE_OPTIONS if key in options}
+        if shard_bytes is not None:
+            archive_options["shard_bytes"] = shard_bytes
+        stats = write_archive(dataset, output_dir, label_format, workers=workers, image_mode=image_mode,
+                              transform=transform, incremental=incremental, deduplicator=deduplicator,
+                              **archive_options)
+    elif packed:
+        # 全部标注写入一个打包文件, 需要时用 packed.py 展开为每张图片一个标注文件
+        stats = write_packed(dataset, output_dir, workers=workers, image_mode=image_mode, io_threads=io_threads,
+                             queue_depth=queue_depth, deduplicator=deduplicator, transform=transform,
+                             voc_style=voc_style)
+    else:
+        stats = write(dataset, output_dir, workers=workers, image_mode=image_mode, incremental=incremental,
+                      io_threads=io_threads, queue_depth=queue_depth, deduplicator=deduplicator,
+                      transform=transform, **options)
+    finish_dedup(deduplicator, output_dir, stats)
+    return stats
@@ -1,9 +1,17 @@
-import os
-import json
-import shutil
-from PIL import Image
-
-def yolo_to_coco(yolo_root, coco_root, splits, class_names):
+from archive import DEFAULT_SHARD_BYTES
+from instrument import measure_run
+from readers import read_yolo
+from parallel import DEFAULT_IO_THREADS, DEFAULT_QUEUE_DEPTH
+from subset import make_subset
+from writers import write_coco, write_converted
+
+def yolo_to_coco(yolo_root, coco_root, splits, class_names, workers=1, size_cache=None,
+                 image_mode="copy", compact=False, incremental=False, long_rows="skip",
+                 io_threads=DEFAULT_IO_THREADS, queue_depth=DEFAULT_QUEUE_DEPTH, shards=1, shard_index=None,
+                 dedup=None, hash_index=None, resize=None, letterbox=False,
+                 image_format=None, quality=None, archive=False, shard_bytes=DEFAULT_SHARD_BYTES,
+                 keep_classes=None, exclude_classes=None, class_map=None, min_area=None, drop_empty=False,
+                 verbose=False, report=None, profile=None):
     """
     将YOLO格式数据集转换为COCO格式
 
@@ -12,97 +20,64 @@ def yolo_to_coco(yolo_root, coco_root, splits, class_names):
         coco_root: 输出COCO格式数据集根目录
         splits: 需要转换的数据集划分列表 (['train', 'val', 'test'])
         class_names: 类别名称列表 (按YOLO类别索引顺序)
+        workers: 并行进程数 (1为串行, <=0为全部CPU核心)
+        size_cache: 图片尺寸缓存文件路径, 重复转换时无需再读取图片
+        image_mode: 图片落盘方式 (copy/hardlink/symlink/reflink/none)
+        compact: 输出不带缩进的紧凑JSON
+        incremental: 根据输出目录中的转换清单只处理新增或变化的图片,
+                     并删除已移除图片的输出; 中断后重新运行可从断点继续
+        long_rows: 多于5列的标签行 (分割多边形) 的处理方式: "skip" 跳过,
+                   "polygon" 取多边形的外接框, "bbox" 取前4个数作为框
+        io_threads: 读取标签/图片文件头和放置图片的线程数, 各阶段在流水线中重叠进行;
+                    0 为逐张串行处理 (网络存储上可适当调大)
+        queue_depth: 流水线中同时在途的图片数上限
+        shards: 每个划分的标注拆为多少个分片文件 (见 coco_shards.py), 1 为不分片
+        shard_index: 只写出这一个分片及其图片, 用于多台机器分别转换, 完成后用 coco_shards.py index 生成索引
+        dedup: 按内容去重图片 (见 dedup.py): "link" 为内容相同的图片只存一份, 其余为硬链接;
+               "merge" 还把同一划分中内容相同的图片合并为一张, 标注框取并集; 输出目录中写出 duplicates.json
+        hash_index: 持久化的哈希索引文件, 多次转换共用时源图片未变化且内容已存放时不再读取和复制
+        resize: 图片长边缩放到不超过这个像素数 (不放大), 标注框和宽高按相同比例换算; 为 None 时不缩放
+        letterbox: 缩放后居中填充为 resize x resize 的正方形, 标注框加上填充的边距
+        image_format: 图片重新编码为 jpeg 或 webp (文件扩展名随之改变), 为 None 时保持源格式
+        quality: JPEG/WebP 编码质量 (默认 90); 缩放和重新编码在 workers 个进程中进行, JPEG 在DCT域中缩小解码
+        archive: 图片和每张图片的COCO记录写入 tar 分片 (WebDataset 格式, 见 archive.py), 不写出单独的文件;
+                 不支持 incremental/dedup, 与 shards 无关
+        shard_bytes: archive 时每个 tar 分片的大小上限 (按源图片大小估算)
+        keep_classes, exclude_classes: 只保留/去掉这些类别 (名称或类别编号), 见 subset.py
+        class_map: {旧类别: 新类别}, 新类别为名称时改名, 为整数时改为该类别编号; 映射到同一类别的合并
+        min_area: 去掉像素面积小于这个值的框
+        drop_empty: 去掉筛选后没有框的图片; 筛选只用已读入的标注, 未选中的图片不放置、不写出标注
+        verbose: 显示进度条和信息输出 (默认只输出警告, 同类警告只逐条输出前若干条)
+        report: 运行结束后写出JSON统计报告 (各步骤耗时、计数、流水线各阶段吞吐量) 的路径
+        profile: 性能剖析结果的输出路径, .prof 为 cProfile, .html 为 pyinstrument
+
+    返回:
+        统计信息 {"images": 图片数, "images_skipped": 未变化而跳过的图片数,
+                  "bytes_written": 实际写入的字节数, "stages": 流水线各阶段的吞吐量,
+                  "duplicates": 去重统计 (dedup 时), "shards": tar 分片数 (archive 时), "report": 与JSON报告相同的统计结果}
     """
-    # 创建COCO目录结构
-    os.makedirs(os.path.join(coco_root, 'annotations'), exist_ok=True)
-    for split in splits:
-        os.makedirs(os.path.join(coco_root, 'images', f'{split}2014'), exist_ok=True)
-
-    # 处理每个数据集划分
-    for split in splits:
-        coco_data = {
-            "info": {"description": "COCO Dataset converted from YOLO"},
-            "licenses": [{"name": "Unknown"}],
-            "images": [],
-            "annotations": [],
-            "categories": [{"id": i, "name": name, "supercategory": "none"} 
-                          for i, name in enumerate(class_names)]
-        }
-
-        image_id = 1
-        annotation_id = 1
-
-        # 遍历YOLO图片目录
-        yolo_img_dir = os.path.join(yolo_root, split, 'images')
-        yolo_label_dir = os.path.join(yolo_root, split, 'labels')
-
-        for img_name in os.listdir(yolo_img_dir):
-            # 处理图片文件
-            img_path = os.path.join(yolo_img_dir, img_name)
-            base_name = os.path.splitext(img_name)[0]
-            label_path = os.path.join(yolo_label_dir, f"{base_name}.txt")
-
-            # 获取图片尺寸
-            with Image.open(img_path) as img:
-                width, height = img.size
-
-            # 添加图片信息
-            coco_image = {
-                "id": image_id,
-                "file_name": img_name,  # 修改为只使用文件名
-                "width": width,
-                "height": height
-            }
-            coco_data["images"].append(coco_image)
-
-            # 处理标签文件
-            if os.path.exists(label_path):
-                with open(label_path, 'r') as f:
-                    for line in f.readlines():
-                        parts = line.strip().split()
-                        if len(parts) != 5:
-                            continue
-
-                        # 解析YOLO格式
-                        class_id = int(parts[0])
-                        x_center = float(parts[1])
-                        y_center = float(parts[2])
-                        w = float(parts[3])
-                        h = float(parts[4])
-
-                        # 转换为COCO格式的绝对坐标
-                        abs_x = (x_center - w/2) * width
-                        abs_y = (y_center - h/2) * height
-                        abs_w = w * width
-                        abs_h = h * height
-
-                        # 转换为整数
-                        bbox = [round(abs_x), round(abs_y), 
-                               round(abs_w), round(abs_h)]
-
-                        # 添加标注信息
-                        coco_ann = {
-                            "id": annotation_id,
-                            "image_id": image_id,
-                            "category_id": class_id,
-                            "bbox": bbox,
-                            "area": abs_w * abs_h,
-                            "iscrowd": 0
-                        }
-                        coco_data["annotations"].append(coco_ann)
-                        annotation_id += 1
-
-            # 复制图片到COCO目录
-            dst_path = os.path.join(coco_root, 'images', f'{split}2014', img_name)
-            shutil.copy(img_path, dst_path)
-
-            image_id += 1
-
-        # 保存JSON文件
-        output_path = os.path.join(coco_root, 'annotations', 
-                                 f'instances_{split}2014.json')
-        with open(output_path, 'w') as f:
-            json.dump(coco_data, f, indent=2)
+    with measure_run("yolo_to_coco", report, profile, verbose) as metrics:
+        # 筛选子集 (见 subset.py): 类别条件和 drop_empty 在读取图片尺寸之前按标注生效, 之后只处理选中的图片
+        subset = make_subset(keep_classes, exclude_classes, class_map, min_area, drop_empty)
+        # 读取图片尺寸 (只解析文件头), 全部标签一次性读入数组, 归一化坐标一次性换算为像素坐标
+        dataset = read_yolo(yolo_root, splits, class_names, workers=workers, size_cache=size_cache,
+                            long_rows=long_rows, io_threads=io_threads, queue_depth=queue_depth, subset=subset)
+
+        # 去重、缩放后写出 (见 writers.write_converted);
+        # 图片id和标注id在每个划分内从1开始, bbox转换为整数, 面积使用换算后的浮点宽高
+        stats = write_converted(
+            dataset, coco_root, write_coco, "coco", workers=workers, image_mode=image_mode,
+            incremental=incremental, io_threads=io_threads, queue_depth=queue_depth, dedup=dedup,
+            hash_index=hash_index, resize=resize, letterbox=letterbox, image_format=image_format,
+            quality=quality, archive=archive, shard_bytes=shard_bytes,
+            header={
+                "info": {"description": "COCO Dataset converted from YOLO"},
+                "licenses": [{"name": "Unknown"}],
+            },
+            first_ann_id=1,
+            compact=compact, shards=shards, shard_index=shard_index)
+    stats["report"] = metrics.report()
+    return stats
 
 # 使用示例
 if __name__ == "__main__":
@@ -113,4 +88,4 @@ if __name__ == "__main__":
     CLASS_NAMES = ['Aluminium foil', 'Bottle cap', 'Bottle', 'Broken glass', 'Can', 'Carton', 'Cigarette', 'Cup', 'Lid', 'Other litter', 'Other plastic', 'Paper', 'Plastic bag - wrapper', 'Plastic container', 'Pop tab', 'Straw', 'Styrofoam piece', 'Unlabeled litter']  # 替换为实际类别名称
 
     # 执行转换
-    yolo_to_coco(YOLO_ROOT, COCO_ROOT, SPLITS, CLASS_NAMES)    
\ No newline at end of file
+    yolo_to_coco(YOLO_ROOT, COCO_ROOT, SPLITS, CLASS_NAMES, verbose=True)    
\ No newline at end of file
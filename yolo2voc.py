@@ -1,149 +1,54 @@
 import os
-import xml.etree.ElementTree as ET
-from xml.dom import minidom
-import shutil
-import cv2
+from archive import DEFAULT_SHARD_BYTES
+from fileio import write_text
+from instrument import log, measure_run
+from readers import read_yolo
+from parallel import DEFAULT_IO_THREADS, DEFAULT_QUEUE_DEPTH
+from subset import make_subset
+from writers import write_converted, write_voc
 
-def yolo_to_voc(yolo_dataset_path, voc_dataset_path):
-    # 创建输出目录
-    os.makedirs(os.path.join(voc_dataset_path, "JPEGImages"), exist_ok=True)
-    os.makedirs(os.path.join(voc_dataset_path, "Annotations"), exist_ok=True)
-    os.makedirs(os.path.join(voc_dataset_path, "ImageSets", "Main"), exist_ok=True)
+def yolo_to_voc(yolo_dataset_path, voc_dataset_path, splits=("train", "val", "test"), class_names=None, workers=1,
+                size_cache=None, image_mode="copy", incremental=False, long_rows="bbox", io_threads=DEFAULT_IO_THREADS,
+                queue_depth=DEFAULT_QUEUE_DEPTH, packed=False, dedup=None, hash_index=None, resize=None,
+                letterbox=False, image_format=None, quality=None, archive=False, shard_bytes=DEFAULT_SHARD_BYTES,
+                keep_classes=None, exclude_classes=None, class_map=None, min_area=None, drop_empty=False,
+                verbose=False, report=None, profile=None):
+    """
+    YOLO数据集转换为VOC格式
 
-    # 获取所有类别
-    classes = set()
-    for split in ["train", "val", "test"]:
-        split_path = os.path.join(yolo_dataset_path, split)
-        if not os.path.exists(split_path):
-            continue
-        
-        labels_path = os.path.join(split_path, "labels")
-        if not os.path.exists(labels_path):
-            continue
-        
-        for label_file in os.listdir(labels_path):
-            if not label_file.endswith(".txt"):
-                continue
-            with open(os.path.join(labels_path, label_file), "r") as f:
-                for line in f:
-                    parts = line.strip().split()
-                    if len(parts) > 0:
-                        classes.add(parts[0])
-    
-    # 将类别排序并写入classes.txt
-    classes = sorted(list(classes))
-    with open(os.path.join(voc_dataset_path, "classes.txt"), "w") as f:
-        for cls in classes:
-            f.write(f"{cls}\n")
-    print(f"Generated classes.txt with {len(classes)} classes.")
+    参数:
+        splits: 需要转换的数据集划分
+        class_names: 类别名称列表 (按YOLO类别索引顺序), 为 None 时以标签中出现的类别编号作为类别名称
+    """
+    with measure_run("yolo_to_voc", report, profile, verbose) as metrics:
+        # 筛选子集 (见 subset.py): 类别条件和 drop_empty 在读取图片尺寸之前按标注生效, 之后只处理选中的图片
+        subset = make_subset(keep_classes, exclude_classes, class_map, min_area, drop_empty)
+        # 读取图片尺寸 (只解析文件头), 全部标签一次性读入数组; 没有类别名称时类别为标签中出现的类别编号,
+        # 多于5列的行默认取前4个数 (long_rows="polygon" 时取分割多边形的外接框)
+        dataset = read_yolo(yolo_dataset_path, splits, class_names, workers=workers,
+                            size_cache=size_cache, extensions=(".jpg", ".png", ".jpeg"), long_rows=long_rows,
+                            io_threads=io_threads, queue_depth=queue_depth, subset=subset)
 
-    # 转换每个split
-    for split in ["train", "val", "test"]:
-        split_path = os.path.join(yolo_dataset_path, split)
-        if not os.path.exists(split_path):
-            continue
-        
-        images_path = os.path.join(split_path, "images")
-        labels_path = os.path.join(split_path, "labels")
-        
-        if not os.path.exists(images_path) or not os.path.exists(labels_path):
-            continue
-        
-        # 创建ImageSets文件
-        with open(os.path.join(voc_dataset_path, "ImageSets", "Main", f"{split}.txt"), "w") as f_set:
-            for image_file in os.listdir(images_path):
-                if not image_file.lower().endswith((".jpg", ".png", ".jpeg")):
-                    continue
-                
-                # 复制图片到JPEGImages
-                image_name = os.path.splitext(image_file)[0]
-                src_image_path = os.path.join(images_path, image_file)
-                dst_image_path = os.path.join(voc_dataset_path, "JPEGImages", image_file)
-                shutil.copy(src_image_path, dst_image_path)
-                
-                # 写入ImageSets
-                f_set.write(f"{image_name}\n")
-                
-                # 生成XML
-                label_file = os.path.join(labels_path, f"{image_name}.txt")
-                if not os.path.exists(label_file):
-                    continue
-                
-                # 读取图片尺寸
-                img = cv2.imread(src_image_path)
-                if img is None:
-                    print(f"无法读取图片: {src_image_path}")
-                    continue
-                height, width, _ = img.shape
-                
-                # 创建XML结构
-                annotation = ET.Element("annotation")
-                ET.SubElement(annotation, "folder").text = os.path.basename(voc_dataset_path)
-                ET.SubElement(annotation, "filename").text = image_file
-                
-                source = ET.SubElement(annotation, "source")
-                ET.SubElement(source, "database").text = "The VOC2007 Database"
-                ET.SubElement(source, "annotation").text = "PASCAL VOC2007"
-                ET.SubElement(source, "image").text = "flickr"
-                ET.SubElement(source, "flickrid").text = "325991873"
-                
-                owner = ET.SubElement(annotation, "owner")
-                ET.SubElement(owner, "flickrid").text = "archintent louisville"
-                ET.SubElement(owner, "name").text = "?"
-                
-                size = ET.SubElement(annotation, "size")
-                ET.SubElement(size, "width").text = str(width)
-                ET.SubElement(size, "height").text = str(height)
-                ET.SubElement(size, "depth").text = str(3)
-                
-                ET.SubElement(annotation, "segmented").text = "0"
-                
-                # 读取标签并转换为VOC格式
-                with open(label_file, "r") as lf:
-                    for line in lf:
-                        parts = line.strip().split()
-                        if len(parts) < 5:
-                            continue
-                        
-                        class_id = parts[0]
-                        x_center = float(parts[1])
-                        y_center = float(parts[2])
-                        width_yolo = float(parts[3])
-                        height_yolo = float(parts[4])
-                        
-                        # 转换为VOC格式 (xmin, ymin, xmax, ymax)
-                        xmin = max(0, round((x_center - width_yolo / 2) * width))
-                        ymin = max(0, round((y_center - height_yolo / 2) * height))
-                        xmax = min(width, round((x_center + width_yolo / 2) * width))
-                        ymax = min(height, round((y_center + height_yolo / 2) * height))
-                        
-                        # 添加到XML
-                        obj = ET.SubElement(annotation, "object")
-                        ET.SubElement(obj, "name").text = class_id
-                        ET.SubElement(obj, "pose").text = "Unspecified"
-                        ET.SubElement(obj, "truncated").text = "0"
-                        ET.SubElement(obj, "difficult").text = "0"
-                        
-                        bndbox = ET.SubElement(obj, "bndbox")
-                        ET.SubElement(bndbox, "xmin").text = str(xmin)
-                        ET.SubElement(bndbox, "ymin").text = str(ymin)
-                        ET.SubElement(bndbox, "xmax").text = str(xmax)
-                        ET.SubElement(bndbox, "ymax").text = str(ymax)
-                
-                # 生成格式化的XML
-                xml_str = ET.tostring(annotation)
-                xml_str = minidom.parseString(xml_str).toprettyxml(indent="    ")
-                
-                # 写入XML文件
-                xml_path = os.path.join(voc_dataset_path, "Annotations", f"{image_name}.xml")
-                with open(xml_path, "w") as xml_file:
-                    xml_file.write(xml_str)
-                
-                print(f"Converted {image_name} to VOC format. Image copied to {dst_image_path}")
+        # 去重、缩放后写出 (见 writers.write_converted): 转换为VOC格式 (xmin, ymin, xmax, ymax),
+        # 四舍五入并裁剪到图片范围内; 打包时类别表保存在索引中, 需要时用 packed.py 展开为每张图片一个XML
+        stats = write_converted(
+            dataset, voc_dataset_path, write_voc, "voc", prepare=lambda dataset: dataset.round_boxes().clip_boxes(),
+            workers=workers, image_mode=image_mode, incremental=incremental, io_threads=io_threads,
+            queue_depth=queue_depth, dedup=dedup, hash_index=hash_index, resize=resize, letterbox=letterbox,
+            image_format=image_format, quality=quality, packed=packed,
+            voc_style={"indent": "    ", "with_source": True, "image_set_eol": True, "classes_eol": True},
+            archive=archive, shard_bytes=shard_bytes, indent="    ", with_source=True, image_set_eol=True)
+        if not (archive or packed):
+            # 将类别排序并写入classes.txt
+            stats["bytes_written"] += write_text(os.path.join(voc_dataset_path, "classes.txt"),
+                                                 "".join(f"{cls}\n" for cls in dataset.class_names))
+            log(f"Generated classes.txt with {len(dataset.categories)} classes.")
 
-    print("Conversion completed.")
+        log(f"Conversion completed. {stats['bytes_written']} bytes written.")
+    stats["report"] = metrics.report()
+    return stats
 
 if __name__ == "__main__":
     yolo_dataset_path = input("请输入YOLO数据集路径: ")
     voc_dataset_path = input("请输入输出VOC数据集路径: ")
-    yolo_to_voc(yolo_dataset_path, voc_dataset_path)
\ No newline at end of file
+    yolo_to_voc(yolo_dataset_path, voc_dataset_path, verbose=True)
\ No newline at end of file
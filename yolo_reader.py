@@ -0,0 +1,207 @@
+import warnings
+from collections import namedtuple
+import numpy as np
+from instrument import count, record_stages, timer, warn
+from parallel import DEFAULT_QUEUE_DEPTH, run_tasks
+from pipeline import Pipeline
+
+# 一批YOLO标签文件: 第 i 个文件的行为 [offsets[i], offsets[i+1])
+#   class_ids: 类别编号 (int64), boxes: 归一化的 (中心x, 中心y, 宽, 高) (float64, N x 4)
+#   labeled: 标签文件是否存在 (bool数组)
+#   malformed: 格式错误被跳过的行 [(文件路径, 行号, 行内容), ...]
+#   skipped: 按 long_rows="skip" 跳过的多列行数
+YoloLabels = namedtuple("YoloLabels", ["class_ids", "boxes", "offsets", "labeled", "malformed", "skipped"])
+
+# 每次向量化解析的标签数据量上限 (字节)
+_CHUNK_BYTES = 8 << 20
+
+_WHITESPACE = np.zeros(256, dtype=bool)
+_WHITESPACE[[9, 10, 11, 12, 13, 32]] = True
+
+
+def read_label_file(path):
+    """读取标签文件的全部内容, 文件不存在时返回 None (在I/O线程或子进程中执行)"""
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def _polygon_box(coords):
+    """多边形顶点 (x1 y1 x2 y2 ...) 的外接框, 返回 (中心x, 中心y, 宽, 高)"""
+    xs, ys = coords[0::2], coords[1::2]
+    x1, x2, y1, y2 = min(xs), max(xs), min(ys), max(ys)
+    return [(x1 + x2) / 2, (y1 + y2) / 2, x2 - x1, y2 - y1]
+
+
+def parse_label_lines(text, long_rows="skip"):
+    """
+    逐行解析单个标签文件的内容 (含格式错误或多列行的文件走这里)
+
+    参数:
+        text: 文件内容 (bytes 或 str)
+        long_rows: 多于5列的行的处理方式, "skip" 跳过, "bbox" 取前4个数作为框,
+                   "polygon" 把其余各列作为分割多边形顶点并取外接框
+
+    返回:
+        (类别编号列表, 框列表, [(行号, 行内容), ...] 格式错误的行, 跳过的多列行数)
+    """
+    if isinstance(text, bytes):
+        text = text.decode("utf-8", errors="replace")
+    class_ids, boxes, malformed = [], [], []
+    skipped = 0
+    for lineno, line in enumerate(text.splitlines(), 1):
+        parts = line.split()
+        if not parts:
+            continue
+        try:
+            values = [float(v) for v in parts]
+        except ValueError:
+            malformed.append((lineno, line))
+            continue
+        class_id = values[0]
+        if len(values) < 5 or class_id < 0 or not class_id.is_integer():
+            malformed.append((lineno, line))
+            continue
+        if len(values) == 5 or long_rows == "bbox":
+            box = values[1:5]
+        elif long_rows == "polygon":
+            if len(values) % 2 == 0:
+                malformed.append((lineno, line))
+                continue
+            box = _polygon_box(values[1:])
+        else:
+            skipped += 1
+            continue
+        class_ids.append(int(class_id))
+        boxes.append(box)
+    return class_ids, boxes, malformed, skipped
+
+
+def _parse_clean(texts):
+    """把只含5列行的若干文件内容一次性解析, 失败 (非数字或类别编号不是非负整数) 时返回 None"""
+    with warnings.catch_warnings():
+        # 遇到无法解析的内容时 fromstring 只给出警告并截断结果
+        warnings.simplefilter("error")
+        try:
+            values = np.fromstring(b"\n".join(texts), sep=" ")
+        except (DeprecationWarning, ValueError):
+            return None
+    if values.size % 5:
+        return None
+    values = values.reshape(-1, 5)
+    class_ids = values[:, 0]
+    if not ((class_ids >= 0) & (class_ids == np.floor(class_ids))).all():
+        return None
+    return class_ids.astype(np.int64), values[:, 1:].copy()
+
+
+def _parse_chunk(texts, paths, long_rows):
+    """
+    向量化解析一批标签文件: 统计每行的列数, 全部为5列的文件拼接后一次转换为数组,
+    其余文件 (含格式错误或多列的行) 逐行解析
+    """
+    buf = np.frombuffer(b"\n".join(texts), dtype=np.uint8)
+    space = _WHITESPACE[buf]
+    starts = ~space
+    starts[1:] &= space[:-1]
+    line_of_byte = np.cumsum(buf == 10, dtype=np.int32)
+    lines_per_file = np.asarray([text.count(b"\n") + 1 for text in texts], dtype=np.int64)
+    columns = np.bincount(line_of_byte[starts], minlength=int(lines_per_file.sum()))
+    file_of_line = np.repeat(np.arange(len(texts)), lines_per_file)
+    clean = np.ones(len(texts), dtype=bool)
+    clean[file_of_line[(columns != 0) & (columns != 5)]] = False
+
+    rows = np.bincount(file_of_line[columns == 5], minlength=len(texts))
+    clean_rows = np.flatnonzero(clean).tolist()
+    parsed = _parse_clean([texts[i] for i in clean_rows]) if clean_rows else None
+    if parsed is None or len(parsed[0]) != rows[clean].sum():
+        # 含非数字内容, 整批逐行解析以定位错误行
+        clean[:] = False
+        parsed = (np.zeros(0, dtype=np.int64), np.zeros((0, 4)))
+
+    counts = np.where(clean, rows, 0)
+    class_parts, box_parts = [parsed[0]], [parsed[1]]
+    malformed = []
+    skipped = 0
+    slow_rows = np.flatnonzero(~clean).tolist()
+    if slow_rows:
+        # 按文件顺序插入逐行解析的结果
+        bounds = np.concatenate([[0], np.cumsum(counts)]).tolist()
+        class_parts, box_parts = [], []
+        for i in range(len(texts)):
+            if clean[i]:
+                class_parts.append(parsed[0][bounds[i]:bounds[i + 1]])
+                box_parts.append(parsed[1][bounds[i]:bounds[i + 1]])
+                continue
+            class_ids, boxes, bad_lines, long_skipped = parse_label_lines(texts[i], long_rows)
+            counts[i] = len(class_ids)
+            class_parts.append(np.asarray(class_ids, dtype=np.int64))
+            box_parts.append(np.asarray(boxes, dtype=np.float64).reshape(-1, 4))
+            malformed.extend((paths[i], lineno, line) for lineno, line in bad_lines)
+            skipped += long_skipped
+    return np.concatenate(class_parts), np.concatenate(box_parts), counts, malformed, skipped
+
+
+def load_yolo_labels(label_paths, long_rows="skip", workers=1, io_threads=0, queue_depth=DEFAULT_QUEUE_DEPTH):
+    """
+    批量读取YOLO标签文件, 全部标注放在一个数组中, 用偏移量索引每个文件的行
+
+    参数:
+        label_paths: 标签文件路径列表, 不存在的文件视为未标注
+        long_rows: 多于5列的行的处理方式 (见 parse_label_lines)
+        workers: 读取文件的进程数
+        io_threads: 大于0时用线程读取文件, 适合网络存储
+        queue_depth: 同时在途的文件数上限
+
+    返回:
+        YoloLabels; 格式错误的行 (列数不足、非数字、类别编号不是非负整数) 被跳过并记录在 malformed 中
+    """
+    read = Pipeline([("read", read_label_file, max(io_threads, 1))], queue_depth, threaded=io_threads > 0)
+    with timer("read_labels"):
+        contents = run_tasks(read, label_paths, workers)
+    if workers == 1:
+        record_stages("read_yolo_labels", read)
+    labeled = np.asarray([text is not None for text in contents], dtype=bool)
+
+    class_parts, box_parts, count_parts = [], [], []
+    malformed = []
+    skipped = 0
+    start = size = 0
+    with timer("parse"):
+        for end in range(len(contents) + 1):
+            if end < len(contents):
+                text = contents[end]
+                size += len(text) if text is not None else 0
+                if size < _CHUNK_BYTES:
+                    continue
+                end += 1
+            elif start == end:
+                break
+            texts = [text if text is not None else b"" for text in contents[start:end]]
+            class_ids, boxes, counts, bad_lines, long_skipped = _parse_chunk(texts, label_paths[start:end],
+                                                                             long_rows)
+            class_parts.append(class_ids)
+            box_parts.append(boxes)
+            count_parts.append(counts)
+            malformed.extend(bad_lines)
+            skipped += long_skipped
+            # 已解析的文件内容可以释放
+            contents[start:end] = [None] * (end - start)
+            start, size = end, 0
+
+    offsets = np.zeros(len(label_paths) + 1, dtype=np.int64)
+    if count_parts:
+        np.cumsum(np.concatenate(count_parts), out=offsets[1:])
+        class_ids, boxes = np.concatenate(class_parts), np.concatenate(box_parts)
+    else:
+        class_ids, boxes = np.zeros(0, dtype=np.int64), np.zeros((0, 4))
+    return YoloLabels(class_ids, boxes, offsets, labeled, malformed, skipped)
+
+
+def report_malformed(malformed):
+    """报告格式错误的标签行 (同类警告只逐条输出前若干条)"""
+    count("malformed_lines", len(malformed))
+    for path, lineno, line in malformed:
+        warn("malformed_line", f"跳过格式错误的标签行 {path}:{lineno}: {line.strip()!r}")